@@ -1,21 +1,62 @@
 import os
 import json
 import re
+import base64
+import zlib
+from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter import scrolledtext
 import webbrowser
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
 
 import paramiko
 
+import df_list_edit as backend
+import adsb_thumbs
+
 # ---------------- CONFIG ----------------
 # Modifica questi valori per il tuo setup (o usa ENV vars)
 HOST = os.getenv("ADSB_BACKEND_HOST", "your-mini-pc.example.com")
 USER = os.getenv("ADSB_BACKEND_USER", "youruser")
 KEY_PATH = os.getenv("ADSB_SSH_KEY", os.path.join(os.environ["USERPROFILE"], ".ssh", "id_rsa"))
 
-REMOTE_CMD = os.getenv("ADSB_BACKEND_CMD", "./df_list_edit.py")
+# "-m" usa il bytecode in __pycache__: uno script lanciato direttamente viene ricompilato a ogni richiesta
+REMOTE_CMD = os.getenv("ADSB_BACKEND_CMD", "python3 -m df_list_edit")
 REMOTE_EDIT = f"{REMOTE_CMD} --stdin-json"
+# Repository di liste del backend (nome in ADSB_REPOS sul backend; vuoto = quello di default)
+BACKEND_REPO = os.getenv("ADSB_BACKEND_REPO", "")
+
+# Snapshot locale delle liste: where/diff in locale, publish/delete/move via SSH
+SNAPSHOT_DIR = os.getenv("ADSB_SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".adsb-list-editor",
+                                                          f"snapshot-{BACKEND_REPO}" if BACKEND_REPO else "snapshot"))
+USE_SNAPSHOT = os.getenv("ADSB_SNAPSHOT", "0") == "1"
+
+# Scritture (publish/move/delete): secondi senza risposta prima di ritentare, e quante volte
+WRITE_TIMEOUT = float(os.getenv("ADSB_WRITE_TIMEOUT", "120"))
+WRITE_RETRIES = int(os.getenv("ADSB_WRITE_RETRIES", "2"))
+
+WHERE_CACHE_SIZE = int(os.getenv("ADSB_WHERE_CACHE_SIZE", "256"))
+# Secondi per cui un HEAD del backend resta valido prima di riverificarlo su un hit della cache
+WHERE_HEAD_TTL = float(os.getenv("ADSB_WHERE_HEAD_TTL", "10"))
+
+# Anteprima live: ms di pausa nella digitazione prima di ricalcolare il diff
+PREVIEW_DELAY_MS = int(os.getenv("ADSB_PREVIEW_DELAY_MS", "400"))
+PREVIEW_POLL_MS = 100
+
+# Sfoglia lista: righe visibili, righe per richiesta "page", blocchi tenuti in memoria
+BROWSE_ROWS = 20
+BROWSE_BLOCK = 200
+BROWSE_CACHE_BLOCKS = 8
+BROWSE_COLUMNS = [("hex", "HEX"), ("reg", "Reg"), ("operator", "Operator"),
+                  ("atype", "Type"), ("icao_type", "ICAO"), ("category", "Category")]
+
+# Miniature di ImageLink1..4 (cache su disco in adsb_thumbs, ADSB_THUMB_DIR / ADSB_THUMB_CACHE_MB)
+THUMB_FIELDS = ["img1", "img2", "img3", "img4"]
 
 LIST_VALUES = ["mil", "gov", "pol", "flyingdocs", "civ"]
 
@@ -145,7 +186,13 @@ def bind_right_click_paste(entry: ttk.Entry):
     entry.bind("<Button-3>", paste)
     entry.bind("<Control-Button-1>", paste)
 
+class FramedOutput(str):
+    # Testo stdout di una risposta a frame, con il risultato JSON già decodificato
+    json_frame = None
+
 def parse_last_json_blob(out: str):
+    if getattr(out, "json_frame", None) is not None:
+        return out.json_frame
     lines = [ln for ln in (out or "").splitlines() if ln.strip() and not ln.strip().startswith("WARNING:")]
     if not lines:
         return None
@@ -160,30 +207,230 @@ def show_backend_warnings(out: str, err: str):
         messagebox.showwarning("Warning backend", "\n".join(bw))
 
 # ---------------- SSH JSON RPC ----------------
-def ssh_run_json(req: dict):
+FRAME_ACCEPT = [c for c in backend.frame_codecs() if c != "none"]
+
+def read_backend_stdout(stdout, on_progress=None):
+    first = backend._read_exact(stdout.read, len(backend.FRAME_MAGIC))
+    if first != backend.FRAME_MAGIC:
+        # Backend vecchio o framing non negoziato: JSON/testo semplice
+        return (first + stdout.read()).decode(errors="replace")
+
+    texts, result = [], None
+    for kind, obj in backend.read_frames(stdout.read):
+        if kind == b"T":
+            texts.append(obj)
+        elif kind == b"J":
+            result = obj
+        elif kind == b"P" and on_progress:
+            on_progress(obj)
+
+    out = FramedOutput("".join(texts))
+    out.json_frame = result
+    return out
+
+# Libero quando nessuna richiesta del thread Tk è in corso: i prefetch aspettano questo
+foreground_idle = threading.Event()
+foreground_idle.set()
+
+def ssh_run_json(req: dict, on_progress=None, on_connect=None, timeout=None):
+    foreground = threading.current_thread() is threading.main_thread()
+    if foreground:
+        foreground_idle.clear()
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        ssh.connect(
+            HOST,
+            username=USER,
+            key_filename=KEY_PATH,
+            look_for_keys=False,
+            allow_agent=False,
+            timeout=10,
+        )
+        if on_connect:
+            on_connect(ssh)  # chi chiama può annullare con ssh.close()
+
+        stdin, stdout, stderr = ssh.exec_command(REMOTE_EDIT, timeout=timeout)
+        extra = {"repo": BACKEND_REPO} if BACKEND_REPO else {}
+        payload = json.dumps({"framing": FRAME_ACCEPT, **extra, **req}, ensure_ascii=False)
+        stdin.write(payload)
+        stdin.flush()
+        stdin.channel.shutdown_write()
+
+        out = read_backend_stdout(stdout, on_progress)
+        err = stderr.read().decode(errors="replace")
+        rc = stdout.channel.recv_exit_status()
+        return rc, out, err
+    finally:
+        ssh.close()
+        if foreground:
+            foreground_idle.set()
+
+def ssh_run_write(req: dict):
+    # Scritture con request_id: se la connessione cade a metà si ritenta con lo stesso id
+    # e il backend restituisce l'esito registrato invece di rifare commit e push
+    req = {"request_id": uuid.uuid4().hex, **req}
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            return ssh_run_json(req, timeout=WRITE_TIMEOUT)
+        except (OSError, EOFError, paramiko.SSHException) as e:
+            if attempt == WRITE_RETRIES:
+                raise RuntimeError(f"Connessione persa durante la scrittura ({e}). "
+                                   f"Esito sconosciuto, request_id {req['request_id']}.")
+            log(f"Connessione persa ({e}), ritento con request_id {req['request_id']}")
+
+# ---------------- WHERE CACHE ----------------
+# LRU dei risultati "where", chiave (HEX, HEAD riportato dal backend).
+# Quando il backend riporta un HEAD diverso le voci vecchie vengono scartate.
+class WhereCache:
+    def __init__(self, maxsize: int = WHERE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.head = ""
+        self.checked = 0.0  # time.monotonic() dell'ultimo HEAD visto dal backend
+        self._items = OrderedDict()
+
+    def get(self, hx: str):
+        key = (hx, self.head)
+        data = self._items.get(key)
+        if data is None:
+            return None
+        self._items.move_to_end(key)
+        return data
+
+    def put(self, hx: str, data: dict):
+        self.note_head(data.get("head") or "")
+        key = (hx, self.head)
+        self._items[key] = data
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def note_head(self, head: str):
+        if not head:
+            return
+        self.checked = time.monotonic()
+        if head == self.head:
+            return
+        self.head = head
+        for key in [k for k in self._items if k[1] != head]:
+            del self._items[key]
+
+    def stale(self, ttl: float) -> bool:
+        return time.monotonic() - self.checked >= ttl
+
+    def invalidate(self, hx: str):
+        for key in [k for k in self._items if k[0] == hx]:
+            del self._items[key]
+
+where_cache = WhereCache()
 
-    ssh.connect(
-        HOST,
-        username=USER,
-        key_filename=KEY_PATH,
-        look_for_keys=False,
-        allow_agent=False,
-        timeout=10,
-    )
-
-    stdin, stdout, stderr = ssh.exec_command(REMOTE_EDIT)
-    payload = json.dumps(req, ensure_ascii=False)
-    stdin.write(payload)
-    stdin.flush()
-    stdin.channel.shutdown_write()
-
-    out = stdout.read().decode(errors="replace")
-    err = stderr.read().decode(errors="replace")
-    rc = stdout.channel.recv_exit_status()
-    ssh.close()
-    return rc, out, err
+# ---------------- SNAPSHOT LOCALE ----------------
+def _write_file_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load_snapshot_manifest() -> dict:
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+snapshot = load_snapshot_manifest()
+
+def register_snapshot_files(files: dict):
+    # Lo snapshot di ADSB_BACKEND_REPO ha la sua mappa lista -> file: where/diff locali la usano
+    if files:
+        backend.register_repo("gui-snapshot", Path(SNAPSHOT_DIR), files)
+
+register_snapshot_files(snapshot.get("list_files"))
+
+def _snapshot_progress(p: dict):
+    log(f"... {p.get('stage', '')} {p.get('done', 0)}/{p.get('total', 0)}")
+    root.update_idletasks()
+
+def _snapshot_request(req: dict) -> dict:
+    rc, out, err = ssh_run_json(req, on_progress=_snapshot_progress)
+    if err.strip():
+        log("STDERR:\n" + err.rstrip())
+    show_backend_warnings(out, err)
+
+    if rc != 0:
+        raise RuntimeError(f"Snapshot fallito (RC={rc}).")
+    data = parse_last_json_blob(out)
+    if not data:
+        raise RuntimeError("Backend non ha restituito JSON valido (snapshot).")
+    return data
+
+def _save_snapshot_manifest(head: str, blobs: dict, files: dict):
+    snapshot.clear()
+    snapshot.update({"head": head, "blobs": blobs, "list_files": files})
+    register_snapshot_files(files)
+    _write_file_atomic(os.path.join(SNAPSHOT_DIR, "manifest.json"),
+                       json.dumps(snapshot, ensure_ascii=False).encode("utf-8"))
+    where_cache.note_head(head)
+
+def refresh_snapshot() -> dict:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    # Con uno snapshot già presente basta il delta di righe dall'ultimo HEAD
+    if snapshot.get("head"):
+        log(">>> changes_since " + snapshot["head"][:10])
+        delta = _snapshot_request({"action": "changes_since", "since": snapshot["head"]})
+        backend.apply_changes(Path(SNAPSHOT_DIR), delta)
+        _save_snapshot_manifest(delta.get("head", ""), {}, delta.get("list_files") or snapshot.get("list_files"))
+
+        n = sum(len(e.get("added", [])) + len(e.get("changed", [])) + len(e.get("removed", []))
+                for e in (delta.get("lists") or {}).values())
+        log(f"Snapshot: {n} righe aggiornate, HEAD {snapshot['head'][:10]}")
+        return snapshot
+
+    log(">>> snapshot (nuovo)")
+    data = _snapshot_request({"action": "snapshot", "have": snapshot.get("blobs", {})})
+
+    for fn, b64 in (data.get("files") or {}).items():
+        _write_file_atomic(os.path.join(SNAPSHOT_DIR, fn), zlib.decompress(base64.b64decode(b64)))
+    for fn in data.get("removed") or []:
+        try:
+            os.remove(os.path.join(SNAPSHOT_DIR, fn))
+        except OSError:
+            pass
+
+    _save_snapshot_manifest(data.get("head", ""), data.get("blobs", {}), data.get("list_files"))
+
+    log(f"Snapshot: {len(data.get('files') or {})} file aggiornati, HEAD {snapshot['head'][:10]}")
+    return snapshot
+
+def ensure_snapshot():
+    if not snapshot.get("head"):
+        refresh_snapshot()
+
+def local_where(hx: str) -> dict:
+    ensure_snapshot()
+    locs = backend.find_hex_locations_with_records(hx, repo=Path(SNAPSHOT_DIR))
+    return {"hex": hx, "head": snapshot["head"], "locations": locs}
+
+def local_diff(clean_v: dict) -> dict:
+    ensure_snapshot()
+    try:
+        args = backend.args_from_request({"action": "diff", **clean_v})
+        hx = backend.apply_args_normalizations(args)
+        dj = backend.diff_against_target(args, hx, repo=Path(SNAPSHOT_DIR))
+    except SystemExit as e:
+        raise RuntimeError(str(e))
+    dj["head"] = snapshot["head"]
+    return dj
+
+def refresh_snapshot_after_write():
+    if not use_snapshot.get():
+        return
+    try:
+        refresh_snapshot()
+    except Exception as e:
+        log(f"Aggiornamento snapshot fallito: {e}")
 
 # ---------------- GUI ----------------
 root = tk.Tk()
@@ -191,6 +438,7 @@ root.title("DF ADSB Lists Publisher (ADS-B List Editor)")
 
 vars_ = {"list": tk.StringVar(value="mil")}
 vars_["move_to"] = tk.StringVar(value="")
+use_snapshot = tk.BooleanVar(value=USE_SNAPSHOT)
 
 for k, _ in FIELDS:
     vars_[k] = tk.StringVar()
@@ -296,14 +544,62 @@ def do_autofill():
 
 def fill_gui_from_record(rec: dict):
     for k, _ in FIELDS:
-        if k in rec:
-            vars_[k].set((rec.get(k) or "").strip())
+        rk = "atype" if k == "type" else k  # nei record del backend Type è "atype"
+        if rk in rec:
+            vars_[k].set((rec.get(rk) or "").strip())
 
     v = get_values_normalized()
     vars_["hex"].set(v["hex"])
     vars_["cmpg"].set(v.get("cmpg", ""))
     vars_["link"].set(v.get("link", ""))
 
+def backend_head() -> str:
+    rc, out, err = ssh_run_json({"action": "head"})
+    data = parse_last_json_blob(out) if rc == 0 else None
+    return (data or {}).get("head", "")
+
+def cached_where(hx: str):
+    # Un hit vale solo se l'HEAD del backend non è cambiato (riverificato al più ogni
+    # WHERE_HEAD_TTL): un push di un altro editor scarta le voci del vecchio HEAD
+    if where_cache.get(hx) is None:
+        return None
+    if not use_snapshot.get() and where_cache.stale(WHERE_HEAD_TTL):
+        head = backend_head()
+        if not head:
+            return None
+        where_cache.note_head(head)
+    return where_cache.get(hx)
+
+def where_lookup(hx: str):
+    data = cached_where(hx)
+    if data is not None:
+        log(">>> where " + hx + " (cache)")
+        return 0, data
+
+    if use_snapshot.get():
+        log(">>> where " + hx + " (snapshot)")
+        data = local_where(hx)
+        log(json.dumps(data, ensure_ascii=False))
+        where_cache.put(hx, data)
+        return 0, data
+
+    req = {"action": "where", "hex": hx}
+    log(">>> where " + hx)
+
+    rc, out, err = ssh_run_json(req)
+
+    if out.strip():
+        log(out.rstrip())
+    if err.strip():
+        log("STDERR:\n" + err.rstrip())
+
+    show_backend_warnings(out, err)
+
+    data = parse_last_json_blob(out) if rc == 0 else None
+    if data:
+        where_cache.put(hx, data)
+    return rc, data
+
 def do_where_hex():
     v = get_values_normalized()
     hx = (v.get("hex") or "").strip().upper()
@@ -311,24 +607,13 @@ def do_where_hex():
         messagebox.showerror("Errore", "HEX non valido.")
         return
 
-    req = {"action": "where", "hex": hx}
-    log(">>> where " + hx)
-
     try:
-        rc, out, err = ssh_run_json(req)
-
-        if out.strip():
-            log(out.rstrip())
-        if err.strip():
-            log("STDERR:\n" + err.rstrip())
-
-        show_backend_warnings(out, err)
+        rc, data = where_lookup(hx)
 
         if rc != 0:
             messagebox.showerror("Errore", f"Where fallito (RC={rc}).")
             return
 
-        data = parse_last_json_blob(out)
         if not data:
             messagebox.showinfo("Dove sta HEX", "HEX non presente in nessuna lista.")
             return
@@ -379,6 +664,27 @@ def format_diff_preview(diff_json: dict) -> str:
 
     return "\n".join(parts)
 
+def diff_lookup(clean_v: dict, label: str = "diff"):
+    # Il diff di conferma lo calcola sempre il backend (schema della lista, target_file):
+    # la cache dei "where" serve solo all'anteprima live
+    if use_snapshot.get():
+        log(f">>> {label} {clean_v.get('list', '')} {clean_v.get('hex', '')} (snapshot)")
+        return 0, local_diff(clean_v)
+
+    req_diff = {"action": "diff", **clean_v}
+    log(f">>> {label} {clean_v.get('list', '')} {clean_v.get('hex', '')}")
+
+    rc, out, err = ssh_run_json(req_diff)
+
+    if out.strip():
+        log(out.rstrip())
+    if err.strip():
+        log("STDERR:\n" + err.rstrip())
+
+    show_backend_warnings(out, err)
+
+    return rc, parse_last_json_blob(out) if rc == 0 else None
+
 def do_publish():
     v = get_values_normalized()
     if not validate_hex(v["hex"]):
@@ -386,28 +692,20 @@ def do_publish():
         return
 
     clean_v = {k: val for k, val in v.items() if (val or "").strip()}
-    req_diff = {"action": "diff", **clean_v}
-    log(">>> diff " + clean_v.get("list", "") + " " + clean_v.get("hex", ""))
 
     try:
-        rc, out, err = ssh_run_json(req_diff)
-
-        if out.strip():
-            log(out.rstrip())
-        if err.strip():
-            log("STDERR:\n" + err.rstrip())
-
-        show_backend_warnings(out, err)
+        rc, dj = diff_lookup(clean_v)
 
         if rc != 0:
             messagebox.showerror("Errore", f"Diff fallito (RC={rc}).")
             return
 
-        dj = parse_last_json_blob(out)
         if not dj:
             messagebox.showerror("Errore", "Backend non ha restituito JSON valido (diff).")
             return
 
+        where_cache.note_head(dj.get("head") or "")
+
         log("JSON diff ricevuto:")
         log(json.dumps(dj, indent=2, ensure_ascii=False))
 
@@ -432,7 +730,7 @@ def do_publish_direct(v: dict):
     log(">>> publish " + clean_v.get("list", "") + " " + clean_v.get("hex", ""))
 
     try:
-        rc, out, err = ssh_run_json(req)
+        rc, out, err = ssh_run_write(req)
 
         if out.strip():
             log(out.rstrip())
@@ -442,6 +740,10 @@ def do_publish_direct(v: dict):
         show_backend_warnings(out, err)
 
         if rc == 0:
+            where_cache.invalidate(clean_v.get("hex", ""))
+            refresh_snapshot_after_write()
+            on_form_change()
+            browse_invalidate()
             messagebox.showinfo("OK", "Salvato e pubblicato!")
         elif rc == 2:
             msg = extract_backend_error_line(out, err) or "Già presente e identico."
@@ -474,28 +776,20 @@ def do_move_to_list():
     v2["list"] = dest
 
     clean_v2 = {k: val for k, val in v2.items() if (val or "").strip()}
-    req_diff = {"action": "diff", **clean_v2}
-    log(">>> diff(move) " + dest + " " + v["hex"])
 
     try:
-        rc, out, err = ssh_run_json(req_diff)
-
-        if out.strip():
-            log(out.rstrip())
-        if err.strip():
-            log("STDERR:\n" + err.rstrip())
-
-        show_backend_warnings(out, err)
+        rc, dj = diff_lookup(clean_v2, "diff(move)")
 
         if rc != 0:
             messagebox.showerror("Errore", f"Diff(move) fallito (RC={rc}).")
             return
 
-        dj = parse_last_json_blob(out)
         if not dj:
             messagebox.showerror("Errore", "Backend non ha restituito JSON (diff(move)).")
             return
 
+        where_cache.note_head(dj.get("head") or "")
+
         log("JSON diff(move):")
         log(json.dumps(dj, indent=2, ensure_ascii=False))
 
@@ -511,7 +805,7 @@ def do_move_to_list():
         req = {"action": "publish", "push": True, **clean_v2}
         log(f">>> move/publish {dest} {v['hex']}")
 
-        rc2, out2, err2 = ssh_run_json(req)
+        rc2, out2, err2 = ssh_run_write(req)
 
         if out2.strip():
             log(out2.rstrip())
@@ -521,6 +815,10 @@ def do_move_to_list():
         show_backend_warnings(out2, err2)
 
         if rc2 == 0:
+            where_cache.invalidate(v["hex"])
+            refresh_snapshot_after_write()
+            on_form_change()
+            browse_invalidate()
             messagebox.showinfo("OK", f"Spostato in '{dest}'!")
         elif rc2 == 2:
             msg = extract_backend_error_line(out2, err2) or "Già corretto."
@@ -551,7 +849,7 @@ def do_delete():
     log(">>> delete " + hx)
 
     try:
-        rc, out, err = ssh_run_json(req)
+        rc, out, err = ssh_run_write(req)
 
         if out.strip():
             log(out.rstrip())
@@ -561,6 +859,10 @@ def do_delete():
         show_backend_warnings(out, err)
 
         if rc == 0:
+            where_cache.invalidate(hx)
+            refresh_snapshot_after_write()
+            on_form_change()
+            browse_invalidate()
             messagebox.showinfo("OK", f"{hx} eliminato da tutte le liste!")
         else:
             messagebox.showerror("Errore", f"Delete fallito (RC={rc}).")
@@ -568,6 +870,406 @@ def do_delete():
     except Exception as e:
         messagebox.showerror("Errore", str(e))
 
+def do_refresh_snapshot():
+    try:
+        man = refresh_snapshot()
+        messagebox.showinfo("Snapshot", f"Snapshot aggiornato.\nHEAD: {man.get('head', '')[:10]}")
+    except Exception as e:
+        messagebox.showerror("Errore", str(e))
+
+# ---------------- ANTEPRIMA LIVE ----------------
+# Il diff si calcola in locale contro il record "where" in cache; se manca, un thread
+# di sfondo lo chiede al backend (o allo snapshot) e il loop Tk raccoglie il risultato
+# con root.after, senza mai bloccarsi.
+# Lo stesso thread fa il prefetch: appena il campo HEX è valido parte un "where" a bassa
+# priorità (aspetta le richieste del thread Tk), così Dove sta HEX, il diff di publish e
+# lo spostamento trovano già il record in cache. Se l'HEX cambia il prefetch in corso
+# viene annullato e il suo risultato scartato.
+preview_jobs = queue.Queue()
+preview_results = queue.Queue()
+preview_state = {"after": None, "pending": set(), "text": None}
+prefetch_state = {"hex": "", "running": None, "ssh": None}
+prefetch_lock = threading.Lock()
+
+def prefetch_connected(hx: str, ssh):
+    with prefetch_lock:
+        prefetch_state["ssh"] = ssh
+        stale = prefetch_state["hex"] != hx
+    if stale:
+        ssh.close()
+
+def prefetch_cancel():
+    # Chiude la connessione del prefetch in corso se riguarda un altro HEX
+    with prefetch_lock:
+        ssh = prefetch_state["ssh"]
+        stale = prefetch_state["running"] not in (None, prefetch_state["hex"])
+    if ssh is not None and stale:
+        ssh.close()
+
+def preview_worker():
+    while True:
+        job = preview_jobs.get()
+        # Tiene solo l'ultimo HEX richiesto, gli altri sono già superati
+        skipped = []
+        while True:
+            try:
+                skipped.append(job)
+                job = preview_jobs.get_nowait()
+            except queue.Empty:
+                break
+        for hx, _ in skipped[:-1]:
+            preview_results.put((hx, None, None))
+
+        hx, local = job
+        if not local:
+            foreground_idle.wait()
+        with prefetch_lock:
+            if prefetch_state["hex"] != hx:
+                hx = None
+            else:
+                prefetch_state["running"] = hx
+        if hx is None:
+            preview_results.put((job[0], None, None))
+            continue
+        try:
+            if local:
+                data = {"hex": hx, "head": snapshot.get("head", ""),
+                        "locations": backend.find_hex_locations_with_records(hx, repo=Path(SNAPSHOT_DIR))}
+            else:
+                rc, out, err = ssh_run_json({"action": "where", "hex": hx},
+                                            on_connect=lambda ssh: prefetch_connected(hx, ssh))
+                data = parse_last_json_blob(out) if rc == 0 else None
+                if data is None:
+                    raise RuntimeError(extract_backend_error_line(out, err) or f"Where fallito (RC={rc}).")
+            preview_results.put((hx, data, None))
+        except Exception as e:
+            preview_results.put((hx, None, str(e)))
+        finally:
+            with prefetch_lock:
+                prefetch_state["running"] = prefetch_state["ssh"] = None
+
+def prefetch_where(hx: str):
+    if where_cache.get(hx) is not None or hx in preview_state["pending"]:
+        return
+    preview_state["pending"].add(hx)
+    preview_jobs.put((hx, use_snapshot.get() and bool(snapshot.get("head"))))
+
+def on_hex_change(*_):
+    hx = normalize_form({"hex": vars_["hex"].get()})["hex"]
+    with prefetch_lock:
+        prefetch_state["hex"] = hx if validate_hex(hx) else ""
+    prefetch_cancel()
+    if prefetch_state["hex"]:
+        prefetch_where(hx)
+
+def live_diff(v: dict, data: dict) -> dict:
+    # Stesso criterio di diff_against_target, sui campi del form
+    target = v.get("list", "")
+    locs = data.get("locations") or []
+    rec = next((x.get("record") or {} for x in locs if x.get("list") == target), None)
+
+    changes = []
+    for k, label in FIELDS:
+        new = backend._norm_cell(v.get(k, ""))
+        if not new:
+            continue
+        col = "atype" if k == "type" else k
+        if rec is not None and col not in rec:
+            continue  # colonna assente nello schema della lista (es. flyingdocs senza img)
+        old = (rec or {}).get(col, "")
+        if backend._norm_cell(old) != new:
+            changes.append({"field": label, "old": old, "new": new})
+
+    return {
+        "hex": v.get("hex", ""),
+        "target_list": target,
+        "exists_in_target": rec is not None,
+        "will_move_from": [x for x in locs if x.get("list") != target],
+        "changes": changes,
+    }
+
+def set_preview(text: str):
+    if text == preview_state["text"]:
+        return
+    preview_state["text"] = text
+    previewbox.configure(state="normal")
+    previewbox.delete("1.0", "end")
+    previewbox.insert("end", text)
+    previewbox.configure(state="disabled")
+
+def update_preview():
+    preview_state["after"] = None
+    raw = {k: vars_[k].get() for k, _ in FIELDS}
+    raw["list"] = vars_["list"].get()
+    v = normalize_form(raw)
+    hx = v["hex"]
+
+    if not hx:
+        set_preview("")
+        return
+    if not validate_hex(hx):
+        set_preview("HEX non valido (6 esadecimali, es: 33FD21).")
+        return
+
+    data = where_cache.get(hx)
+    if data is None:
+        prefetch_where(hx)
+        set_preview(f"HEX: {hx}\n\nLettura record attuale...")
+        return
+
+    set_preview(format_diff_preview(live_diff(v, data)))
+
+def on_form_change(*_):
+    if preview_state["after"] is not None:
+        root.after_cancel(preview_state["after"])
+    preview_state["after"] = root.after(PREVIEW_DELAY_MS, update_preview)
+
+def poll_preview():
+    current = normalize_form({"hex": vars_["hex"].get()})["hex"]
+    while True:
+        try:
+            hx, data, error = preview_results.get_nowait()
+        except queue.Empty:
+            break
+        preview_state["pending"].discard(hx)
+        if hx != current:
+            continue  # prefetch superato: l'HEX nel campo è cambiato
+        if data:
+            where_cache.put(hx, data)
+        if error:
+            set_preview(f"HEX: {hx}\n\nAnteprima non disponibile: {error}")
+        elif data:
+            update_preview()
+    root.after(PREVIEW_POLL_MS, poll_preview)
+
+# ---------------- MINIATURE ----------------
+# Un thread per campo scarica e riduce le immagini (adsb_thumbs.ThumbCache) e passa il PNG al loop
+# Tk, che crea solo il PhotoImage. Le richieste superate (URL cambiato nel frattempo)
+# vengono scartate; un URL già visto arriva dalla cache su disco senza rete.
+thumb_jobs = queue.Queue()
+thumb_results = queue.Queue()
+thumb_state = {"after": None, "urls": {}}
+thumb_cache = None
+
+def thumb_worker():
+    while True:
+        field, url = thumb_jobs.get()
+        if thumb_state["urls"].get(field) != url:
+            continue
+        try:
+            thumb_results.put((field, url, thumb_cache.fetch(url), None))
+        except Exception as e:
+            thumb_results.put((field, url, None, str(e)))
+
+def thumb_show(field: str, png=None, text: str = ""):
+    lbl = thumb_labels[field]
+    img = tk.PhotoImage(data=base64.b64encode(png).decode("ascii")) if png else ""
+    lbl.configure(image=img, text=text)
+    lbl.image = img  # riferimento: senza, Tk libera l'immagine
+
+def update_thumbs():
+    thumb_state["after"] = None
+    for field in THUMB_FIELDS:
+        url = normalize_form({field: vars_[field].get()})[field]
+        if url == thumb_state["urls"].get(field):
+            continue
+        thumb_state["urls"][field] = url
+        if not url:
+            thumb_show(field)
+        elif thumb_cache is None:
+            thumb_show(field, text="Pillow non installato")
+        else:
+            thumb_show(field, text="...")
+            thumb_jobs.put((field, url))
+
+def on_thumb_change(*_):
+    if thumb_state["after"] is not None:
+        root.after_cancel(thumb_state["after"])
+    thumb_state["after"] = root.after(PREVIEW_DELAY_MS, update_thumbs)
+
+def on_thumb_click(field: str):
+    url = thumb_state["urls"].get(field)
+    if url:
+        webbrowser.open_new_tab(url)
+
+def poll_thumbs():
+    while True:
+        try:
+            field, url, png, error = thumb_results.get_nowait()
+        except queue.Empty:
+            break
+        if thumb_state["urls"].get(field) != url:
+            continue
+        try:
+            thumb_show(field, png, "" if png else f"Errore: {error}")
+        except tk.TclError as e:
+            thumb_show(field, text=f"Errore: {e}")
+    root.after(PREVIEW_POLL_MS, poll_thumbs)
+
+# ---------------- SFOGLIA LISTA ----------------
+# Treeview virtuale: contiene solo le BROWSE_ROWS righe visibili, la barra di
+# scorrimento rappresenta la posizione nell'intera lista. Le righe arrivano a blocchi
+# di BROWSE_BLOCK dall'azione "page" (snapshot locale o SSH) in un thread di sfondo; in
+# memoria restano al più BROWSE_CACHE_BLOCKS blocchi, qualunque sia la lunghezza della lista.
+# Nessuna richiesta all'avvio: la prima pagina si carica con Aggiorna, lista, ordinamento o filtro.
+browse_jobs = queue.Queue()
+browse_results = queue.Queue()
+browse_state = {"offset": 0, "total": None, "sort": "hex", "desc": False, "head": "",
+                "blocks": OrderedDict(), "pending": set(), "after": None, "loaded": False}
+
+def browse_query() -> tuple:
+    return (browse_list.get(), browse_state["sort"], browse_state["desc"], browse_filter.get().strip())
+
+def browse_worker():
+    while True:
+        jobs = [browse_jobs.get()]
+        while True:
+            try:
+                jobs.append(browse_jobs.get_nowait())
+            except queue.Empty:
+                break
+        # Solo il blocco richiesto per ultimo: gli altri, se ancora visibili, vengono richiesti di nuovo
+        for query, block, _ in jobs[:-1]:
+            browse_results.put((query, block, None, None))
+
+        query, block, local = jobs[-1]
+        if not local:
+            foreground_idle.wait()  # come il prefetch: prima le richieste avviate dall'utente
+        req = {"action": "page", "list": query[0], "sort": query[1], "desc": query[2], "filter": query[3],
+               "offset": block * BROWSE_BLOCK, "limit": BROWSE_BLOCK}
+        try:
+            if local:
+                args = backend.args_from_request(req)
+                data = backend.page_result(args, Path(SNAPSHOT_DIR), snapshot.get("head", ""))
+            else:
+                rc, out, err = ssh_run_json(req)
+                data = parse_last_json_blob(out) if rc == 0 else None
+                if data is None:
+                    raise RuntimeError(extract_backend_error_line(out, err) or f"Page fallito (RC={rc}).")
+            browse_results.put((query, block, data, None))
+        except (Exception, SystemExit) as e:
+            browse_results.put((query, block, None, str(e)))
+
+def browse_row(pos: int):
+    # Record alla posizione pos, o None se il suo blocco non è ancora arrivato (lo richiede)
+    query = browse_query()
+    block = pos // BROWSE_BLOCK
+    rows = browse_state["blocks"].get((query, block))
+    if rows is not None:
+        browse_state["blocks"].move_to_end((query, block))
+        return rows[pos % BROWSE_BLOCK] if pos % BROWSE_BLOCK < len(rows) else None
+    if (query, block) not in browse_state["pending"]:
+        browse_state["pending"].add((query, block))
+        browse_jobs.put((query, block, use_snapshot.get() and bool(snapshot.get("head"))))
+    return None
+
+def browse_render():
+    tree.delete(*tree.get_children())
+    if not browse_state["loaded"]:
+        browse_status.set("Premi Aggiorna per caricare")
+        return
+    off, total = browse_state["offset"], browse_state["total"]
+    # Totale ancora ignoto: una riga segnaposto che fa partire la richiesta del primo blocco
+    stop = off + 1 if total is None else min(off + BROWSE_ROWS, total)
+    for pos in range(off, stop):
+        rec = browse_row(pos)
+        values = [rec.get(k, "") for k, _ in BROWSE_COLUMNS] if rec else ["..."] + [""] * (len(BROWSE_COLUMNS) - 1)
+        tree.insert("", "end", iid=str(pos), values=values)
+    if total:
+        browse_scroll.set(off / total, stop / total)
+        browse_status.set(f"{off + 1}-{stop} di {total}")
+    else:
+        browse_scroll.set(0, 1)
+        browse_status.set("" if total is None else "Nessuna riga")
+
+def browse_clamp(off: int) -> int:
+    return max(0, min(off, (browse_state["total"] or 0) - BROWSE_ROWS))
+
+def browse_goto(off: int):
+    off = browse_clamp(off)
+    if off != browse_state["offset"]:
+        browse_state["offset"] = off
+        browse_render()
+
+def on_browse_scroll(*a):
+    if a[0] == "moveto":
+        browse_goto(int(float(a[1]) * (browse_state["total"] or 0)))
+    elif a[0] == "scroll":
+        step = BROWSE_ROWS if a[2] == "pages" else 1
+        browse_goto(browse_state["offset"] + int(a[1]) * step)
+
+def on_browse_wheel(event):
+    if getattr(event, "num", 0) in (4, 5):
+        delta = -1 if event.num == 4 else 1
+    else:
+        delta = -1 if event.delta > 0 else 1
+    browse_goto(browse_state["offset"] + 3 * delta)
+    return "break"
+
+def browse_reload(*_):
+    browse_state.update(offset=0, total=None, head="", loaded=True)
+    browse_state["blocks"].clear()
+    browse_render()
+
+def browse_invalidate():
+    # Dopo una modifica: stessa posizione, righe rilette (se la lista è già stata caricata)
+    if not browse_state["loaded"]:
+        return
+    browse_state["blocks"].clear()
+    browse_state["head"] = ""
+    browse_render()
+
+def on_browse_filter(*_):
+    if browse_state["after"] is not None:
+        root.after_cancel(browse_state["after"])
+    browse_state["after"] = root.after(PREVIEW_DELAY_MS, browse_reload)
+
+def on_browse_sort(key: str):
+    if browse_state["sort"] == key:
+        browse_state["desc"] = not browse_state["desc"]
+    else:
+        browse_state.update(sort=key, desc=False)
+    browse_reload()
+
+def on_browse_select(_=None):
+    sel = tree.selection()
+    if not sel:
+        return
+    rec = browse_row(int(sel[0]))
+    if rec:
+        vars_["list"].set(browse_list.get())
+        fill_gui_from_record(rec)
+
+def poll_browse():
+    query, changed = browse_query(), False
+    while True:
+        try:
+            q, block, data, error = browse_results.get_nowait()
+        except queue.Empty:
+            break
+        browse_state["pending"].discard((q, block))
+        if q != query:
+            continue
+        changed = True
+        if error:
+            log(f"Sfoglia lista: {error}")
+            continue
+        if not data:
+            continue
+        blocks = browse_state["blocks"]
+        if data.get("head") != browse_state["head"]:
+            # La lista è cambiata (nuovo HEAD): i blocchi vecchi non sono più validi
+            blocks.clear()
+            browse_state["head"] = data.get("head", "")
+        blocks[(q, block)] = data.get("rows") or []
+        while len(blocks) > BROWSE_CACHE_BLOCKS:
+            blocks.popitem(last=False)
+        browse_state["total"] = int(data.get("total") or 0)
+    if changed:
+        browse_state["offset"] = browse_clamp(browse_state["offset"])
+        browse_render()
+    root.after(PREVIEW_POLL_MS, poll_browse)
+
 # External sites
 def do_open_planespotters():
     v = get_values_normalized()
@@ -652,14 +1354,90 @@ mv.grid(row=2, column=2, padx=4, pady=(8, 0), sticky="w")
 ttk.Button(btns, text="Sposta", command=do_move_to_list).grid(row=2, column=3, padx=4, pady=(8, 0))
 ttk.Button(btns, text="Elimina", command=do_delete, style="Accent.TButton").grid(row=2, column=4, padx=(0,8), pady=(8, 0))
 
+ttk.Checkbutton(btns, text="Snapshot locale", variable=use_snapshot).grid(row=3, column=0, padx=4, pady=(8, 0), sticky="w")
+ttk.Button(btns, text="Aggiorna snapshot", command=do_refresh_snapshot).grid(row=3, column=1, padx=4, pady=(8, 0))
+
+thumbs_frame = ttk.LabelFrame(top, text="Immagini", padding=4)
+thumbs_frame.grid(row=r+1, column=0, columnspan=2, sticky="we", pady=(6, 0))
+thumb_labels = {}
+for i, k in enumerate(THUMB_FIELDS):
+    thumbs_frame.columnconfigure(i, weight=1, minsize=adsb_thumbs.THUMB_SIZE[0] + 8)
+    ttk.Label(thumbs_frame, text=dict(FIELDS)[k]).grid(row=0, column=i)
+    tl = ttk.Label(thumbs_frame, anchor="center", compound="center", wraplength=adsb_thumbs.THUMB_SIZE[0])
+    tl.grid(row=1, column=i, sticky="n")
+    tl.bind("<Button-1>", lambda _e, k=k: on_thumb_click(k))
+    thumb_labels[k] = tl
+    Tooltip(tl, "Clic: apre l'immagine nel browser")
+r += 1
+
+preview_frame = ttk.LabelFrame(top, text="Anteprima modifiche", padding=4)
+preview_frame.grid(row=r+1, column=0, columnspan=2, sticky="nsew", pady=(6, 0))
+preview_frame.columnconfigure(0, weight=1)
+previewbox = scrolledtext.ScrolledText(preview_frame, height=8, state="disabled")
+previewbox.grid(row=0, column=0, sticky="nsew")
+
+browse_frame = ttk.LabelFrame(top, text="Sfoglia lista", padding=4)
+browse_frame.grid(row=0, column=2, rowspan=r+3, sticky="nsew", padx=(10, 0))
+browse_frame.columnconfigure(0, weight=1)
+browse_frame.rowconfigure(1, weight=1)
+top.columnconfigure(2, weight=1)
+
+browse_bar = ttk.Frame(browse_frame)
+browse_bar.grid(row=0, column=0, columnspan=2, sticky="we", pady=(0, 4))
+browse_list = tk.StringVar(value="mil")
+browse_filter = tk.StringVar()
+browse_status = tk.StringVar()
+bl = ttk.Combobox(browse_bar, textvariable=browse_list, values=LIST_VALUES, width=12, state="readonly")
+bl.grid(row=0, column=0, padx=(0, 4))
+bl.bind("<<ComboboxSelected>>", browse_reload)
+ttk.Label(browse_bar, text="Filtro").grid(row=0, column=1, padx=4)
+bf = ttk.Entry(browse_bar, textvariable=browse_filter, width=24)
+bf.grid(row=0, column=2, padx=4)
+bind_right_click_paste(bf)
+ttk.Button(browse_bar, text="Aggiorna", command=browse_reload).grid(row=0, column=3, padx=4)
+ttk.Label(browse_bar, textvariable=browse_status).grid(row=0, column=4, padx=4)
+
+tree = ttk.Treeview(browse_frame, columns=[k for k, _ in BROWSE_COLUMNS], show="headings",
+                    height=BROWSE_ROWS, selectmode="browse")
+for k, label in BROWSE_COLUMNS:
+    tree.heading(k, text=label, command=lambda k=k: on_browse_sort(k))
+    tree.column(k, width=70 if k in ("hex", "icao_type") else 110, stretch=k not in ("hex", "icao_type"))
+tree.grid(row=1, column=0, sticky="nsew")
+browse_scroll = ttk.Scrollbar(browse_frame, orient="vertical", command=on_browse_scroll)
+browse_scroll.grid(row=1, column=1, sticky="ns")
+tree.bind("<<TreeviewSelect>>", on_browse_select)
+for ev in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+    tree.bind(ev, on_browse_wheel)
+
 logbox = scrolledtext.ScrolledText(top, height=12, state="disabled")
-logbox.grid(row=r+1, column=0, columnspan=2, sticky="nsew", pady=(6, 0))
-top.rowconfigure(r+1, weight=1)
+logbox.grid(row=r+2, column=0, columnspan=2, sticky="nsew", pady=(6, 0))
+top.rowconfigure(r+2, weight=1)
 
 ttk.Label(top, text=f"SSH: {USER}@{HOST} | Backend: {REMOTE_CMD} | Key: {KEY_PATH}").grid(
-    row=r+2, column=0, columnspan=2, sticky="w", pady=(6, 0)
+    row=r+3, column=0, columnspan=2, sticky="w", pady=(6, 0)
 )
 
 vars_["cmpg"].set(CMPG_DEFAULT["mil"])
 
+for k in ["list"] + [k for k, _ in FIELDS]:
+    vars_[k].trace_add("write", on_form_change)
+use_snapshot.trace_add("write", on_form_change)
+vars_["hex"].trace_add("write", on_hex_change)
+browse_filter.trace_add("write", on_browse_filter)
+for k in THUMB_FIELDS:
+    vars_[k].trace_add("write", on_thumb_change)
+
+threading.Thread(target=preview_worker, daemon=True).start()
+root.after(PREVIEW_POLL_MS, poll_preview)
+
+if adsb_thumbs.thumbs_available():
+    thumb_cache = adsb_thumbs.ThumbCache()
+    for _ in THUMB_FIELDS:
+        threading.Thread(target=thumb_worker, daemon=True).start()
+root.after(PREVIEW_POLL_MS, poll_thumbs)
+
+threading.Thread(target=browse_worker, daemon=True).start()
+root.after(PREVIEW_POLL_MS, poll_browse)
+browse_render()
+
 root.mainloop()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Cache su disco delle miniature di ImageLink1..4 per la GUI.
+# Download, decodifica e riduzione avvengono fuori dal thread Tk; su disco restano solo
+# PNG piccoli (<sha1 dell'URL>.png) in un LRU per data di ultimo uso, con tetto in MB.
+# Un aereo già visto si ridisegna dalla cache, senza rete. Decodifica con Pillow (opzionale).
+#   python adsb_thumbs.py https://example.org/foto.jpg
+import hashlib, io, os, sys, threading, time
+from pathlib import Path
+
+THUMB_DIR = Path(os.getenv("ADSB_THUMB_DIR", os.path.join(os.path.expanduser("~"), ".adsb-list-editor", "thumbs")))
+THUMB_CACHE_MB = float(os.getenv("ADSB_THUMB_CACHE_MB", "50"))
+THUMB_SIZE = (160, 120)
+THUMB_TIMEOUT = float(os.getenv("ADSB_THUMB_TIMEOUT", "10"))
+THUMB_MAX_DOWNLOAD = 20 * 1024 * 1024
+THUMB_RETRY_S = 300  # un URL fallito non viene richiesto di nuovo prima di così
+
+
+def thumbs_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ThumbCache:
+    def __init__(self, root: Path = THUMB_DIR, max_mb: float = THUMB_CACHE_MB, size=THUMB_SIZE):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.size = size
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = sum(p.stat().st_size for p in self.root.glob("*.png"))
+        self._failed = {}  # url -> (monotonic, messaggio)
+        self.hits = self.misses = 0
+
+    def path(self, url: str) -> Path:
+        return self.root / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".png")
+
+    def get(self, url: str):
+        # PNG della miniatura se in cache (e ne aggiorna l'ultimo uso), altrimenti None
+        p = self.path(url)
+        try:
+            data = p.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return data
+
+    def fetch(self, url: str) -> bytes:
+        data = self.get(url)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+
+        failed = self._failed.get(url)
+        if failed and time.monotonic() - failed[0] < THUMB_RETRY_S:
+            raise RuntimeError(failed[1])
+        try:
+            data = self.make_thumb(self.download(url))
+        except Exception as e:
+            self._failed[url] = (time.monotonic(), str(e))
+            raise
+        self._failed.pop(url, None)
+        self.store(url, data)
+        return data
+
+    def download(self, url: str) -> bytes:
+        import urllib.request
+        if not url.startswith(("http://", "https://")):
+            raise RuntimeError("URL non http(s)")
+        req = urllib.request.Request(url, headers={"User-Agent": "adsb-list-editor"})
+        with urllib.request.urlopen(req, timeout=THUMB_TIMEOUT) as r:
+            data = r.read(THUMB_MAX_DOWNLOAD + 1)
+        if len(data) > THUMB_MAX_DOWNLOAD:
+            raise RuntimeError(f"immagine oltre {THUMB_MAX_DOWNLOAD // (1024 * 1024)} MB")
+        return data
+
+    def make_thumb(self, data: bytes) -> bytes:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise RuntimeError("Pillow non installato (pip install Pillow)")
+        with Image.open(io.BytesIO(data)) as im:
+            im.draft("RGB", self.size)  # JPEG: decodifica già ridotta, molto più veloce
+            im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+            im.thumbnail(self.size)
+            out = io.BytesIO()
+            im.save(out, "PNG", optimize=True)
+        return out.getvalue()
+
+    def store(self, url: str, data: bytes):
+        p = self.path(url)
+        tmp = p.with_name(f"{p.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            try:
+                old = p.stat().st_size
+            except OSError:
+                old = 0
+            os.replace(tmp, p)
+            self._bytes += len(data) - old
+            if self._bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Via le miniature usate meno di recente fino a scendere al 90% del tetto
+        files = []
+        for p in self.root.glob("*.png"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, p in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._bytes = total
+
+
+def main():
+    cache = ThumbCache()
+    for url in sys.argv[1:]:
+        t0 = time.perf_counter()
+        try:
+            data = cache.fetch(url)
+        except Exception as e:
+            print(f"ERROR: {url}: {e}", file=sys.stderr)
+            continue
+        print(f"{cache.path(url)}  {len(data)} byte  {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+# Benchmark del backend df_list_edit.py (nessuna dipendenza oltre a quelle del backend).
+#   python bench_backend.py framing --rows 100000
+#   python bench_backend.py contention --clients 16
+#   python bench_backend.py scan --rows 200000
+#   python bench_backend.py server --clients 32 --requests 200
+#   python bench_backend.py history --commits 300
+#   python bench_backend.py shards --rows 200000
+#   python bench_backend.py codec --rows 100000
+#   python bench_backend.py sort --rows 500000 --mem-mb 16
+#   python bench_backend.py push --editors 4 --edits 10
+#   python bench_backend.py range --rows 200000 --queries 1000
+#   python bench_backend.py reconcile --rows 100000 --reference 1000000
+#   python bench_backend.py startup --runs 20 --budget-ms 50 --import-budget-ms 30   (rc 1 fuori budget)
+#   python bench_backend.py thumbs --aircraft 20 --latency-ms 80   (serve Pillow)
+import argparse, asyncio, contextlib, io, json, os, random, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import df_list_edit as backend
+
+
+def fake_rows(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    ops = ["Aeronautica Militare", "Luftwaffe", "Polizia di Stato", "Avincis", "US Air Force"]
+    types = [("Airbus A400", "A400"), ("AW139", "A139"), ("H145", "EC45"), ("C-130J", "C30J")]
+    rows = []
+    for i in range(n):
+        hx = f"{rnd.randrange(1 << 24):06X}"
+        t, it = rnd.choice(types)
+        rows.append([
+            hx, f"MM{i:05d}", rnd.choice(ops), t, it, "Mil", "", "", f"IAM{i % 9999}",
+            "Mil", f"https://www.example.org/{hx}", f"https://img.example.org/{hx}.jpg", "", "", "",
+        ])
+    return rows
+
+
+HEADER = ["$ICAO", "$Registration", "$Operator", "$Type", "$ICAO Type", "#CMPG", "$Tag 1", "$#Tag 2",
+          "$#Tag 3", "Category", "$#Link", "#ImageLink", "#ImageLink2", "#ImageLink3", "#ImageLink4"]
+
+BACKEND = str(Path(__file__).resolve().with_name("df_list_edit.py"))
+SERVER = str(Path(__file__).resolve().with_name("df_list_server.py"))
+
+
+def _git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_fixture(tmp: Path, rows: int) -> Path:
+    # Remote bare locale + clone con tutte le liste di FILES
+    remote, seed, repo = tmp / "remote.git", tmp / "seed", tmp / "repo"
+    _git("init", "-q", "--bare", "-b", backend.BRANCH, str(remote))
+    _git("init", "-q", "-b", backend.BRANCH, str(seed))
+    all_rows = sorted(fake_rows(rows), key=lambda r: r[0])
+    for i, fn in enumerate(backend.FILES.values()):
+        backend.write_csv_file(seed / fn, HEADER, all_rows[i::len(backend.FILES)])
+    _git("add", "-A", cwd=seed)
+    _git("-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-qm", "init", cwd=seed)
+    _git("push", "-q", str(remote), backend.BRANCH, cwd=seed)
+    _git("clone", "-q", "-b", backend.BRANCH, str(remote), str(repo))
+    _git("config", "user.name", "bench", cwd=repo)
+    _git("config", "user.email", "bench@localhost", cwd=repo)
+    return repo
+
+
+def run_clients(repo: Path, reqs, env=None):
+    # Lancia un processo backend per richiesta, tutti insieme; ritorna (secondi, [rc])
+    env = {**os.environ, "ADSB_REPO_PATH": str(repo), **(env or {})}
+    t0 = time.perf_counter()
+    procs = []
+    for req in reqs:
+        p = subprocess.Popen([sys.executable, BACKEND, "--stdin-json"], env=env, stdin=subprocess.PIPE,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        p.stdin.write(json.dumps(req).encode("utf-8"))
+        p.stdin.close()
+        procs.append(p)
+    rcs = [p.wait() for p in procs]
+    return time.perf_counter() - t0, rcs
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def bench_framing(a):
+    payload = {"since": "0" * 40, "head": "1" * 40, "reset": False,
+               "lists": {"plane-alert-mil-images.csv": {"list": "mil", "added": fake_rows(a.rows),
+                                                        "changed": [], "removed": []}}}
+
+    plain = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+    t = _timeit(lambda: json.loads(plain.decode("utf-8")))
+    print(f"{'plain json':<16} {len(plain):>12,d} B  decode {t * 1000:8.1f} ms")
+
+    for codec in [c for c in backend.frame_codecs() if c != "none"]:
+        for encoding in backend.frame_encodings():
+            fr = backend.Framer(None, codec, encoding)
+            blob = fr.header()[len(backend.FRAME_MAGIC):] + fr.encode(b"J", payload)
+
+            def decode():
+                for _ in backend.read_frames(io.BytesIO(blob).read):
+                    pass
+
+            t = _timeit(decode)
+            label = f"{codec}/{encoding}"
+            print(f"{label:<16} {len(blob):>12,d} B  decode {t * 1000:8.1f} ms  ({len(blob) / len(plain):.1%})")
+
+
+def bench_contention(a):
+    for coalesce in ("0", "1"):
+        with tempfile.TemporaryDirectory() as td:
+            repo = make_fixture(Path(td), a.rows)
+            n0 = int(subprocess.run(["git", "-C", str(repo), "rev-list", "--count", "HEAD"],
+                                    capture_output=True, text=True).stdout)
+            reqs = [{"action": "publish", "list": "mil", "hex": f"FF{i:04X}", "reg": f"B{i}", "push": True}
+                    for i in range(a.clients)]
+            dt, rcs = run_clients(repo, reqs, {"ADSB_COALESCE": coalesce})
+            n1 = int(subprocess.run(["git", "-C", str(repo), "rev-list", "--count", "origin/" + backend.BRANCH],
+                                    capture_output=True, text=True).stdout)
+            ok = sum(1 for rc in rcs if rc == 0)
+            print(f"coalesce={coalesce}  clients={a.clients}  ok={ok}  commits={n1 - n0}  "
+                  f"{dt:6.2f} s  {a.clients / dt:6.2f} req/s")
+
+
+def bench_scan(a):
+    text = backend.to_line(HEADER) + "".join(backend.to_line(r) for r in fake_rows(a.rows))
+    missing = "000000"
+
+    def old_scan():
+        # Percorso precedente: csv.reader per ogni riga e confronto su r[0]
+        lines = text.splitlines()
+        rows = [backend.parse_line(x) for x in lines[1:] if x.strip()]
+        return next((r for r in rows if r and (r[0] or "").strip().upper() == missing), None)
+
+    def lazy_scan():
+        return backend.ListScan(text).find(missing)
+
+    def lazy_full():
+        return backend.ListScan(text).rows()
+
+    t_old = _timeit(old_scan)
+    t_new = _timeit(lazy_scan)
+    t_full = _timeit(lazy_full)
+    print(f"rows={a.rows}  size={len(text) / 1e6:.1f} MB")
+    print(f"parse_line per riga     {t_old * 1000:8.1f} ms")
+    print(f"ListScan (solo chiavi)  {t_new * 1000:8.1f} ms  x{t_old / t_new:.1f}")
+    print(f"ListScan + tutte righe  {t_full * 1000:8.1f} ms")
+
+
+def _pct(xs, q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+async def _server_client(sock: str, reqs, lat):
+    # Una connessione, richieste in pipeline: latenza = invio -> risposta con lo stesso id
+    reader, writer = await asyncio.open_unix_connection(sock, limit=64 * 1024 * 1024)
+    sent = {}
+    for i, req in enumerate(reqs):
+        sent[i] = time.perf_counter()
+        writer.write((json.dumps({**req, "id": i}) + "\n").encode("utf-8"))
+    await writer.drain()
+    bad = 0
+    for _ in reqs:
+        resp = json.loads(await reader.readline())
+        lat.append(time.perf_counter() - sent[resp["id"]])
+        bad += resp["rc"] != 0
+    writer.close()
+    return bad
+
+
+def bench_server(a):
+    with tempfile.TemporaryDirectory() as td:
+        repo = make_fixture(Path(td), a.rows)
+        sock = str(Path(td) / "server.sock")
+        env = {**os.environ, "ADSB_REPO_PATH": str(repo)}
+        srv = subprocess.Popen([sys.executable, SERVER, "--unix", sock], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(sock):
+                if srv.poll() is not None:
+                    raise SystemExit("ERROR: il server non è partito")
+                time.sleep(0.05)
+
+            hexes = [r[0] for r in fake_rows(a.rows)]
+            rnd = random.Random(2)
+
+            def req():
+                hx = rnd.choice(hexes)
+                if rnd.random() < 0.5:
+                    return {"action": "where", "hex": hx}
+                return {"action": "diff", "list": "mil", "hex": hx, "reg": "BENCH"}
+
+            async def run():
+                lat = []
+                await _server_client(sock, [{"action": "ping"}], [])
+                t0 = time.perf_counter()
+                bad = await asyncio.gather(*[_server_client(sock, [req() for _ in range(a.requests)], lat)
+                                             for _ in range(a.clients)])
+                return time.perf_counter() - t0, lat, sum(bad)
+
+            dt, lat, bad = asyncio.run(run())
+        finally:
+            srv.terminate()
+            srv.wait()
+
+    n = len(lat)
+    print(f"clients={a.clients}  richieste={n}  errori={bad}  {dt:6.2f} s  {n / dt:8.1f} req/s")
+    print(f"latenza p50 {_pct(lat, 0.50) * 1000:7.1f} ms  p95 {_pct(lat, 0.95) * 1000:7.1f} ms  "
+          f"p99 {_pct(lat, 0.99) * 1000:7.1f} ms")
+
+
+def bench_history(a):
+    with tempfile.TemporaryDirectory() as td:
+        repo = make_fixture(Path(td), a.rows)
+        rnd = random.Random(3)
+        fn = backend.FILES["mil"]
+        header, rows = backend.read_csv_file(repo / fn)
+        target = rows[len(rows) // 2][0]
+        # Commit sintetici: ognuno modifica qualche riga, uno su dieci tocca l'HEX misurato
+        for i in range(a.commits):
+            picks = rnd.sample(range(len(rows)), 3)
+            if i % 10 == 0:
+                picks[0] = len(rows) // 2
+            for j in picks:
+                rows[j] = list(rows[j])
+                rows[j][1] = f"R{i}-{j}"
+            backend.write_csv_file(repo / fn, header, rows)
+            _git("commit", "-qam", f"bench {i}", cwd=repo)
+        head = backend.git_head(repo)
+
+        t_log = _timeit(lambda: subprocess.run(["git", "-C", str(repo), "log", "--format=%H", f"-S{target}", "--", fn],
+                                               capture_output=True, check=True), repeat=1)
+        t0 = time.perf_counter()
+        backend.update_history_index(repo, head)
+        t_build = time.perf_counter() - t0
+        t_query = _timeit(lambda: backend.history_result(repo, target, head))
+        n = len(backend.history_versions(repo, target))
+
+        rows[0] = list(rows[0])
+        rows[0][1] = "NEXT"
+        backend.write_csv_file(repo / fn, header, rows)
+        _git("commit", "-qam", "bench next", cwd=repo)
+        t0 = time.perf_counter()
+        backend.history_result(repo, target, backend.git_head(repo))
+        t_inc = time.perf_counter() - t0
+
+    print(f"commits={a.commits}  rows={a.rows}  versioni di {target}: {n}")
+    print(f"git log -S               {t_log * 1000:8.1f} ms")
+    print(f"indice (costruzione)     {t_build * 1000:8.1f} ms  una tantum, poi solo i commit nuovi")
+    print(f"history (indice pronto)  {t_query * 1000:8.1f} ms")
+    print(f"history (+1 commit)      {t_inc * 1000:8.1f} ms")
+
+
+def bench_shards(a):
+    import df_list_shards
+    rows = sorted(fake_rows(a.rows), key=backend.row_key)
+    for shards in (1, 16, 256):
+        with tempfile.TemporaryDirectory() as td:
+            repo = Path(td)
+            for lk, fn in backend.FILES.items():
+                backend.write_csv_file(repo / fn, HEADER, rows if lk == "civcur" else [])
+            if shards > 1:
+                df_list_shards.split_list(repo, "civcur", shards)
+
+            rnd = random.Random(4)
+            written, t0 = 0, time.perf_counter()
+            for i in range(a.edits):
+                args = backend.args_from_request({"action": "publish", "list": "civ",
+                                                  "hex": rnd.choice(rows)[0], "reg": f"E{i}"})
+                backend.apply_list_aliases(args)
+                hx = backend.apply_args_normalizations(args)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    written += sum(p.stat().st_size for p in backend.write_csv(repo, args, hx))
+            dt = (time.perf_counter() - t0) / a.edits
+
+        label = "file unico" if shards == 1 else f"{shards} shard"
+        print(f"{label:<12} edit {dt * 1000:8.1f} ms  riscritti {written / a.edits / 1e6:7.2f} MB/edit")
+
+
+def bench_range(a):
+    # Blocchi ICAO: scansione di tutte le liste vs due bisect sull'indice ordinato
+    rows = fake_rows(a.rows)
+    rnd = random.Random(5)
+    blocks = [f"{rnd.randrange(1 << 24) >> 8:04X}" for _ in range(a.queries)]
+    with tempfile.TemporaryDirectory() as td:
+        repo = Path(td)
+        for i, fn in enumerate(backend.FILES.values()):
+            backend.write_csv_file(repo / fn, HEADER, rows[i::len(backend.FILES)])
+
+        def scan_all(block):
+            lo, hi = block + "00", block + "FF"
+            return sum(1 for _lk, _fn, p in backend.iter_list_files(repo)
+                       for k in backend.scan_csv_file(p).keys if lo <= k <= hi)
+
+        def query(block, gaps=False):
+            args = backend.args_from_request({"action": "range", "from": block, "gaps": gaps})
+            return backend.range_result(args, repo, "")["total"]
+
+        t0 = time.perf_counter()
+        query(blocks[0])
+        t_build = time.perf_counter() - t0
+        n = max(1, a.queries // 20)
+        t0 = time.perf_counter()
+        assert all(scan_all(b) == query(b) for b in blocks[:n])
+        t_scan = (time.perf_counter() - t0) / n
+        for gaps in (False, True):
+            t0 = time.perf_counter()
+            for b in blocks:
+                query(b, gaps)
+            t = (time.perf_counter() - t0) / len(blocks)
+            label = "range + gaps" if gaps else "range"
+            print(f"{label:<16} {t * 1e6:9.1f} us/query  x{t_scan / t:.0f}")
+        print(f"scansione liste  {t_scan * 1e6:9.1f} us/query  (indice costruito in {t_build * 1000:.1f} ms, "
+              f"una volta per versione dei file)")
+
+
+def bench_codec(a):
+    rows = fake_rows(a.rows)
+
+    def old_records():
+        # Percorso precedente: dict header->valore e rimappatura con regex per ogni colonna
+        out = []
+        for r in rows:
+            raw = {HEADER[i]: r[i] for i in range(len(HEADER))}
+            out.append({backend.FIELD_BY_COLUMN[k]: (v or "").strip()
+                        for k, v in ((backend._clean_colname(k), v) for k, v in raw.items())
+                        if k in backend.FIELD_BY_COLUMN})
+        return out
+
+    def schema_records():
+        schema = backend.list_schema(HEADER)
+        return [schema.record(r) for r in rows]
+
+    assert old_records() == schema_records()
+    t_old = _timeit(old_records)
+    t_new = _timeit(schema_records)
+    print(f"rows={a.rows}")
+    print(f"rimappatura per riga  {t_old * 1000:8.1f} ms")
+    print(f"ListSchema.record     {t_new * 1000:8.1f} ms  x{t_old / t_new:.1f}")
+
+
+def _sort_child(a):
+    # Gira in un processo separato: stampa tempo e picco RSS (KB) del solo ordinamento
+    import resource
+    path = Path(a.child_file)
+    key = backend.row_key
+    if a.child == "write":
+        return backend.write_csv_file(path, HEADER, fake_rows(a.rows))
+    t0 = time.perf_counter()
+    if a.child == "memory":
+        _h, rows = backend.read_csv_file(path)
+        rows.sort(key=key)
+        n = len(rows)
+    else:
+        _h, rows = backend.iter_csv_rows(path)
+        with tempfile.TemporaryDirectory(dir=path.parent) as td:
+            n = sum(1 for _ in backend.external_sort(rows, key, Path(td), a.mem_mb))
+    dt = time.perf_counter() - t0
+    print(json.dumps({"n": n, "s": dt, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def bench_sort(a):
+    if a.child:
+        return _sort_child(a)
+    with tempfile.TemporaryDirectory() as td:
+        src = Path(td) / "big.csv"
+        # Anche il file si genera in un figlio: su Linux ru_maxrss del figlio parte dal
+        # picco del padre al momento del fork, che deve restare basso
+        subprocess.run([sys.executable, __file__, "sort", "--child", "write", "--child-file", str(src),
+                        "--rows", str(a.rows)], check=True)
+        print(f"rows={a.rows} file={src.stat().st_size / 1e6:.1f} MB mem_mb={a.mem_mb}")
+        for mode in ("memory", "external"):
+            out = subprocess.run([sys.executable, __file__, "sort", "--child", mode, "--child-file", str(src),
+                                  "--mem-mb", str(a.mem_mb)], check=True, capture_output=True, text=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:<9} {r['s'] * 1000:8.0f} ms  picco RSS {r['rss_kb'] / 1024:7.1f} MB  ({r['n']} righe)")
+
+
+def bench_push(a):
+    # N editor, ognuno col proprio clone dello stesso remote bare, pubblicano in parallelo
+    import threading
+    for retries in ("0", str(backend.PUSH_RETRIES)):
+        with tempfile.TemporaryDirectory() as td:
+            tmp = Path(td)
+            make_fixture(tmp, a.rows)
+            remote = tmp / "remote.git"
+            clones = []
+            for e in range(a.editors):
+                c = tmp / f"editor{e}"
+                _git("clone", "-q", "-b", backend.BRANCH, str(remote), str(c))
+                _git("config", "user.name", f"editor{e}", cwd=c)
+                _git("config", "user.email", "bench@localhost", cwd=c)
+                clones.append(c)
+
+            rcs, hexes = [], []
+
+            def editor(e: int):
+                env = {**os.environ, "ADSB_REPO_PATH": str(clones[e]), "ADSB_PUSH_RETRIES": retries}
+                for i in range(a.edits):
+                    hx = f"E{e:01X}{i:04X}"
+                    req = {"action": "publish", "list": "mil", "hex": hx, "reg": f"E{e}-{i}", "push": True}
+                    p = subprocess.run([sys.executable, BACKEND, "--stdin-json"], env=env,
+                                       input=json.dumps(req).encode("utf-8"),
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                    rcs.append(p.returncode)
+                    if p.returncode == 0:
+                        hexes.append(hx)
+
+            t0 = time.perf_counter()
+            threads = [threading.Thread(target=editor, args=(e,)) for e in range(a.editors)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            dt = time.perf_counter() - t0
+
+            text = subprocess.run(["git", "--git-dir", str(remote), "show",
+                                   f"{backend.BRANCH}:{backend.FILES['mil']}"],
+                                  capture_output=True, text=True).stdout
+            lost = [hx for hx in hexes if f"\n{hx}," not in text]
+            ok = rcs.count(0)
+            print(f"retries={retries}  editors={a.editors}  ok={ok}/{len(rcs)}  persi={len(lost)}  "
+                  f"{dt:6.2f} s  {ok / dt:6.2f} publish/s")
+
+
+def bench_reconcile(a):
+    # Liste contro un dump di riferimento in stile OpenSky: un passaggio ordinato vs una
+    # ricerca per HEX con find_hex_locations_with_records (stimata su un campione)
+    rows = fake_rows(a.rows)
+    rnd = random.Random(6)
+    with tempfile.TemporaryDirectory() as td:
+        repo = Path(td)
+        for i, fn in enumerate(backend.FILES.values()):
+            backend.write_csv_file(repo / fn, HEADER, sorted(rows[i::len(backend.FILES)], key=backend.row_key))
+        ref = repo / "aircraftDatabase.csv"
+        with ref.open("w", encoding="utf-8", newline="") as f:
+            f.write("icao24,registration,manufacturername,model,typecode,operator,owner\n")
+            ref_rows = [[r[0].lower(), r[1] if rnd.random() > a.changed else r[1] + "X", "", r[3], r[4], r[2], ""]
+                        for r in rows]
+            ref_rows += [[f"{rnd.randrange(1 << 24):06x}", f"N{i}", "", "", "B738", "Airline", ""]
+                         for i in range(max(a.reference - len(rows), 0))]
+            rnd.shuffle(ref_rows)
+            f.writelines(backend.to_line(r) for r in ref_rows)
+
+        args = backend.args_from_request({"action": "reconcile", "reference": str(ref), "mem_mb": a.mem_mb})
+        t0 = time.perf_counter()
+        res = backend.reconcile_result(args, repo, repo, "0" * 40)
+        t_join = time.perf_counter() - t0
+
+        sample = ref_rows[:a.sample]
+        t0 = time.perf_counter()
+        for r in sample:
+            backend.find_hex_locations_with_records(r[0].upper(), repo)
+        t_naive = (time.perf_counter() - t0) / len(sample) * len(ref_rows)
+
+    print(f"righe liste={a.rows}  riferimento={len(ref_rows)}  differenze={res['total']}")
+    print(f"merge ordinato       {t_join:8.2f} s")
+    print(f"ricerca per HEX      {t_naive:8.2f} s  (stima da {len(sample)} righe)  x{t_naive / t_join:.0f}")
+
+
+STARTUP_REQUESTS = {
+    "ping": {"action": "ping"},
+    "json": {"action": "json", "json": True, "list": "mil", "hex": "33FF01", "reg": "MM1"},
+    "where": {"action": "where", "hex": "33FF01"},
+    "page": {"action": "page", "list": "mil", "limit": 50},
+    "range": {"action": "range", "from": "33FF"},
+}
+
+
+def _import_ms(cmd, env, stdin: bytes, skip) -> tuple:
+    # (ms di import oltre all'interprete nudo, [(ms, modulo)] dei più pesanti) da -X importtime
+    r = subprocess.run([cmd[0], "-X", "importtime", *cmd[1:]], env=env, input=stdin, capture_output=True)
+    top = []
+    for line in r.stderr.decode("utf-8", "replace").splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cum, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") or not cum.strip().isdigit():
+            continue
+        name = name.strip()
+        if name not in skip:
+            top.append((int(cum) / 1000, name))
+    return sum(ms for ms, _ in top), sorted(top, reverse=True)[:3]
+
+
+def bench_startup(a):
+    # Avvio a freddo di un processo per richiesta, come GUI e bot: tempo totale oltre a
+    # "python -c pass" e import per azione. Script diretto (ricompilato a ogni avvio) vs
+    # "python -m df_list_edit" (bytecode in __pycache__). Fuori budget -> rc 1, per la CI.
+    import py_compile
+    py_compile.compile(BACKEND, doraise=True)
+    with tempfile.TemporaryDirectory() as td:
+        repo = make_fixture(Path(td), a.rows)
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+        env.update(ADSB_REPO_PATH=str(repo), ADSB_FETCH_TTL="3600")
+        cwd = str(Path(BACKEND).parent)
+        modes = {"script": [sys.executable, BACKEND, "--stdin-json"],
+                 "-m": [sys.executable, "-m", "df_list_edit", "--stdin-json"]}
+
+        def wall(cmd, stdin=b""):
+            ts = []
+            for _ in range(a.runs):
+                t0 = time.perf_counter()
+                subprocess.run(cmd, env=env, cwd=cwd, input=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                ts.append(time.perf_counter() - t0)
+            return _pct(ts, 0.5) * 1000
+
+        bare = wall([sys.executable, "-c", "pass"])
+        r = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], env=env, capture_output=True)
+        skip = {line.split("|")[-1].strip() for line in r.stderr.decode().splitlines() if "|" in line}
+        skip |= {"runpy"}
+        print(f"interprete (python -c pass) {bare:7.1f} ms")
+
+        over = []
+        for action, req in STARTUP_REQUESTS.items():
+            stdin = json.dumps(req).encode("utf-8")
+            times = {mode: wall(cmd, stdin) - bare for mode, cmd in modes.items()}
+            imp, top = min(_import_ms(modes["-m"], env, stdin, skip) for _ in range(3))
+            heavy = ", ".join(f"{name} {ms:.1f}" for ms, name in top)
+            print(f"{action:<6} script +{times['script']:6.1f} ms   -m +{times['-m']:6.1f} ms   "
+                  f"import {imp:5.1f} ms  ({heavy})")
+            if action in ("ping", "json") and times["-m"] > a.budget_ms:
+                over.append(f"{action}: avvio +{times['-m']:.1f} ms > {a.budget_ms} ms")
+            if imp > a.import_budget_ms:
+                over.append(f"{action}: import {imp:.1f} ms > {a.import_budget_ms} ms")
+    if over:
+        raise SystemExit("FUORI BUDGET: " + "; ".join(over))
+
+
+def _png(w: int, h: int, seed: int) -> bytes:
+    # PNG RGB senza dipendenze (sfumatura diversa per seed), come foto finta
+    import struct, zlib
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    line = bytes(v for x in range(w) for v in ((x * 255 // w + seed) % 256, seed % 256, (seed * 7) % 256))
+    raw = (b"\0" + line) * h
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+def bench_thumbs(a):
+    # Server HTTP locale al posto dei siti delle foto: primo giro (rete + riduzione) vs
+    # secondo giro sugli stessi aerei (solo cache su disco)
+    import http.server, threading
+    import adsb_thumbs
+    if not adsb_thumbs.thumbs_available():
+        raise SystemExit("ERROR: serve Pillow (pip install Pillow)")
+
+    images = {f"/{i}.png": _png(a.width, a.height, i) for i in range(a.aircraft * 4)}
+    served = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = images.get(self.path)
+            time.sleep(a.latency_ms / 1000)
+            if body is None:
+                self.send_error(404)
+                return
+            served.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_port}"
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            cache = adsb_thumbs.ThumbCache(Path(td), max_mb=a.cache_mb)
+            for label in ("primo giro", "dalla cache"):
+                n0, lat = len(served), []
+                for i in range(a.aircraft):
+                    t0 = time.perf_counter()
+                    for k in range(4):
+                        cache.fetch(f"{base}/{i * 4 + k}.png")
+                    lat.append(time.perf_counter() - t0)
+                size = sum(p.stat().st_size for p in Path(td).glob("*.png"))
+                print(f"{label:<12} aereo p50 {_pct(lat, 0.5) * 1000:8.1f} ms  p95 {_pct(lat, 0.95) * 1000:8.1f} ms  "
+                      f"richieste HTTP {len(served) - n0:4d}  cache {size / 1024:7.1f} KB")
+    finally:
+        srv.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark backend liste ADS-B")
+    sub = ap.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("framing", help="Byte trasferiti e tempo di decodifica: JSON semplice vs frame compressi")
+    p.add_argument("--rows", type=int, default=100000)
+    p.set_defaults(fn=bench_framing)
+
+    p = sub.add_parser("contention", help="N client publish in parallelo: throughput con e senza coalescing")
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--rows", type=int, default=20000)
+    p.set_defaults(fn=bench_contention)
+
+    p = sub.add_parser("scan", help="Scansione completa di una lista: parse per riga vs ListScan")
+    p.add_argument("--rows", type=int, default=200000)
+    p.set_defaults(fn=bench_scan)
+
+    p = sub.add_parser("server", help="Carico su df_list_server: where/diff in pipeline da N client")
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--requests", type=int, default=200, help="Richieste per client")
+    p.add_argument("--rows", type=int, default=20000)
+    p.set_defaults(fn=bench_server)
+
+    p = sub.add_parser("history", help="Storia di un HEX: git log -S vs indice per HEX")
+    p.add_argument("--commits", type=int, default=300)
+    p.add_argument("--rows", type=int, default=20000)
+    p.set_defaults(fn=bench_history)
+
+    p = sub.add_parser("shards", help="Costo di un publish su una lista grande: file unico vs shard")
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--edits", type=int, default=20)
+    p.set_defaults(fn=bench_shards)
+
+    p = sub.add_parser("codec", help="Riga -> record: rimappatura per riga vs schema compilato")
+    p.add_argument("--rows", type=int, default=100000)
+    p.set_defaults(fn=bench_codec)
+
+    p = sub.add_parser("sort", help="Ordinamento di un CSV grande: in memoria vs external sort (picco RSS)")
+    p.add_argument("--rows", type=int, default=500000)
+    p.add_argument("--mem-mb", type=float, default=16)
+    p.add_argument("--child", choices=["write", "memory", "external"], help=argparse.SUPPRESS)
+    p.add_argument("--child-file", help=argparse.SUPPRESS)
+    p.set_defaults(fn=bench_sort)
+
+    p = sub.add_parser("push", help="Editor concorrenti su cloni diversi: push con e senza retry/replay")
+    p.add_argument("--editors", type=int, default=4)
+    p.add_argument("--edits", type=int, default=10, help="Publish per editor")
+    p.add_argument("--rows", type=int, default=20000)
+    p.set_defaults(fn=bench_push)
+
+    p = sub.add_parser("range", help="Intervalli ICAO: bisect sull'indice ordinato vs scansione delle liste")
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--queries", type=int, default=1000)
+    p.set_defaults(fn=bench_range)
+
+    p = sub.add_parser("reconcile", help="Riconciliazione con un dump di riferimento vs ricerca per HEX")
+    p.add_argument("--rows", type=int, default=100000)
+    p.add_argument("--reference", type=int, default=1000000)
+    p.add_argument("--changed", type=float, default=0.05, help="Quota di registrazioni cambiate a monte")
+    p.add_argument("--mem-mb", type=float, default=64)
+    p.add_argument("--sample", type=int, default=300)
+    p.set_defaults(fn=bench_reconcile)
+
+    p = sub.add_parser("startup", help="Avvio a freddo per azione (tempo e -X importtime) con budget")
+    p.add_argument("--rows", type=int, default=2000)
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--budget-ms", type=float, default=50,
+                   help="Massimo oltre a python -c pass per ping/json (senza git), modalità -m")
+    p.add_argument("--import-budget-ms", type=float, default=30, help="Massimo di import per azione")
+    p.set_defaults(fn=bench_startup)
+
+    p = sub.add_parser("thumbs", help="Miniature ImageLink: download e riduzione vs cache su disco (serve Pillow)")
+    p.add_argument("--aircraft", type=int, default=20)
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=960)
+    p.add_argument("--latency-ms", type=float, default=80, help="Ritardo per risposta del server finto")
+    p.add_argument("--cache-mb", type=float, default=50)
+    p.set_defaults(fn=bench_thumbs)
+
+    a = ap.parse_args()
+    a.fn(a)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
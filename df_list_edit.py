@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import argparse, csv, io, re, subprocess, json, sys
+# A livello di modulo solo il nucleo usato da ogni richiesta; i moduli che servono a poche
+# azioni (e argparse, solo per la CLI completa) si importano nella funzione che li usa.
+import csv, io, re, subprocess, json, sys, types
 from pathlib import Path
 import os
 
@@ -23,10 +25,463 @@ LIST_ALIASES = {
 }
 
 
+# Altri repository di liste serviti dallo stesso processo: ADSB_REPOS punta a un file JSON
+#   {"extra": {"path": "/srv/extra-lists", "branch": "main", "remote": "origin", "files": {"mil": "..."}}}
+# (branch, remote e files facoltativi, default come sopra). Le richieste scelgono con "repo";
+# senza, o con "default", si usa ADSB_REPO_PATH.
+REPOS_FILE = os.getenv("ADSB_REPOS", "")
+_REPOS = None
+_REPO_ROOTS = None
+
+
+def repo_registry() -> dict:
+    global _REPOS
+    if _REPOS is None:
+        repos = {"default": {"name": "default", "path": REPO, "branch": BRANCH, "remote": REMOTE, "files": FILES}}
+        if REPOS_FILE:
+            with open(REPOS_FILE, encoding="utf-8") as f:
+                for name, c in json.load(f).items():
+                    repos[name] = {"name": name, "path": Path(c["path"]).expanduser(), "branch": c.get("branch") or BRANCH,
+                                   "remote": c.get("remote") or REMOTE, "files": c.get("files") or FILES}
+        _REPOS = repos
+    return _REPOS
+
+
+def repo_path(name: str = "") -> Path:
+    repos = repo_registry()
+    c = repos.get(name or "default")
+    if c is None:
+        raise SystemExit(f"ERROR: repo sconosciuto: {name} (noti: {', '.join(repos)})")
+    return c["path"]
+
+
+def repo_conf(path: Path) -> dict:
+    # Config del repo che contiene path: il checkout, un suo file o uno snapshot in .git.
+    # Cache sulle sole radici configurate (percorso com'è e risolto), la più profonda per prima
+    global _REPO_ROOTS
+    if _REPO_ROOTS is None:
+        roots = [(r, c) for c in repo_registry().values() for r in {str(c["path"]), str(c["path"].resolve())}]
+        _REPO_ROOTS = sorted(roots, key=lambda x: len(x[0]), reverse=True)
+    s = str(path)
+    for _ in range(2):
+        for root, c in _REPO_ROOTS:
+            if s == root or s.startswith(root.rstrip(os.sep) + os.sep):
+                return c
+        s = str(Path(path).resolve())  # percorso relativo o tramite symlink
+    return repo_registry()["default"]
+
+
+def register_repo(name: str, path: Path, files: dict):
+    # Repo noto solo al chiamante (es. lo snapshot locale della GUI, con i file del suo repo)
+    global _REPO_ROOTS
+    repo_registry()[name] = {"name": name, "path": Path(path), "branch": BRANCH, "remote": REMOTE, "files": files}
+    _REPO_ROOTS = None
+
+
+def list_files(repo: Path) -> dict:
+    return repo_conf(repo)["files"]
+
+
+# In modalità server gli avvisi di una richiesta vanno nella sua risposta
+_warn_sink = None
+
+
 def warn(msg: str):
+    sink = _warn_sink.get() if _warn_sink is not None else None
+    if sink is not None:
+        sink.append(f"WARNING: {msg}")
+        return
     print(f"WARNING: {msg}", file=sys.stderr)
 
 
+def capture_warnings(fn, *a, **kw):
+    # Esegue fn raccogliendo i warn() in una lista: ritorna (risultato, avvisi)
+    global _warn_sink
+    import contextvars
+    if _warn_sink is None:
+        _warn_sink = contextvars.ContextVar("warn_sink", default=None)
+    sink = []
+
+    def run():
+        _warn_sink.set(sink)
+        return fn(*a, **kw)
+
+    return contextvars.copy_context().run(run), sink
+
+
+class _RoutedStream(io.TextIOBase):
+    # sys.stdout/sys.stderr per thread: con capture_output attivo nel thread corrente
+    # scrive nel buffer della richiesta, altrimenti nello stream originale
+    def __init__(self, base, name: str):
+        self.base = base
+        self.name = name
+
+    def _target(self):
+        return getattr(_routes, self.name, None) or self.base
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+
+_routes = None
+_routes_lock = None
+
+
+def capture_output(out, err):
+    # Come redirect_stdout/redirect_stderr, ma solo per il thread corrente: in modalità
+    # server più repo scrivono in parallelo e l'output non deve mescolarsi
+    import contextlib, threading
+    global _routes, _routes_lock
+    if _routes is None:
+        _routes, _routes_lock = threading.local(), threading.Lock()
+    with _routes_lock:
+        if not isinstance(sys.stdout, _RoutedStream):
+            sys.stdout = _RoutedStream(sys.stdout, "out")
+        if not isinstance(sys.stderr, _RoutedStream):
+            sys.stderr = _RoutedStream(sys.stderr, "err")
+
+    @contextlib.contextmanager
+    def routed():
+        prev = getattr(_routes, "out", None), getattr(_routes, "err", None)
+        _routes.out, _routes.err = out, err
+        try:
+            yield
+        finally:
+            _routes.out, _routes.err = prev
+
+    return routed()
+
+
+def info(msg: str):
+    # Log di servizio: sys.__stderr__ così non finisce nell'output catturato di una richiesta
+    print(msg, file=sys.__stderr__)
+
+
+# ---------------- METRICHE ----------------
+# Contatori, gauge e istogrammi in formato testo Prometheus. In modalità server li espone
+# "df_list_server.py --metrics host:porta" (GET /metrics); nei comandi singoli, con
+# ADSB_METRICS_TEXTFILE impostato, vengono sommati a quel file a fine richiesta
+# (textfile collector di node_exporter, il nome deve finire in .prom).
+METRICS_TEXTFILE = os.getenv("ADSB_METRICS_TEXTFILE", "")
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_FAMILIES = {
+    "adsb_requests_total": ("counter", "Richieste per azione"),
+    "adsb_request_errors_total": ("counter", "Richieste terminate con rc diverso da 0, per azione"),
+    "adsb_request_duration_seconds": ("histogram", "Durata delle richieste per azione"),
+    "adsb_git_fetch_duration_seconds": ("histogram", "Durata di git fetch (op=sync: repo_sync_hard, op=read: letture)"),
+    "adsb_git_fetch_failures_total": ("counter", "git fetch falliti"),
+    "adsb_git_push_duration_seconds": ("histogram", "Durata di git push"),
+    "adsb_git_push_failures_total": ("counter", "git push falliti (reason=rejected: remoto avanti, non fast-forward)"),
+    "adsb_git_push_retries_total": ("counter", "Modifiche riapplicate sul nuovo head remoto dopo un push rifiutato"),
+    "adsb_request_replays_total": ("counter", "Scritture con request_id già eseguito: esito restituito dal journal"),
+    "adsb_list_rows": ("gauge", "Righe per file di lista (per repo) all'ultima lettura o scrittura"),
+    "adsb_cache_hits_total": ("counter", "Hit per cache (list_store, fetch, snapshot)"),
+    "adsb_cache_misses_total": ("counter", "Miss per cache (list_store, fetch, snapshot)"),
+}
+
+METRIC_ACTIONS = ("ping", "head", "where", "diff", "page", "range", "reconcile", "snapshot", "changes_since", "history", "revert",
+                  "publish", "delete", "sync", "import", "resort", "bootstrap", "maintain", "autofill", "json")
+
+
+def _metric_key(name: str, labels) -> str:
+    if not labels:
+        return name
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return name + "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        import threading
+        self._lock = threading.Lock()
+        self._values = {}  # campione ("nome{etichette}") -> (famiglia, valore)
+
+    def _add(self, family: str, key: str, v: float):
+        self._values[key] = (family, self._values.get(key, (family, 0.0))[1] + v)
+
+    def inc(self, name: str, v: float = 1, **labels):
+        with self._lock:
+            self._add(name, _metric_key(name, sorted(labels.items())), v)
+
+    def set(self, name: str, v: float, **labels):
+        with self._lock:
+            self._values[_metric_key(name, sorted(labels.items()))] = (name, float(v))
+
+    def observe(self, name: str, seconds: float, **labels):
+        lb = sorted(labels.items())
+        with self._lock:
+            # Tutti i bucket ad ogni osservazione: restano completi e in ordine di "le"
+            for b in METRIC_BUCKETS:
+                self._add(name, _metric_key(f"{name}_bucket", lb + [("le", f"{b:g}")]), seconds <= b)
+            self._add(name, _metric_key(f"{name}_bucket", lb + [("le", "+Inf")]), 1)
+            self._add(name, _metric_key(f"{name}_sum", lb), seconds)
+            self._add(name, _metric_key(f"{name}_count", lb), 1)
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+METRICS = Metrics()
+
+
+def format_metrics(values: dict) -> str:
+    by_family = {}
+    for key, (fam, v) in values.items():
+        by_family.setdefault(fam, []).append(f"{key} {float(v)!r}")
+    out = []
+    for fam, (kind, help_text) in METRIC_FAMILIES.items():
+        if fam in by_family:
+            out += [f"# HELP {fam} {help_text}", f"# TYPE {fam} {kind}"] + by_family[fam]
+    return "\n".join(out) + "\n" if out else ""
+
+
+def metrics_text() -> str:
+    return format_metrics(METRICS.values())
+
+
+def parse_metrics(text: str) -> dict:
+    # Inverso di format_metrics (solo le famiglie note)
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        key, _, v = line.rpartition(" ")
+        name = key.partition("{")[0]
+        fam = name if name in METRIC_FAMILIES else name.rpartition("_")[0]
+        if fam in METRIC_FAMILIES:
+            try:
+                values[key] = (fam, float(v))
+            except ValueError:
+                pass
+    return values
+
+
+def write_metrics_textfile(path: Path, repo: Path = None):
+    # Contatori e istogrammi si sommano a quelli già nel file (un processo per richiesta),
+    # i gauge si sovrascrivono; scrittura atomica sotto lock
+    try:
+        with RepoLock(repo or REPO, "df-metrics.lock"):
+            values = parse_metrics(path.read_text(encoding="utf-8")) if path.exists() else {}
+            for key, (fam, v) in METRICS.values().items():
+                if METRIC_FAMILIES[fam][0] != "gauge" and key in values:
+                    v += values[key][1]
+                values[key] = (fam, v)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(format_metrics(values), encoding="utf-8")
+            os.replace(tmp, path)
+    except OSError as e:
+        warn(f"metriche non scritte in {path}: {e}")
+
+
+def observe_request(action: str, rc: int, seconds: float):
+    action = action if action in METRIC_ACTIONS else "other"
+    METRICS.inc("adsb_requests_total", action=action)
+    if rc:
+        METRICS.inc("adsb_request_errors_total", action=action)
+    METRICS.observe("adsb_request_duration_seconds", seconds, action=action)
+
+
+def request_action(args) -> str:
+    # Azione per le metriche: la CLI senza --stdin-json non imposta _action
+    return args._action or ("json" if args.json else "publish")
+
+
+def observe_list_rows(path: Path, n: int):
+    fn = f"{path.parent.name}/{path.name}" if path.parent.name.endswith(".d") else path.name
+    lk = list_key_for_file(fn, path)
+    if lk:
+        METRICS.set("adsb_list_rows", n, repo=repo_conf(path)["name"], list=lk, file=fn)
+
+
+# ---------------- FRAMING ----------------
+# Risposta binaria opzionale (richiesta con "framing": ["zstd", "zlib"]):
+#   FRAME_MAGIC + "<codec> <encoding>\n", poi frame <kind:1><len:4 big-endian><payload compresso>
+#   kind: J = risultato JSON, T = testo stdout, P = avanzamento
+# Senza "framing" l'output resta JSON/testo semplice.
+FRAME_MAGIC = b"DFLE/1 "
+
+_framer = None
+
+
+def frame_codecs():
+    codecs = []
+    try:
+        import zstandard  # noqa: F401
+        codecs.append("zstd")
+    except ImportError:
+        pass
+    return codecs + ["zlib", "none"]
+
+
+def frame_encodings():
+    try:
+        import msgpack  # noqa: F401
+        return ["json", "msgpack"]
+    except ImportError:
+        return ["json"]
+
+
+def _frame_compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "zlib":
+        import zlib
+        return zlib.compress(data, 6)
+    return data
+
+
+def _frame_decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        import zlib
+        return zlib.decompress(data)
+    return data
+
+
+def _frame_dumps(encoding: str, obj) -> bytes:
+    if encoding == "msgpack":
+        import msgpack
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _frame_loads(encoding: str, data: bytes):
+    if encoding == "msgpack":
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode("utf-8"))
+
+
+class Framer:
+    def __init__(self, out, codec: str, encoding: str):
+        self.out = out
+        self.codec = codec
+        self.encoding = encoding
+
+    def header(self) -> bytes:
+        return FRAME_MAGIC + f"{self.codec} {self.encoding}\n".encode("ascii")
+
+    def encode(self, kind: bytes, obj) -> bytes:
+        import struct
+        raw = obj.encode("utf-8") if kind == b"T" else _frame_dumps(self.encoding, obj)
+        payload = _frame_compress(self.codec, raw)
+        return struct.pack(">cI", kind, len(payload)) + payload
+
+    def frame(self, kind: bytes, obj):
+        self.out.write(self.encode(kind, obj))
+        self.out.flush()
+
+
+class _FrameTextWriter(io.TextIOBase):
+    def __init__(self, framer: Framer):
+        self.framer = framer
+        self.buf = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        self.buf.append(s)
+        self.size += len(s)
+        if self.size > 65536:
+            self.flush()
+        return len(s)
+
+    def flush(self):
+        if self.buf:
+            text = "".join(self.buf)
+            self.buf, self.size = [], 0
+            self.framer.frame(b"T", text)
+
+
+def start_framing(accept, encoding: str = "json"):
+    global _framer
+    if isinstance(accept, str):
+        accept = [accept]
+    codec = next((c for c in (accept or []) if c in frame_codecs()), None)
+    if codec is None:
+        warn("Nessun codec di framing supportato, uso output semplice.")
+        return
+    if encoding not in frame_encodings():
+        encoding = "json"
+
+    # stdout reale riservato ai frame; l'output dei comandi git finisce su stderr
+    import atexit
+    sys.stdout.flush()
+    out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+
+    _framer = Framer(out, codec, encoding)
+    out.write(_framer.header())
+    sys.stdout = _FrameTextWriter(_framer)
+    atexit.register(stop_framing)
+
+
+def stop_framing():
+    if _framer is None:
+        return
+    sys.stdout.flush()
+    _framer.out.flush()
+
+
+def emit_json(obj):
+    if _framer is None:
+        print(json.dumps(obj, ensure_ascii=False))
+        return
+    sys.stdout.flush()
+    _framer.frame(b"J", obj)
+
+
+def progress(stage: str, done: int, total: int):
+    if _framer is not None:
+        _framer.frame(b"P", {"stage": stage, "done": done, "total": total})
+
+
+def _read_exact(read, n: int) -> bytes:
+    chunks = []
+    while n > 0:
+        b = read(n)
+        if not b:
+            break
+        chunks.append(b)
+        n -= len(b)
+    return b"".join(chunks)
+
+
+def read_frames(read):
+    # read(n) -> bytes, posizionato subito dopo FRAME_MAGIC; genera (kind, obj)
+    import struct
+    line = b""
+    while not line.endswith(b"\n"):
+        c = read(1)
+        if not c:
+            raise ValueError("Header di framing troncato")
+        line += c
+    codec, encoding = line.decode("ascii").split()
+
+    while True:
+        head = _read_exact(read, 5)
+        if not head:
+            return
+        if len(head) < 5:
+            raise ValueError("Frame troncato")
+        kind, n = struct.unpack(">cI", head)
+        payload = _read_exact(read, n)
+        if len(payload) < n:
+            raise ValueError("Frame troncato")
+        raw = _frame_decompress(codec, payload)
+        yield kind, (raw.decode("utf-8") if kind == b"T" else _frame_loads(encoding, raw))
+
+
 def norm_hex(h: str) -> str:
     h = (h or "").strip().lower().replace("0x", "")
     if not re.fullmatch(r"[0-9a-f]{6}", h):
@@ -40,9 +495,10 @@ def parse_line(line: str):
 
 
 def to_line(row):
+    # lineterminator "\n" anche per il quoting: i campi con a capo vengono messi tra virgolette
     s = io.StringIO()
-    csv.writer(s, lineterminator="").writerow(row)
-    return s.getvalue() + "\n"
+    csv.writer(s, lineterminator="\n").writerow(row)
+    return s.getvalue()
 
 
 def normalize_url(u: str) -> str:
@@ -75,8 +531,9 @@ def looks_like_callsign(s: str) -> bool:
 
 
 def ensure_git_safe_directory(repo: Path):
+    # rev-parse non prende lock (git status aggiornerebbe l'indice, in gara con i writer)
     try:
-        subprocess.run(["git", "-C", str(repo), "status"],
+        subprocess.run(["git", "-C", str(repo), "rev-parse", "--git-dir"],
                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return
     except Exception:
@@ -91,6 +548,7 @@ def ensure_git_safe_directory(repo: Path):
 
 
 def repo_sync_hard(repo: Path, offline_ok: bool):
+    import time
     ensure_git_safe_directory(repo)
 
     if not (repo / ".git").exists():
@@ -101,7 +559,6 @@ def repo_sync_hard(repo: Path, offline_ok: bool):
     diff_cached = subprocess.run(["git", "-C", str(repo), "diff", "--cached"], capture_output=True, text=True)
     content = (diff.stdout or "") + "\n" + (diff_cached.stdout or "")
     if content.strip():
-        import time
         ts = time.strftime("%Y%m%d-%H%M%S")
         bdir = repo / ".local-backup"
         bdir.mkdir(parents=True, exist_ok=True)
@@ -111,18 +568,27 @@ def repo_sync_hard(repo: Path, offline_ok: bool):
     subprocess.run(["git", "-C", str(repo), "reset", "--hard"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     subprocess.run(["git", "-C", str(repo), "clean", "-fd"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-    r = subprocess.run(["git", "-C", str(repo), "fetch", REMOTE])
+    c = repo_conf(repo)
+    t0 = time.monotonic()
+    r = subprocess.run(["git", "-C", str(repo), "fetch", c["remote"]])
+    METRICS.observe("adsb_git_fetch_duration_seconds", time.monotonic() - t0, op="sync")
     if r.returncode != 0:
+        METRICS.inc("adsb_git_fetch_failures_total", op="sync")
         if offline_ok:
             warn("git fetch fallito (offline?), continuo con repo locale.")
             return
         raise SystemExit("git fetch fallito. Se vuoi continuare offline usa --offline-ok.")
 
-    subprocess.run(["git", "-C", str(repo), "checkout", BRANCH], check=True)
-    subprocess.run(["git", "-C", str(repo), "reset", "--hard", f"{REMOTE}/{BRANCH}"], check=True)
+    subprocess.run(["git", "-C", str(repo), "checkout", c["branch"]], check=True)
+    subprocess.run(["git", "-C", str(repo), "reset", "--hard", f"{c['remote']}/{c['branch']}"], check=True)
     subprocess.run(["git", "-C", str(repo), "clean", "-fd"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
+def git_head(repo: Path) -> str:
+    r = subprocess.run(["git", "-C", str(repo), "rev-parse", "HEAD"], capture_output=True, text=True)
+    return (r.stdout or "").strip() if r.returncode == 0 else ""
+
+
 def apply_list_aliases(args):
     args.list = (args.list or "").strip()
     if args.list in LIST_ALIASES:
@@ -140,7 +606,11 @@ def apply_args_normalizations(args):
 
 
 def print_json(args, hx: str):
-    print(json.dumps({
+    emit_json(record_json(args, hx))
+
+
+def record_json(args, hx: str) -> dict:
+    return {
         "hex": hx,
         "reg": args.reg,
         "operator": args.operator,
@@ -156,7 +626,7 @@ def print_json(args, hx: str):
         "img2": args.img2,
         "img3": args.img3,
         "img4": args.img4,
-    }, ensure_ascii=False))
+    }
 
 
 def _norm_cell(s: str) -> str:
@@ -173,41 +643,273 @@ def _rows_equal(a, b) -> bool:
     return [_norm_cell(x) for x in a] == [_norm_cell(x) for x in b]
 
 
+# ---------------- SCHEMA ----------------
+# Colonna (senza $/#) -> campo del record usato da GUI e JSON
+FIELD_BY_COLUMN = {
+    "ICAO": "hex",
+    "Registration": "reg",
+    "Operator": "operator",
+    "Type": "atype",
+    "ICAO Type": "icao_type",
+    "CMPG": "cmpg",
+    "Tag 1": "tag1",
+    "Tag 2": "tag2",
+    "Tag 3": "tag3",
+    "Category": "category",
+    "Link": "link",
+    "ImageLink": "img1",
+    "ImageLink2": "img2",
+    "ImageLink3": "img3",
+    "ImageLink4": "img4",
+}
+
+
+def _clean_colname(s: str) -> str:
+    s = (s or "").strip()
+    s = s.replace("$", "").replace("#", "")
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+
+class ListSchema:
+    # Intestazione di una lista compilata una volta: posizione di ogni campo noto.
+    # Le liste possono avere colonne in meno (flyingdocs) o in ordine diverso; le
+    # colonne sconosciute restano quelle della riga esistente.
+    def __init__(self, header):
+        self.header = list(header)
+        self.width = len(self.header)
+        self.pos = {}
+        for i, col in enumerate(self.header):
+            f = FIELD_BY_COLUMN.get(_clean_colname(col))
+            if f and f not in self.pos:
+                self.pos[f] = i
+        self.key = self.pos.get("hex", 0)
+        order = list(FIELD_BY_COLUMN.values())
+        self._fields = sorted(self.pos.items(), key=lambda x: order.index(x[0]))
+
+    def key_of(self, row) -> str:
+        return (row[self.key] if len(row) > self.key else "").strip().upper()
+
+    def record(self, row) -> dict:
+        n = len(row)
+        return {f: (row[i].strip() if i < n else "") for f, i in self._fields}
+
+    def row(self, rec: dict, base=None) -> list:
+        # I campi assenti da rec restano quelli di base (import parziale)
+        out = _row_pad(list(base), self.width) if base is not None else [""] * self.width
+        for f, i in self._fields:
+            if f in rec:
+                out[i] = rec[f] or ""
+        return out
+
+    def missing(self, rec: dict) -> list:
+        # Campi valorizzati che questa lista non ha
+        return [f for f, v in rec.items() if v and f not in self.pos]
+
+
+_SCHEMAS = {}
+
+
+def list_schema(header) -> ListSchema:
+    key = tuple(header)
+    schema = _SCHEMAS.get(key)
+    if schema is None:
+        schema = _SCHEMAS[key] = ListSchema(header)
+    return schema
+
+
+def args_record(args, hx: str) -> dict:
+    return {
+        "hex": hx, "reg": args.reg, "operator": args.operator, "atype": args.atype,
+        "icao_type": args.icao_type, "cmpg": args.cmpg, "tag1": args.tag1, "tag2": args.tag2,
+        "tag3": args.tag3, "category": args.category, "link": args.link,
+        "img1": args.img1, "img2": args.img2, "img3": args.img3, "img4": args.img4,
+    }
+
+
+class ListScan:
+    # Scansione pigra di un CSV: per ogni record estrae solo la chiave ICAO (prima
+    # colonna) e l'intervallo di righe; la riga completa viene decodificata solo
+    # quando richiesta. I campi tra virgolette su più righe restano corretti.
+    def __init__(self, text: str, name="CSV"):
+        self.lines = (text or "").splitlines()
+        if not self.lines:
+            raise SystemExit(f"File vuoto: {name}")
+        self.header = parse_line(self.lines[0])
+        self.schema = list_schema(self.header)
+        self.keys = []
+        self.starts = []
+        self.ends = []
+        self._rows = {}
+        self._scan()
+
+    def _scan(self):
+        lines, keys, starts, ends = self.lines, self.keys, self.starts, self.ends
+        k = self.schema.key
+        i, n = 1, len(lines)
+        while i < n:
+            line = lines[i]
+            if '"' not in line:
+                # Fast path: record su una riga senza virgolette
+                if line and not line.isspace():
+                    if k == 0:
+                        keys.append(line.partition(",")[0].strip().upper())
+                    else:
+                        parts = line.split(",", k + 1)
+                        keys.append(parts[k].strip().upper() if len(parts) > k else "")
+                    starts.append(i)
+                    ends.append(i + 1)
+                i += 1
+                continue
+
+            j, q = i, line.count('"')
+            while q % 2 and j + 1 < n:
+                j += 1
+                q += lines[j].count('"')
+            first = line.partition(",")[0]
+            if k or first.lstrip().startswith('"'):
+                rec = next(csv.reader(io.StringIO("\n".join(lines[i:j + 1]).strip())))
+                first = rec[k] if len(rec) > k else ""
+            keys.append(first.strip().upper())
+            starts.append(i)
+            ends.append(j + 1)
+            i = j + 1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, hx: str):
+        try:
+            return self.keys.index(hx)
+        except ValueError:
+            return None
+
+    def _record_text(self, idx: int) -> str:
+        a, b = self.starts[idx], self.ends[idx]
+        return (self.lines[a] if b - a == 1 else "\n".join(self.lines[a:b])).strip()
+
+    def row(self, idx: int):
+        r = self._rows.get(idx)
+        if r is None:
+            r = next(csv.reader([self._record_text(idx)]))
+            self._rows[idx] = r
+        return r
+
+    def rows(self):
+        if len(self._rows) == len(self.keys):
+            return [self._rows[i] for i in range(len(self.keys))]
+        # Decodifica completa in un solo csv.reader
+        rows = list(csv.reader(self._record_text(i) for i in range(len(self.keys))))
+        self._rows = dict(enumerate(rows))
+        return list(rows)
+
+
+# Cache in memoria delle liste già scansionate, per firma del file (device, inode,
+# dimensione, mtime): un file riscritto (os.replace) ha un nuovo inode e viene riletto.
+LIST_CACHE_SIZE = int(os.getenv("ADSB_LIST_CACHE", "32"))
+
+
+class ListStore:
+    def __init__(self, maxsize: int = LIST_CACHE_SIZE):
+        import threading
+        from collections import OrderedDict
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(path: Path):
+        st = path.stat()
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def get(self, path: Path) -> ListScan:
+        sig = self.signature(path)
+        with self._lock:
+            scan = self._items.get(sig)
+            if scan is not None:
+                self._items.move_to_end(sig)
+                self.hits += 1
+                METRICS.inc("adsb_cache_hits_total", cache="list_store")
+                return scan
+            self.misses += 1
+        METRICS.inc("adsb_cache_misses_total", cache="list_store")
+        return self.refresh(path, sig)
+
+    def refresh(self, path: Path, sig=None) -> ListScan:
+        sig = sig or self.signature(path)
+        scan = ListScan(path.read_text(encoding="utf-8", errors="replace"), path)
+        observe_list_rows(path, len(scan))
+        with self._lock:
+            self._items[sig] = scan
+            self._items.move_to_end(sig)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return scan
+
+
+LIST_STORE = ListStore()
+
+
+def scan_csv_file(path: Path) -> ListScan:
+    return LIST_STORE.get(path)
+
+
+def scan_target_file(path: Path) -> ListScan:
+    # Come scan_csv_file, ma uno shard mancante (nessun HEX con quel prefisso) è vuoto,
+    # con l'header di uno shard vicino; publish lo crea alla prima riga
+    if path.is_file():
+        return scan_csv_file(path)
+    sib = next((p for p in sorted(path.parent.glob("*.csv")) if p.is_file()), None) if path.parent.is_dir() else None
+    if sib is None:
+        raise SystemExit(f"ERROR: file non trovato: {path.name}")
+    return ListScan(to_line(scan_csv_file(sib).header), path)
+
+
+def parse_csv_text(text: str, name="CSV"):
+    scan = ListScan(text, name)
+    return scan.header, scan.rows()
+
+
 def read_csv_file(path: Path):
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
-    if not lines:
-        raise SystemExit(f"File vuoto: {path}")
-    header = parse_line(lines[0])
-    rows = [parse_line(x) for x in lines[1:] if x.strip()]
-    return header, rows
+    scan = scan_csv_file(path)
+    return scan.header, scan.rows()
 
 
 def write_csv_file(path: Path, header, rows):
-    with path.open("w", encoding="utf-8", newline="") as f:
-        f.write(to_line(header))
+    # Scrittura atomica: i lettori concorrenti vedono sempre un file completo
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")  # come to_line(), senza un buffer per riga
+        w.writerow(header)
         for r in rows:
-            f.write(to_line(r))
+            w.writerow(r)
+            n += 1
+    os.replace(tmp, path)
+    observe_list_rows(path, n)
 
 
 def remove_hex_from_file(path: Path, hx_up: str) -> bool:
-    header, rows = read_csv_file(path)
+    scan = scan_csv_file(path)
     hx = hx_up.strip().upper()
-    new_rows = [r for r in rows if (r and (r[0] or "").strip().upper() != hx)]
+    if scan.find(hx) is None:
+        return False
+    header, rows, key_of = scan.header, scan.rows(), scan.schema.key_of
+    new_rows = [r for r in rows if r and key_of(r) != hx]
     if len(new_rows) == len(rows):
         return False
-    new_rows.sort(key=lambda r: (r[0] or "").strip().upper() if r else "")
+    new_rows.sort(key=key_of)
     write_csv_file(path, header, new_rows)
     return True
 
 
-def delete_hex_everywhere(hx_up: str):
+def delete_hex_everywhere(repo: Path, hx_up: str):
     hx = (hx_up or "").strip().upper()
     changed_files = []
 
-    for lk, fn in FILES.items():
-        p = REPO / fn
-        if not p.is_file():
-            continue
+    for lk, fn, p in iter_list_files(repo, hx):
         if remove_hex_from_file(p, hx):
             print(f"Deleted: removed {hx} from {lk}({fn})")
             changed_files.append(p)
@@ -222,129 +924,310 @@ def delete_hex_everywhere(hx_up: str):
     return uniq
 
 
-def find_hex_locations(hex_up: str):
+# ---------------- SHARDING ----------------
+# Una lista grande può essere divisa per prefisso HEX: al posto di "<nome>.csv" c'è la
+# cartella "<nome>.d/" con un file per prefisso (0.csv ... F.csv, oppure 00.csv ... FF.csv),
+# tutti con la stessa intestazione. FILES resta il registro lista -> CSV canonico e chi
+# legge scopre da solo se una lista è divisa. df_list_shards.py divide e ricompone.
+def shard_dir_name(fn: str) -> str:
+    return (fn[:-4] if fn.endswith(".csv") else fn) + ".d"
+
+
+def list_shards(repo: Path, lk: str):
+    # [(nome relativo, Path)] dei file di una lista: gli shard se presenti, altrimenti il CSV
+    fn = list_files(repo)[lk]
+    d = repo / shard_dir_name(fn)
+    if d.is_dir():
+        return [(f"{d.name}/{p.name}", p) for p in sorted(d.glob("*.csv"))]
+    return [(fn, repo / fn)]
+
+
+def list_target_file(repo: Path, lk: str, hx: str):
+    # (nome relativo, Path) del file che contiene, o conterrà, l'HEX
+    files = list_files(repo)
+    if lk not in files:
+        raise SystemExit(f"ERROR: lista sconosciuta: {lk}")
+    fn = files[lk]
+    d = repo / shard_dir_name(fn)
+    if not d.is_dir():
+        return fn, repo / fn
+    width = len(next(d.glob("*.csv"), d / "0.csv").stem)
+    name = f"{hx[:width]}.csv"
+    return f"{d.name}/{name}", d / name
+
+
+def list_pathspecs(repo: Path):
+    # Pathspec git di tutte le liste: CSV canonici e cartelle di shard
+    out = []
+    for fn in list_files(repo).values():
+        out += [fn, shard_dir_name(fn)]
+    return out
+
+
+def list_key_for_file(fn: str, repo: Path = None):
+    # Lista logica di un file (CSV canonico o shard), None se non è una lista
+    top = fn.partition("/")[0]
+    for lk, name in list_files(repo or REPO).items():
+        if fn == name or (top == shard_dir_name(name) and fn.endswith(".csv")):
+            return lk
+    return None
+
+
+def iter_list_files(repo: Path = None, hx: str = None):
+    # Con hx, per le liste divise restituisce solo lo shard del suo prefisso
+    repo = repo or REPO
+    for lk in list_files(repo):
+        files = [list_target_file(repo, lk, hx)] if hx else list_shards(repo, lk)
+        for fn, p in files:
+            if p.is_file():
+                yield lk, fn, p
+
+
+def find_hex_locations(hex_up: str, repo: Path = None):
     hx = (hex_up or "").strip().upper()
     hits = []
-    for lk, fn in FILES.items():
-        p = REPO / fn
-        if not p.is_file():
-            continue
+    for lk, fn, p in iter_list_files(repo, hx):
         try:
-            _, rows = read_csv_file(p)
-            for row in rows:
-                if row and (row[0] or "").strip().upper() == hx:
-                    hits.append((lk, fn))
-                    break
+            if scan_csv_file(p).find(hx) is not None:
+                hits.append((lk, fn))
         except Exception as e:
             warn(f"Impossibile leggere {fn}: {e}")
     return hits
 
 
-def _row_to_dict(header, row):
-    row = _row_pad(row, len(header))
-    return {header[i]: row[i] for i in range(len(header))}
-
+def find_hex_locations_with_records(hex_up: str, repo: Path = None):
+    hx = (hex_up or "").strip().upper()
+    hits = []
+    for lk, fn, p in iter_list_files(repo, hx):
+        try:
+            scan = scan_csv_file(p)
+            idx = scan.find(hx)
+            if idx is not None:
+                rec = scan.schema.record(scan.row(idx))
+                out_list = "civ" if lk == "civcur" else lk
+                hits.append({"list": out_list, "file": fn, "record": rec})
+        except Exception as e:
+            warn(f"Impossibile leggere {fn}: {e}")
+    return hits
 
-def _clean_colname(s: str) -> str:
-    s = (s or "").strip()
-    s = s.replace("$", "").replace("#", "")
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
 
+def where_result(hx: str, repo: Path, rev: str) -> dict:
+    return {"hex": hx, "head": rev, "locations": find_hex_locations_with_records(hx, repo)}
+
+
+def diff_result(args, hx: str, repo: Path, rev: str) -> dict:
+    dj = diff_against_target(args, hx, repo)
+    dj["head"] = rev
+    return dj
+
+
+# ---------------- PAGINE ----------------
+# Lettura di una lista a pagine per il browser della GUI. Per (file, ordinamento, filtro)
+# si costruisce una volta un indice ordinato [(chiave, hex, file, riga)] senza decodificare
+# le righe (salvo la colonna di ordinamento); le pagine decodificano solo le proprie righe.
+# Paginazione per offset/limit o keyset con "after" (il "next" della pagina precedente).
+PAGE_LIMIT_MAX = 1000
+PAGE_INDEX_CACHE = 4
+
+
+class IndexCache:
+    # LRU degli indici derivati dalle liste, condivisa dai thread di lettura del server:
+    # lookup e inserimento sotto lock, la costruzione dell'indice fuori dal lock.
+    def __init__(self, maxsize: int = PAGE_INDEX_CACHE):
+        import threading
+        from collections import OrderedDict
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sig):
+        with self._lock:
+            idx = self._items.get(sig)
+            if idx is not None:
+                self._items.move_to_end(sig)
+            return idx
+
+    def put(self, sig, idx):
+        with self._lock:
+            self._items[sig] = idx
+            self._items.move_to_end(sig)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return idx
+
+
+_PAGE_INDEX = IndexCache()
+
+
+def _page_index(files, sort: str, flt: str) -> list:
+    sig = (tuple(ListStore.signature(p) for _fn, p, _scan in files), sort, flt)
+    entries = _PAGE_INDEX.get(sig)
+    if entries is None:
+        entries = []
+        needle = flt.casefold()
+        for fi, (_fn, _p, scan) in enumerate(files):
+            n = len(scan)
+            ids = [i for i in range(n) if scan.keys[i]]
+            if needle:
+                ids = [i for i in ids if needle in scan._record_text(i).casefold()]
+            if sort == "hex":
+                entries += [(scan.keys[i], scan.keys[i], fi, i) for i in ids]
+                continue
+            col = scan.schema.pos.get(sort)
+            rows = csv.reader(scan._record_text(i) for i in ids) if col is not None else ([] for _ in ids)
+            entries += [((r[col].strip().casefold() if col is not None and col < len(r) else ""), scan.keys[i], fi, i)
+                        for i, r in zip(ids, rows)]
+        entries.sort()
+        _PAGE_INDEX.put(sig, entries)
+    return entries
+
+
+def page_result(args, repo: Path, rev: str) -> dict:
+    import bisect
+    if args.list not in list_files(repo):
+        raise SystemExit(f"ERROR: lista sconosciuta: {args.list}")
+    sort = (args.sort or "hex").strip().lower()
+    if sort == "type":
+        sort = "atype"
+    if sort not in FIELD_BY_COLUMN.values():
+        raise SystemExit(f"ERROR: ordinamento sconosciuto: {sort}")
+    limit = min(max(int(args.limit or 100), 1), PAGE_LIMIT_MAX)
+
+    files = [(fn, p, scan_csv_file(p)) for fn, p in list_shards(repo, args.list) if p.is_file()]
+    entries = _page_index(files, sort, (args.filter or "").strip())
+    total = len(entries)
+
+    # Posizione di partenza nell'ordine richiesto (crescente o decrescente)
+    if args.after:
+        # Cursore [chiave, hex, file, riga] dal "next" precedente: esatto anche con HEX duplicati
+        after = tuple(args.after)
+        if args.desc:
+            start = total - bisect.bisect_left(entries, after)
+        else:
+            start = bisect.bisect_right(entries, after if len(after) == 4 else after + (float("inf"),))
+    else:
+        start = 0
+    start = min(start + max(int(args.offset or 0), 0), total)
+    stop = min(start + limit, total)
+
+    rows = []
+    for pos in range(start, stop):
+        k, hx, fi, i = entries[total - 1 - pos if args.desc else pos]
+        fn, _p, scan = files[fi]
+        rec = scan.schema.record(next(csv.reader([scan._record_text(i)])))
+        rows.append({**rec, "file": fn})
+    last = entries[total - stop if args.desc else stop - 1] if stop > start else None
 
-def _record_to_gui_keys(rec_raw: dict) -> dict:
-    m = {
-        "ICAO": "hex",
-        "Registration": "reg",
-        "Operator": "operator",
-        "Type": "atype",
-        "ICAO Type": "icao_type",
-        "CMPG": "cmpg",
-        "Tag 1": "tag1",
-        "Tag 2": "tag2",
-        "Tag 3": "tag3",
-        "Category": "category",
-        "Link": "link",
-        "ImageLink": "img1",
-        "ImageLink2": "img2",
-        "ImageLink3": "img3",
-        "ImageLink4": "img4",
+    return {
+        "list": "civ" if args.list == "civcur" else args.list, "head": rev,
+        "sort": sort, "desc": bool(args.desc), "filter": args.filter or "",
+        "total": total, "offset": start, "rows": rows,
+        "next": list(last) if last is not None and stop < total else None,
     }
 
-    out = {}
-    for k, v in (rec_raw or {}).items():
-        kk = m.get(_clean_colname(k))
-        if kk:
-            out[kk] = (v or "").strip()
-    return out
 
+# ---------------- INTERVALLI ICAO ----------------
+# Gli indirizzi ICAO a 24 bit sono assegnati a blocchi (paese, forza armata...). Per le
+# liste di un repo si tiene un array ordinato di tutti gli HEX, costruito una volta per
+# versione dei file: un intervallo [from, to] sono due bisect, senza rileggere i CSV.
+# Un estremo corto è un prefisso: "from":"33FF" da solo vale 33FF00-33FFFF.
+RANGE_LIMIT_MAX = 10000
+_RANGE_INDEX = IndexCache()
 
-def find_hex_locations_with_records(hex_up: str):
-    hx = (hex_up or "").strip().upper()
-    hits = []
-    for lk, fn in FILES.items():
-        p = REPO / fn
-        if not p.is_file():
-            continue
-        try:
-            header, rows = read_csv_file(p)
-            for row in rows:
-                if row and (row[0] or "").strip().upper() == hx:
-                    rec_raw = _row_to_dict(header, row)
-                    rec = _record_to_gui_keys(rec_raw)
-
-                    out_list = "civ" if lk == "civcur" else lk
-                    hits.append({"list": out_list, "file": fn, "record": rec})
-                    break
-        except Exception as e:
-            warn(f"Impossibile leggere {fn}: {e}")
-    return hits
 
+def _range_bound(h, fill: str) -> str:
+    h = (h or "").strip().upper().replace("0X", "")
+    if not re.fullmatch(r"[0-9A-F]{1,6}", h):
+        raise SystemExit(f"ERROR: estremo HEX non valido: {h or '(vuoto)'}")
+    return h.ljust(6, fill)
 
-def _field_names_from_header(header):
-    return header
 
+def _range_index(files):
+    # (HEX ordinati, [(file, riga)] paralleli); le chiavi che non sono HEX restano fuori
+    sig = tuple(ListStore.signature(p) for _lk, _fn, p, _scan in files)
+    idx = _RANGE_INDEX.get(sig)
+    if idx is None:
+        entries = sorted((k, fi, i) for fi, (_lk, _fn, _p, scan) in enumerate(files)
+                         for i, k in enumerate(scan.keys) if HEX_RE.fullmatch(k))
+        idx = _RANGE_INDEX.put(sig, ([k for k, _fi, _i in entries], [(fi, i) for _k, fi, i in entries]))
+    return idx
+
+
+def hex_gaps(keys, lo: str, hi: str, limit: int):
+    # Intervalli [da, a] di indirizzi in [lo, hi] assenti da keys (ordinate, anche ripetute)
+    gaps, free, nxt, end = [], 0, int(lo, 16), int(hi, 16)
+    for k in keys:
+        v = int(k, 16)
+        if v > nxt:
+            free += v - nxt
+            if len(gaps) < limit:
+                gaps.append([f"{nxt:06X}", f"{v - 1:06X}"])
+        nxt = max(nxt, v + 1)
+    if nxt <= end:
+        free += end - nxt + 1
+        if len(gaps) < limit:
+            gaps.append([f"{nxt:06X}", f"{end:06X}"])
+    return gaps, free
+
+
+def range_result(args, repo: Path, rev: str) -> dict:
+    import bisect
+    lo = _range_bound(args.hex_from, "0")
+    hi = _range_bound(args.hex_to or args.hex_from, "F")
+    if lo > hi:
+        raise SystemExit(f"ERROR: intervallo vuoto: {lo} > {hi}")
+    files_map = list_files(repo)
+    if args.list and args.list not in files_map:
+        raise SystemExit(f"ERROR: lista sconosciuta: {args.list}")
+    limit = min(max(int(args.limit or 1000), 1), RANGE_LIMIT_MAX)
+
+    files = [(lk, fn, p, scan_csv_file(p)) for lk in ([args.list] if args.list else files_map)
+             for fn, p in list_shards(repo, lk) if p.is_file()]
+    keys, refs = _range_index(files)
+    a, b = bisect.bisect_left(keys, lo), bisect.bisect_right(keys, hi)
+
+    rows = []
+    for pos in range(a, min(b, a + limit)):
+        fi, i = refs[pos]
+        lk, fn, _p, scan = files[fi]
+        rec = scan.schema.record(next(csv.reader([scan._record_text(i)])))
+        rows.append({**rec, "list": "civ" if lk == "civcur" else lk, "file": fn})
+
+    out = {"from": lo, "to": hi, "head": rev, "total": b - a, "rows": rows, "truncated": b - a > limit}
+    if args.gaps:
+        out["gaps"], out["free"] = hex_gaps(keys[a:b], lo, hi, limit)
+    return out
 
-def diff_against_target(args, hx: str):
-    target_path = REPO / FILES[args.list]
-    header, rows = read_csv_file(target_path)
 
-    new_row = [
-        hx, args.reg, args.operator, args.atype, args.icao_type, args.cmpg,
-        args.tag1, args.tag2, args.tag3, args.category, args.link,
-        args.img1, args.img2, args.img3, args.img4
-    ]
-    new_row = _row_pad(new_row, len(header))
+def diff_against_target(args, hx: str, repo: Path = None):
+    repo = repo or REPO
+    target_fn, target_path = list_target_file(repo, args.list, hx)
+    scan = scan_target_file(target_path)
+    schema = scan.schema
 
-    old_row = None
-    for r in rows:
-        if r and (r[0] or "").strip().upper() == hx:
-            old_row = _row_pad(r, len(header))
-            break
+    idx = scan.find(hx)
+    old_row = _row_pad(scan.row(idx), schema.width) if idx is not None else None
+    new_row = schema.row(args_record(args, hx), old_row)
 
-    locations = [{"list": lk, "file": fn} for lk, fn in find_hex_locations(hx)]
+    locations = [{"list": lk, "file": fn} for lk, fn in find_hex_locations(hx, repo)]
     will_move_from = [x for x in locations if x["list"] != args.list]
 
     changes = []
-    field_names = _field_names_from_header(header)
-    old_dict = _row_to_dict(field_names, old_row or [""] * len(header))
-    new_dict = _row_to_dict(field_names, new_row)
-
-    for k in field_names:
-        new_val = _norm_cell(new_dict.get(k, ""))
+    for i, k in enumerate(schema.header):
+        new_val = _norm_cell(new_row[i])
         if new_val:
-            old_val = _norm_cell(old_dict.get(k, ""))
-            if old_val != new_val:
+            old = old_row[i] if old_row else ""
+            if _norm_cell(old) != new_val:
                 changes.append({
                     "field": k, 
-                    "old": old_dict.get(k, ""), 
+                    "old": old, 
                     "new": new_val
                 })
 
     return {
         "hex": hx,
         "target_list": args.list,
-        "target_file": target_path.name,
+        "target_file": target_fn,
         "exists_in_target": bool(old_row),
         "locations": locations,
         "will_move_from": will_move_from,
@@ -352,60 +1235,57 @@ def diff_against_target(args, hx: str):
     }
 
 
-def upsert_into_target(args, hx: str):
-    p = REPO / FILES[args.list]
-    header, rows = read_csv_file(p)
+def upsert_into_target(repo: Path, args, hx: str):
+    _, p = list_target_file(repo, args.list, hx)
+    scan = scan_target_file(p)
+    header, schema = scan.header, scan.schema
 
-    new_row = [
-        hx, args.reg, args.operator, args.atype, args.icao_type, args.cmpg,
-        args.tag1, args.tag2, args.tag3, args.category, args.link,
-        args.img1, args.img2, args.img3, args.img4
-    ]
-    new_row = _row_pad(new_row, len(header))
+    rec = args_record(args, hx)
+    # cmpg viene dal default della lista: non è un dato perso se la colonna manca
+    lost = [f for f in schema.missing(rec) if f != "cmpg"]
+    if lost:
+        warn(f"{p.name} non ha le colonne per: {', '.join(lost)} (ignorati)")
 
-    idx = None
-    for i, r in enumerate(rows):
-        if r and (r[0] or "").strip().upper() == hx:
-            idx = i
-            break
+    idx = scan.find(hx)
+    old_row = _row_pad(scan.row(idx), schema.width) if idx is not None else None
+    new_row = schema.row(rec, old_row)
+    if old_row is not None and _rows_equal(old_row, new_row):
+        # Identico: nessuna riscrittura del file
+        return p, False, "Unchanged"
 
+    rows = scan.rows()
     if idx is None:
         rows.append(new_row)
         changed = True
         action = "Added"
     else:
-        old_row = _row_pad(rows[idx], len(header))
-        if _rows_equal(old_row, new_row):
-            changed = False
-            action = "Unchanged"
-        else:
-            rows[idx] = new_row
-            changed = True
-            action = "Updated"
+        rows[idx] = new_row
+        changed = True
+        action = "Updated"
 
-    rows.sort(key=lambda r: (r[0] or "").strip().upper() if r else "")
+    rows.sort(key=schema.key_of)
     write_csv_file(p, header, rows)
     return p, changed, action
 
 
-def write_csv(args, hx: str):
+def write_csv(repo: Path, args, hx: str):
     changed_files = []
 
-    locs = find_hex_locations(hx)
+    locs = find_hex_locations(hx, repo)
     for lk, fn in locs:
         if lk == args.list:
             continue
-        path_src = REPO / fn
+        path_src = repo / fn
         if remove_hex_from_file(path_src, hx):
             print(f"Moved: removed {hx} from {lk}({fn})")
             changed_files.append(path_src)
 
-    p_tgt, changed, action = upsert_into_target(args, hx)
+    p_tgt, changed, action = upsert_into_target(repo, args, hx)
     if changed:
-        print(action, hx, "in", p_tgt.name)
+        print(action, hx, "in", p_tgt.relative_to(repo))
         changed_files.append(p_tgt)
     else:
-        print(f"ERROR: HEX {hx} già presente in: {args.list}({p_tgt.name}). Nessuna modifica applicata (identico).")
+        print(f"ERROR: HEX {hx} già presente in: {args.list}({p_tgt.relative_to(repo)}). Nessuna modifica applicata (identico).")
         raise SystemExit(2)
 
     uniq = []
@@ -417,33 +1297,1827 @@ def write_csv(args, hx: str):
     return uniq
 
 
-def git_push(args, paths, hx: str):
-    ensure_git_safe_directory(REPO)
+# ---------------- BULK: ORDINAMENTO ESTERNO ----------------
+# import/resort lavorano in streaming con un tetto di memoria (ADSB_SORT_MEM_MB): le
+# righe oltre il budget vengono ordinate e scaricate in run temporanei su disco, poi
+# fuse con heapq.merge. I run stanno in .git/df-sort (ADSB_SORT_TMP), non in /tmp
+# che sul mini-PC può essere un tmpfs in RAM.
+SORT_MEM_MB = float(os.getenv("ADSB_SORT_MEM_MB", "64"))
+SORT_FAN_IN = 64
+HEX_RE = re.compile(r"[0-9A-F]{6}")
+
+
+def sort_tmp_dir(repo: Path) -> Path:
+    d = Path(os.getenv("ADSB_SORT_TMP") or repo / ".git" / "df-sort")
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def iter_csv_rows(path: Path):
+    # (header, iteratore delle righe) senza caricare il file in memoria; anche .csv.gz
+    if path.suffix == ".gz":
+        import gzip
+        f = gzip.open(path, "rt", encoding="utf-8", newline="")
+    else:
+        f = path.open(encoding="utf-8", newline="")
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        f.close()
+        raise SystemExit(f"File vuoto: {path.name}")
+
+    def rows():
+        with f:
+            for r in reader:
+                if any(c.strip() for c in r):
+                    yield r
+    return header, rows()
+
+
+def _row_bytes(r) -> int:
+    # Stima dell'occupazione in memoria di una riga (lista + stringhe)
+    return 56 + 8 * len(r) + sum(49 + len(c) for c in r)
+
+
+def _spill(tmp: Path, rows) -> Path:
+    import tempfile
+    fd, name = tempfile.mkstemp(prefix="run-", suffix=".csv", dir=tmp)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+    return Path(name)
+
+
+def _read_run(p: Path):
+    with p.open(encoding="utf-8", newline="") as f:
+        yield from csv.reader(f)
+
+
+def external_sort(rows, key, tmp: Path, mem_mb: float = None):
+    # Ordinamento stabile di un iteratore di righe entro il budget; ritorna un iteratore
+    import heapq
+    budget = (SORT_MEM_MB if mem_mb is None else mem_mb) * 1024 * 1024
+    runs, buf, used = [], [], 0
+    for r in rows:
+        buf.append(r)
+        used += _row_bytes(r)
+        if used >= budget:
+            buf.sort(key=key)
+            runs.append(_spill(tmp, buf))
+            buf, used = [], 0
+    buf.sort(key=key)
+    if not runs:
+        return iter(buf)
+
+    # Fusione a più passate se i run sono troppi per tenerli aperti insieme
+    # (gruppi consecutivi, così a parità di chiave resta l'ordine d'ingresso)
+    while len(runs) > SORT_FAN_IN:
+        merged_runs = []
+        for i in range(0, len(runs), SORT_FAN_IN):
+            group = runs[i:i + SORT_FAN_IN]
+            if len(group) == 1:
+                merged_runs.append(group[0])
+                continue
+            merged_runs.append(_spill(tmp, heapq.merge(*map(_read_run, group), key=key)))
+            for p in group:
+                p.unlink()
+        runs = merged_runs
+
+    def merged():
+        try:
+            yield from heapq.merge(*map(_read_run, runs), iter(buf), key=key)
+        finally:
+            for p in runs:
+                p.unlink(missing_ok=True)
+    return merged()
+
+
+def _dedupe_last(rows, key):
+    # Su righe ordinate (stabile) tiene l'ultima per chiave
+    prev = None
+    for r in rows:
+        if prev is not None and key(r) != key(prev):
+            yield prev
+        prev = r
+    if prev is not None:
+        yield prev
+
+
+def merge_join(left, right, key_left, key_right):
+    # Unione di due iteratori ordinati: (chiave, riga sinistra | None, riga destra | None)
+    left, right = iter(left), iter(right)
+    lr, rr = next(left, None), next(right, None)
+    while lr is not None or rr is not None:
+        kl = key_left(lr) if lr is not None else None
+        kr = key_right(rr) if rr is not None else None
+        if rr is None or (lr is not None and kl < kr):
+            yield kl, lr, None
+            lr = next(left, None)
+        elif lr is None or kr < kl:
+            yield kr, None, rr
+            rr = next(right, None)
+        else:
+            yield kl, lr, rr
+            lr, rr = next(left, None), next(right, None)
+
+
+def _rewrite(path: Path, header, rows, changed) -> bool:
+    # Scrive rows in un file temporaneo e sostituisce path solo se changed() è vero alla fine
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")  # come to_line(), senza un buffer per riga
+        w.writerow(header)
+        for r in rows:
+            w.writerow(r)
+            n += 1
+    if changed():
+        os.replace(tmp, path)
+        observe_list_rows(path, n)
+        return True
+    tmp.unlink()
+    return False
+
+
+def _list_targets(repo: Path, lk: str):
+    # File di una lista in ordine di chiave, con il prefisso HEX che coprono (None = tutti)
+    files = list_files(repo)
+    if lk not in files:
+        raise SystemExit(f"ERROR: lista sconosciuta: {lk}")
+    fn = files[lk]
+    d = repo / shard_dir_name(fn)
+    if not d.is_dir():
+        if not (repo / fn).is_file():
+            raise SystemExit(f"ERROR: file non trovato: {fn}")
+        return [(None, repo / fn)]
+    shards = sorted(d.glob("*.csv"))
+    if not shards:
+        raise SystemExit(f"ERROR: nessuno shard in {d.name}/")
+    width = len(shards[0].stem)
+    return [(f"{i:0{width}X}", d / f"{i:0{width}X}.csv") for i in range(16 ** width)]
+
+
+def bulk_import(repo: Path, args):
+    # Upsert in blocco da un CSV (qualsiasi ordine di colonne) nella lista args.list.
+    # Le colonne assenti dal CSV restano quelle attuali; gli HEX importati escono dalle
+    # altre liste come con publish. Ritorna (file cambiati, messaggio di commit).
+    import shutil, tempfile
+    if not args.list:
+        return bulk_update(repo, args)
+    src = Path(args.file)
+    if not src.is_file():
+        raise SystemExit(f"ERROR: file non trovato: {src}")
+    in_header, in_rows = iter_csv_rows(src)
+    in_schema = list_schema(in_header)
+    if "hex" not in in_schema.pos:
+        raise SystemExit(f"ERROR: {src.name} non ha la colonna ICAO")
+    in_key = in_schema.key_of
+
+    tmp = Path(tempfile.mkdtemp(prefix="import-", dir=sort_tmp_dir(repo)))
+    stats = {"added": 0, "updated": 0, "same": 0, "moved": 0, "bad": 0, "links": 0}
+    try:
+        def valid():
+            for r in in_rows:
+                if HEX_RE.fullmatch(in_key(r)):
+                    yield r
+                else:
+                    stats["bad"] += 1
+
+        incoming = _dedupe_last(external_sort(valid(), in_key, tmp, args.mem_mb), in_key)
+        pending = [next(incoming, None)]
+        keys_path = tmp / "keys.txt"
+        keys_out = keys_path.open("w", encoding="utf-8")
+
+        def take(prefix):
+            # Righe importate del prefisso corrente (lo stream è ordinato come gli shard)
+            while pending[0] is not None and (prefix is None or in_key(pending[0]).startswith(prefix)):
+                r = pending[0]
+                keys_out.write(in_key(r) + "\n")
+                yield r
+                pending[0] = next(incoming, None)
+
+        def to_record(r):
+            rec = in_schema.record(r)
+            rec["hex"] = in_key(r)
+            link = rec.get("link", "")
+            if link and not link.startswith(("http://", "https://")):
+                rec["link"] = "https://" + link.lstrip("/")
+                stats["links"] += 1
+            if "cmpg" in rec:
+                rec["cmpg"] = normalize_cmpg(args.list, rec["cmpg"])
+            return rec
+
+        changed_files = []
+        targets = _list_targets(repo, args.list)
+        with next(p for _, p in targets if p.is_file()).open(encoding="utf-8", newline="") as f:
+            header0 = next(csv.reader(f))
+        for prefix, p in targets:
+            header, base = iter_csv_rows(p) if p.is_file() else (header0, iter(()))
+            schema = list_schema(header)
+            base_sorted = external_sort(base, schema.key_of, tmp, args.mem_mb)
+            n0 = stats["added"] + stats["updated"]
+
+            def merged():
+                for _k, old, new in merge_join(base_sorted, take(prefix), schema.key_of, in_key):
+                    if new is None:
+                        yield old
+                        continue
+                    row = schema.row(to_record(new), _row_pad(old, schema.width) if old else None)
+                    if old is None:
+                        stats["added"] += 1
+                    elif _rows_equal(_row_pad(old, schema.width), row):
+                        stats["same"] += 1
+                    else:
+                        stats["updated"] += 1
+                    yield row
+
+            # Uno shard mancante si crea solo se riceve righe
+            if _rewrite(p, header, merged(), lambda: stats["added"] + stats["updated"] > n0):
+                changed_files.append(p)
+        keys_out.close()
+
+        # HEX importati: via dalle altre liste (anti-join con le chiavi ordinate)
+        for lk in list_files(repo):
+            if lk == args.list:
+                continue
+            for fn, p in list_shards(repo, lk):
+                if not p.is_file():
+                    continue
+                header, rows = iter_csv_rows(p)
+                key_of = list_schema(header).key_of
+                removed = []
+
+                def kept():
+                    with keys_path.open(encoding="utf-8") as kf:
+                        keys = (line.rstrip("\n") for line in kf)
+                        for k, row, hit in merge_join(external_sort(rows, key_of, tmp, args.mem_mb), keys,
+                                                      key_of, lambda x: x):
+                            if row is None:
+                                continue
+                            if hit is not None:
+                                removed.append(k)
+                                continue
+                            yield row
+
+                if _rewrite(p, header, kept(), lambda: bool(removed)):
+                    print(f"Moved: removed {len(removed)} HEX from {lk}({fn})")
+                    stats["moved"] += len(removed)
+                    changed_files.append(p)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if stats["bad"]:
+        warn(f"{stats['bad']} righe con HEX non valido scartate")
+    if stats["links"]:
+        warn(f"{stats['links']} link senza schema, aggiunto https://")
+    print(f"Import {src.name} -> {args.list}: {stats['added']} aggiunti, {stats['updated']} aggiornati, "
+          f"{stats['same']} invariati, {stats['moved']} spostati da altre liste")
+    if not changed_files:
+        print(f"ERROR: import {src.name}: nessuna modifica (tutto identico).")
+        raise SystemExit(2)
+    return changed_files, f"Import {src.name} -> {args.list} ({stats['added'] + stats['updated']} righe)"
+
+
+def bulk_resort(repo: Path, args):
+    # Riordina per HEX le liste (o args.list) in streaming; riscrive solo i file non ordinati
+    import shutil, tempfile
+    tmp = Path(tempfile.mkdtemp(prefix="resort-", dir=sort_tmp_dir(repo)))
+    changed_files = []
+    try:
+        for lk in ([args.list] if args.list else list(list_files(repo))):
+            for fn, p in list_shards(repo, lk):
+                if not p.is_file():
+                    continue
+                header, rows = iter_csv_rows(p)
+                key_of = list_schema(header).key_of
+                prev, ordered = "", True
+                for r in rows:
+                    k = key_of(r)
+                    if k < prev:
+                        ordered = False
+                        break
+                    prev = k
+                rows.close()
+                if ordered:
+                    continue
+                header, rows = iter_csv_rows(p)
+                _rewrite(p, header, external_sort(rows, key_of, tmp, args.mem_mb), lambda: True)
+                print(f"Sorted {lk}({fn})")
+                changed_files.append(p)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not changed_files:
+        print("Liste già ordinate")
+    return changed_files, "Resort liste per HEX"
+
+
+def bulk_update(repo: Path, args):
+    # import senza "list" di un batch con colonna List (es. quello di reconcile): ogni riga
+    # aggiorna sul posto l'HEX nella sua lista, le celle vuote restano quelle attuali, niente
+    # aggiunte né spostamenti tra liste. Un solo commit per tutte le liste.
+    import shutil, tempfile
+    src = Path(args.file)
+    if not src.is_file():
+        raise SystemExit(f"ERROR: file non trovato: {src}")
+    in_header, in_rows = iter_csv_rows(src)
+    lcol = next((i for i, c in enumerate(in_header) if _clean_colname(c).lower() == "list"), None)
+    if lcol is None:
+        in_rows.close()
+        raise SystemExit(f"ERROR: serve list, oppure un batch con colonna List ({src.name} non ce l'ha)")
+    in_schema = list_schema(in_header)
+    if "hex" not in in_schema.pos:
+        in_rows.close()
+        raise SystemExit(f"ERROR: {src.name} non ha la colonna ICAO")
+    in_key = in_schema.key_of
+    files = list_files(repo)
+
+    def list_of(r) -> str:
+        v = r[lcol].strip() if lcol < len(r) else ""
+        return LIST_ALIASES.get(v, v)
+
+    def key(r):
+        return list_of(r), in_key(r)
+
+    tmp = Path(tempfile.mkdtemp(prefix="update-", dir=sort_tmp_dir(repo)))
+    stats = {"updated": 0, "same": 0, "missing": 0, "bad": 0}
+    changed_files, touched = [], set()
+    try:
+        def valid():
+            for r in in_rows:
+                if list_of(r) in files and HEX_RE.fullmatch(in_key(r)):
+                    yield r
+                else:
+                    stats["bad"] += 1
+
+        incoming = _dedupe_last(external_sort(valid(), key, tmp, args.mem_mb), key)
+        pending = [next(incoming, None)]
+
+        def take(lk, prefix):
+            while (pending[0] is not None and list_of(pending[0]) == lk
+                   and (prefix is None or in_key(pending[0]).startswith(prefix))):
+                yield pending[0]
+                pending[0] = next(incoming, None)
+
+        for lk in sorted(files):
+            if pending[0] is None or list_of(pending[0]) != lk:
+                continue
+            for prefix, p in _list_targets(repo, lk):
+                if not p.is_file():
+                    stats["missing"] += sum(1 for _ in take(lk, prefix))
+                    continue
+                header, base = iter_csv_rows(p)
+                schema = list_schema(header)
+                n0 = stats["updated"]
+
+                def merged():
+                    for _k, old, new in merge_join(external_sort(base, schema.key_of, tmp, args.mem_mb),
+                                                   take(lk, prefix), schema.key_of, in_key):
+                        if old is None:
+                            stats["missing"] += 1
+                            continue
+                        if new is None:
+                            yield old
+                            continue
+                        rec = {f: v for f, v in in_schema.record(new).items() if v and f != "hex"}
+                        if "cmpg" in rec:
+                            rec["cmpg"] = normalize_cmpg(lk, rec["cmpg"])
+                        old = _row_pad(old, schema.width)
+                        row = schema.row(rec, old)
+                        if _rows_equal(old, row):
+                            stats["same"] += 1
+                        else:
+                            stats["updated"] += 1
+                        yield row
+
+                if _rewrite(p, header, merged(), lambda: stats["updated"] > n0):
+                    changed_files.append(p)
+                    touched.add(lk)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if stats["bad"]:
+        warn(f"{stats['bad']} righe con lista o HEX non validi scartate")
+    if stats["missing"]:
+        warn(f"{stats['missing']} HEX non più nella loro lista, saltati")
+    print(f"Update {src.name}: {stats['updated']} aggiornati in {len(touched)} liste, {stats['same']} invariati")
+    if not changed_files:
+        print(f"ERROR: update {src.name}: nessuna modifica (tutto identico).")
+        raise SystemExit(2)
+    return changed_files, f"Update {src.name} ({stats['updated']} righe, {', '.join(sorted(touched))})"
+
+
+# ---------------- RICONCILIAZIONE ----------------
+# Confronto di tutte le liste con un dump di riferimento (registro aeromobili completo,
+# es. OpenSky aircraftDatabase.csv, anche .gz): il dump viene ridotto ai campi utili,
+# ordinato per HEX con external_sort e fuso in un solo passaggio con le righe di tutte
+# le liste, ordinate allo stesso modo. Le differenze finiscono in un batch CSV con colonna
+# List che "import" senza "list" applica in un solo commit (bulk_update).
+RECONCILE_FIELDS = ("reg", "operator", "icao_type")
+# Nome colonna normalizzato (minuscolo, solo lettere e cifre) -> campo
+REFERENCE_COLUMNS = {
+    "icao": "hex", "icao24": "hex", "hex": "hex", "modes": "hex",
+    "registration": "reg", "reg": "reg", "r": "reg",
+    "operator": "operator", "ownop": "operator", "owner": "operator",
+    "icaotype": "icao_type", "typecode": "icao_type", "t": "icao_type",
+}
+
+
+def reference_columns(header) -> dict:
+    # Campo -> posizione nel dump; a parità di campo vince la prima colonna
+    pos = {}
+    for i, col in enumerate(header):
+        f = REFERENCE_COLUMNS.get(re.sub(r"[^a-z0-9]", "", _clean_colname(col).lower()))
+        if f and f not in pos:
+            pos[f] = i
+    return pos
+
+
+def _same_value(a: str, b: str) -> bool:
+    return _norm_cell(a).casefold() == _norm_cell(b).casefold()
+
+
+def reconcile_result(args, repo: Path, snap: Path, rev: str) -> dict:
+    # repo per run temporanei e batch, snap per leggere le liste al commit rev
+    import shutil, tempfile
+    src = Path(args.reference)
+    if not src.is_file():
+        raise SystemExit(f"ERROR: file non trovato: {src}")
+    files_map = list_files(snap)
+    if args.list and args.list not in files_map:
+        raise SystemExit(f"ERROR: lista sconosciuta: {args.list}")
+    unknown = [f for f in args.fields or () if f not in RECONCILE_FIELDS]
+    if unknown:
+        raise SystemExit(f"ERROR: campi non confrontabili: {', '.join(unknown)} (ammessi: {', '.join(RECONCILE_FIELDS)})")
+
+    ref_header, ref_rows = iter_csv_rows(src)
+    pos = reference_columns(ref_header)
+    fields = [f for f in (args.fields or RECONCILE_FIELDS) if f in pos]
+    if "hex" not in pos or not fields:
+        ref_rows.close()
+        raise SystemExit(f"ERROR: {src.name}: servono la colonna ICAO (icao24, icao, hex) e almeno una "
+                         f"tra registration, operator, typecode")
+    limit = min(max(int(args.limit or 100), 0), RANGE_LIMIT_MAX)
+    lists = [args.list] if args.list else list(files_map)
+    stats = {lk: {"checked": 0, "matched": 0, "missing": 0, "changed": dict.fromkeys(fields, 0)} for lk in lists}
+    have, n_ref = {}, [0]
+    cols = [(f, pos[f]) for f in fields]
+    kh = pos["hex"]
+
+    def reference():
+        # Solo [hex, campi...]: meno memoria e run più piccoli su disco
+        for r in ref_rows:
+            k = (r[kh] if kh < len(r) else "").strip().upper()
+            if HEX_RE.fullmatch(k):
+                n_ref[0] += 1
+                yield [k] + [r[i] if i < len(r) else "" for _f, i in cols]
+
+    def ours():
+        for lk in lists:
+            for _fn, p in list_shards(snap, lk):
+                if not p.is_file():
+                    continue
+                header, rows = iter_csv_rows(p)
+                schema = list_schema(header)
+                have.setdefault(lk, {f for f in fields if f in schema.pos})
+                for r in rows:
+                    k = schema.key_of(r)
+                    if HEX_RE.fullmatch(k):
+                        rec = schema.record(r)
+                        yield [k, lk] + [rec.get(f, "") for f in fields]
+
+    out = Path(args.out) if args.out else repo / ".git" / "df-reconcile" / f"{src.name.partition('.')[0]}-{rev[:10]}.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    part = out.with_name(out.name + ".tmp")
+    columns = {f: "$" + c for c, f in FIELD_BY_COLUMN.items()}
+    tmp = Path(tempfile.mkdtemp(prefix="reconcile-", dir=sort_tmp_dir(repo)))
+    changes, total = [], 0
+    try:
+        upstream = _dedupe_last(external_sort(reference(), lambda r: r[0], tmp, args.mem_mb), lambda r: r[0])
+        ref_row = next(upstream, None)
+        with part.open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(["List", columns["hex"]] + [columns[fd] for fd in fields])
+            for r in external_sort(ours(), lambda r: r[0], tmp, args.mem_mb):
+                k, lk = r[0], r[1]
+                while ref_row is not None and ref_row[0] < k:
+                    ref_row = next(upstream, None)
+                st = stats[lk]
+                st["checked"] += 1
+                if ref_row is None or ref_row[0] != k:
+                    st["missing"] += 1
+                    continue
+                st["matched"] += 1
+                new = {}
+                for j, fd in enumerate(fields):
+                    up, old = ref_row[1 + j].strip(), r[2 + j]
+                    if fd in have[lk] and up and not _same_value(up, old):
+                        new[fd] = (old, up)
+                        st["changed"][fd] += 1
+                if not new:
+                    continue
+                out_list = "civ" if lk == "civcur" else lk
+                w.writerow([out_list, k] + [new[fd][1] if fd in new else "" for fd in fields])
+                total += 1
+                if len(changes) < limit:
+                    changes.append({"list": out_list, "hex": k, **{fd: {"old": o, "new": n} for fd, (o, n) in new.items()}})
+        if total:
+            os.replace(part, out)
+    finally:
+        part.unlink(missing_ok=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {
+        "head": rev, "reference": str(src), "reference_rows": n_ref[0], "fields": fields,
+        "lists": {("civ" if lk == "civcur" else lk): st for lk, st in stats.items()},
+        "total": total, "changes": changes, "truncated": total > len(changes),
+        "batch": str(out) if total else None,
+    }
+
+
+def git_commit(repo: Path, paths, msg: str) -> bool:
+    ensure_git_safe_directory(repo)
 
     for p in paths:
-        subprocess.run(["git", "-C", str(REPO), "add", p.name], check=True)
+        subprocess.run(["git", "-C", str(repo), "add", str(p.relative_to(repo))], check=True)
+
+    r = subprocess.run(["git", "-C", str(repo), "diff", "--cached", "--quiet"])
+    if r.returncode == 0:
+        return False
+    subprocess.run(["git", "-C", str(repo), "commit", "-m", msg], check=True)
+    return True
+
 
-    r = subprocess.run(["git", "-C", str(REPO), "diff", "--cached", "--quiet"])
+def git_push(repo: Path):
+    import time
+    t0 = time.monotonic()
+    r = subprocess.run(["git", "-C", str(repo), "push"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    METRICS.observe("adsb_git_push_duration_seconds", time.monotonic() - t0)
     if r.returncode != 0:
-        msg = f"Upsert {hx} -> {args.list}"
-        subprocess.run(["git", "-C", str(REPO), "commit", "-m", msg], check=True)
-        subprocess.run(["git", "-C", str(REPO), "push"], check=True)
-        print("Pushed")
-    else:
-        print("Nothing to commit")
+        METRICS.inc("adsb_git_push_failures_total", reason="rejected" if push_rejected(r.stderr) else "error")
+        raise subprocess.CalledProcessError(r.returncode, r.args, stderr=r.stderr)
+
+
+def push_rejected(stderr: str) -> bool:
+    # Push rifiutato perché il remoto è andato avanti (un altro editor ha pubblicato prima,
+    # o nello stesso istante: "cannot lock ref" quando due push aggiornano il ramo insieme)
+    return any(s in (stderr or "") for s in ("[rejected]", "non-fast-forward", "fetch first",
+                                               "cannot lock ref", "failed to update ref"))
+
+
+# ---------------- SCHEDULER ----------------
+# I writer (publish/delete/sync) sono serializzati da un file lock in .git.
+# Ogni writer accoda la propria richiesta in .git/df-queue; chi ottiene il lock
+# esegue in un solo ciclo sync/commit/push tutte le richieste in coda e scrive
+# l'esito per ciascuna, gli altri trovano il risultato già pronto.
+COALESCE = os.getenv("ADSB_COALESCE", "1") != "0"
+WRITE_ACTIONS = ("publish", "delete", "import", "resort")
+
+
+class RepoLock:
+    def __init__(self, repo: Path, name: str = "df-list-edit.lock"):
+        self.path = repo / ".git" / name
+        self.f = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        self.f = open(self.path, "a+")
+        try:
+            fcntl.flock(self.f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            self.f.close()
+            self.f = None
+            return False
+        return True
+
+    def release(self):
+        if self.f is not None:
+            import fcntl
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def args_to_request(args) -> dict:
+    req = {
+        "action": args._action if args._action in WRITE_ACTIONS else "publish",
+        "list": args.list, "hex": args.hex, "type": args.atype, "icao_type": args.icao_type,
+        "push": bool(args.push), "autofill": bool(args.autofill),
+        "file": args.file, "mem_mb": args.mem_mb, "request_id": args.request_id,
+    }
+    for k in ["reg", "operator", "cmpg", "tag1", "tag2", "tag3", "category", "link", "img1", "img2", "img3", "img4"]:
+        req[k] = getattr(args, k, "") or ""
+    return req
+
+
+def apply_write(repo: Path, args):
+    # Applica la modifica al working tree; ritorna (file cambiati, messaggio di commit)
+    if args._action == "delete":
+        hx = norm_hex(args.hex)
+        return delete_hex_everywhere(repo, hx), f"Upsert {hx} -> DELETE"
+    if args._action == "import":
+        return bulk_import(repo, args)
+    if args._action == "resort":
+        return bulk_resort(repo, args)
+
+    hx = apply_args_normalizations(args)
+
+    # Autofill disabilitato per privacy (no paths locali)
+    if args.autofill:
+        warn("--autofill disabilitato in questa versione pulita")
+
+    return write_csv(repo, args, hx), f"Upsert {hx} -> {args.list}"
+
+
+def _exit_code(e: SystemExit):
+    if e.code is None:
+        return 0, ""
+    if isinstance(e.code, int):
+        return e.code, ""
+    return 1, f"{e.code}\n"
+
+
+PUSH_RETRIES = int(os.getenv("ADSB_PUSH_RETRIES", "5"))
+PUSH_BACKOFF = float(os.getenv("ADSB_PUSH_BACKOFF", "0.2"))
+
+
+def _apply_batch(repo: Path, batch, results: dict):
+    # Applica ogni richiesta con un commit locale; ritorna (messaggi di commit, id committati)
+    commits, committed = [], []
+    for rid, req in batch:
+        res = results[rid]
+        out, err = io.StringIO(), io.StringIO()
+        # Gli avvisi di ogni richiesta vanno nel suo stderr, anche in modalità server
+        token = _warn_sink.set(None) if _warn_sink is not None else None
+        with capture_output(out, err):
+            try:
+                a = args_from_request(req)
+                paths, msg = apply_write(repo, a)
+                if a.push:
+                    # Commit locale per richiesta: un errore successivo non tocca le altre
+                    if git_commit(repo, paths, msg):
+                        commits.append(msg)
+                        committed.append(rid)
+                    else:
+                        print("Nothing to commit")
+            except SystemExit as e:
+                res["rc"], msg = _exit_code(e)
+                err.write(msg)
+                subprocess.run(["git", "-C", str(repo), "reset", "--hard", "HEAD"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except Exception as e:
+                res["rc"] = 1
+                err.write(f"ERROR: {e}\n")
+                subprocess.run(["git", "-C", str(repo), "reset", "--hard", "HEAD"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if token is not None:
+            _warn_sink.reset(token)
+        res["out"] += out.getvalue()
+        res["err"] += err.getvalue()
+    return commits, committed
+
+
+def run_batch(repo: Path, batch, offline_ok: bool) -> dict:
+    # batch: [(id, req)] -> {id: {"rc", "out", "err"}}
+    import random, time
+
+    results = {rid: {"rc": 0, "out": "", "err": ""} for rid, _ in batch}
+    try:
+        repo_sync_hard(repo, offline_ok=offline_ok)
+    except SystemExit as e:
+        rc, msg = _exit_code(e)
+        for res in results.values():
+            res.update(rc=rc or 1, err=msg)
+        return results
+
+    base = git_head(repo)
+    commits, committed = _apply_batch(repo, batch, results)
+    attempt = 1
+    while commits:
+        if len(commits) > 1:
+            # Un solo commit per tutto il batch
+            subprocess.run(["git", "-C", str(repo), "reset", "--soft", base], check=True)
+            msg = f"Batch: {len(commits)} modifiche\n\n" + "\n".join(commits)
+            subprocess.run(["git", "-C", str(repo), "commit", "-m", msg], check=True)
+
+        try:
+            git_push(repo)
+            line, rc = ("Pushed\n" if attempt == 1 else f"Pushed (tentativo {attempt})\n"), 0
+        except subprocess.CalledProcessError as e:
+            if push_rejected(e.stderr) and attempt <= PUSH_RETRIES:
+                line = None
+            else:
+                detail = [l.strip() for l in (e.stderr or "").splitlines() if l.startswith((" ! ", "fatal:"))]
+                line, rc = f"ERROR: push fallito dopo {attempt} tentativi ({detail[0] if detail else e})\n", 1
+        if line is not None:
+            for rid in committed:
+                if rc:
+                    results[rid]["rc"] = rc
+                    results[rid]["err"] += line
+                else:
+                    results[rid]["out"] += line
+            break
+
+        # Il remoto è andato avanti: niente rebase testuale, si riapplicano le stesse
+        # richieste (modifiche per riga) sul nuovo head, con backoff e jitter
+        time.sleep(PUSH_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        attempt += 1
+        METRICS.inc("adsb_git_push_retries_total")
+        replay = [(rid, req) for rid, req in batch if rid in committed]
+        for rid, _ in replay:
+            results[rid] = {"rc": 0, "out": "", "err": ""}
+        try:
+            repo_sync_hard(repo, offline_ok=False)
+        except SystemExit as e:
+            rc, msg = _exit_code(e)
+            for rid, _ in replay:
+                results[rid].update(rc=rc or 1, err=msg)
+            break
+        base = git_head(repo)
+        commits, committed = _apply_batch(repo, replay, results)
+    return results
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect_batch(qdir: Path, rid: str, req: dict):
+    batch = [(rid, req)]
+    if not (COALESCE and req.get("push")):
+        return batch
+    seen = {req.get("request_id")} - {""}
+    for p in qdir.glob("*.res"):
+        # Esiti mai ritirati (client terminato durante l'attesa)
+        if not _pid_alive(int(p.stem.rsplit("-", 1)[-1])):
+            p.unlink(missing_ok=True)
+    for p in sorted(qdir.glob("*.req")):
+        other = p.stem
+        if other == rid or (qdir / f"{other}.res").exists():
+            continue
+        if not _pid_alive(int(other.rsplit("-", 1)[-1])):
+            p.unlink(missing_ok=True)
+            continue
+        try:
+            oreq = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if not oreq.get("push"):
+            continue
+        # Stesso request_id (ritentativo del client): resta in coda e troverà l'esito nel journal
+        if oreq.get("request_id") and oreq["request_id"] in seen:
+            continue
+        seen.add(oreq.get("request_id") or "")
+        batch.append((other, oreq))
+    return batch
+
+
+# ---------------- JOURNAL ----------------
+# Esiti delle scritture con "request_id" (generato dal client), una riga JSON per
+# richiesta in .git/df-journal.jsonl. Un client che ritenta dopo un timeout con lo
+# stesso id riceve l'esito registrato invece di rifare sync, modifica e push.
+# Si registrano solo gli esiti definitivi (rc 0, o rc 2 = richiesta rifiutata/nessuna
+# modifica): un errore transitorio (sync, push, lista non leggibile) va ritentato davvero.
+# Si scrive sotto RepoLock; oltre 2*JOURNAL_KEEP righe il file viene compattato.
+JOURNAL_KEEP = int(os.getenv("ADSB_JOURNAL_KEEP", "1000"))
+JOURNAL_RC = (0, 2)
+
+
+def journal_path(repo: Path) -> Path:
+    return repo / ".git" / "df-journal.jsonl"
+
+
+def journal_read(repo: Path) -> dict:
+    entries = {}
+    try:
+        with open(journal_path(repo), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue  # riga troncata da un crash durante la scrittura
+                entries[e["request_id"]] = e
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def journal_lookup(repo: Path, request_id: str):
+    if not request_id:
+        return None
+    e = journal_read(repo).get(request_id)
+    if e is None:
+        return None
+    METRICS.inc("adsb_request_replays_total")
+    info(f"Richiesta {request_id} già eseguita: esito dal journal")
+    return {"rc": e["rc"], "out": e["out"], "err": e["err"]}
+
+
+def journal_append(repo: Path, done):
+    # done: [(request_id, esito)]; da chiamare con RepoLock acquisito
+    import time
+
+    done = [(req_id, res) for req_id, res in done if req_id and res["rc"] in JOURNAL_RC]
+    if not done:
+        return
+    p = journal_path(repo)
+    with open(p, "a", encoding="utf-8") as f:
+        for req_id, res in done:
+            f.write(json.dumps({"request_id": req_id, "time": int(time.time()), **res}, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    with open(p, encoding="utf-8") as f:
+        lines = f.readlines()
+    if len(lines) > 2 * JOURNAL_KEEP:
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text("".join(lines[-JOURNAL_KEEP:]), encoding="utf-8")
+        os.replace(tmp, p)
+
+
+def submit_write(repo: Path, req: dict, offline_ok: bool) -> dict:
+    import time
+
+    done = journal_lookup(repo, req.get("request_id"))
+    if done is not None:
+        return done
+
+    qdir = repo / ".git" / "df-queue"
+    qdir.mkdir(parents=True, exist_ok=True)
+    rid = f"{time.time_ns()}-{os.urandom(4).hex()}-{os.getpid()}"
+    req_path = qdir / f"{rid}.req"
+    tmp = qdir / f"{rid}.tmp"
+    tmp.write_text(json.dumps(req, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, req_path)
+
+    res_path = qdir / f"{rid}.res"
+    try:
+        with RepoLock(repo):
+            if not res_path.exists():
+                # Ricontrolla sotto lock: l'originale potrebbe aver finito mentre si aspettava
+                journal = journal_read(repo)
+                batch, results = [], {}
+                for bid, breq in _collect_batch(qdir, rid, req):
+                    if breq.get("request_id") in journal:
+                        results[bid] = journal_lookup(repo, breq["request_id"])
+                    else:
+                        batch.append((bid, breq))
+                if batch:
+                    done = run_batch(repo, batch, offline_ok)
+                    journal_append(repo, [(breq.get("request_id"), done[bid]) for bid, breq in batch])
+                    results.update(done)
+                for bid, res in results.items():
+                    t = qdir / f"{bid}.tmp"
+                    t.write_text(json.dumps(res, ensure_ascii=False), encoding="utf-8")
+                    os.replace(t, qdir / f"{bid}.res")
+                    (qdir / f"{bid}.req").unlink(missing_ok=True)
+        return json.loads(res_path.read_text(encoding="utf-8"))
+    finally:
+        req_path.unlink(missing_ok=True)
+        res_path.unlink(missing_ok=True)
+
+
+def schedule_write(repo: Path, req: dict, offline_ok: bool) -> int:
+    import signal
+
+    if req.get("request_id") and hasattr(signal, "SIGHUP"):
+        # Se la sessione SSH cade la scrittura va comunque finita e registrata nel journal
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    res = submit_write(repo, req, offline_ok)
+    if res["out"]:
+        print(res["out"], end="")
+    if res["err"]:
+        sys.stderr.write(res["err"])
+    return res["rc"]
+
+
+# ---------------- READ SNAPSHOTS ----------------
+# Le azioni di sola lettura non usano il checkout dei writer: leggono un albero
+# immutabile delle liste al commit remoto (.git/df-snapshots/<sha>), condiviso
+# tra processi tramite pin per pid e rimosso quando nessuno lo usa più.
+FETCH_TTL = float(os.getenv("ADSB_FETCH_TTL", "5"))
+SNAPSHOT_KEEP = int(os.getenv("ADSB_SNAPSHOT_KEEP", "2"))
+# I lettori fanno fetch in un loro namespace (refs/df-read/<branch>) senza RepoLock:
+# non toccano indice, HEAD né refs/remotes del checkout dei writer
+READ_REFS = "refs/df-read/"
+
+
+def fetch_for_read(repo: Path, offline_ok: bool) -> str:
+    import time
+    ensure_git_safe_directory(repo)
+
+    if not (repo / ".git").exists():
+        raise SystemExit(f"{repo} non sembra un repository git (manca .git)")
+
+    c = repo_conf(repo)
+    stamp = repo / ".git" / "df-read-fetch"
+
+    def fresh():
+        return stamp.exists() and time.time() - stamp.stat().st_mtime < FETCH_TTL
+
+    # Un fetch recente (anche di un altro processo) basta: evita fetch concorrenti
+    if fresh():
+        METRICS.inc("adsb_cache_hits_total", cache="fetch")
+        return remote_head(repo)
+
+    # Lock solo tra lettori: chi aspetta trova di solito il fetch appena fatto dall'altro
+    with RepoLock(repo, "df-read-fetch.lock"):
+        if fresh():
+            METRICS.inc("adsb_cache_hits_total", cache="fetch")
+            return remote_head(repo)
+        METRICS.inc("adsb_cache_misses_total", cache="fetch")
+        t0 = time.monotonic()
+        # --refmap= evita l'aggiornamento opportunistico di refs/remotes/<remote>/<branch>
+        r = subprocess.run(["git", "-C", str(repo), "-c", "gc.auto=0", "fetch", "-q", "--no-write-fetch-head",
+                            "--refmap=", c["remote"], f"+refs/heads/{c['branch']}:{READ_REFS}{c['branch']}"],
+                           stdout=subprocess.DEVNULL)
+        METRICS.observe("adsb_git_fetch_duration_seconds", time.monotonic() - t0, op="read")
+        if r.returncode == 0:
+            stamp.touch()
+        else:
+            METRICS.inc("adsb_git_fetch_failures_total", op="read")
+            if not offline_ok:
+                raise SystemExit("git fetch fallito. Se vuoi continuare offline usa --offline-ok.")
+            warn("git fetch fallito (offline?), continuo con repo locale.")
+
+    return remote_head(repo)
+
+
+def _rev(repo: Path, ref: str) -> str:
+    r = subprocess.run(["git", "-C", str(repo), "rev-parse", "--verify", "-q", ref], capture_output=True, text=True)
+    return (r.stdout or "").strip()
+
+
+def remote_head(repo: Path) -> str:
+    # Il più recente tra il fetch dei lettori e il ramo remoto che i writer aggiornano a ogni push
+    c = repo_conf(repo)
+    read = _rev(repo, f"{READ_REFS}{c['branch']}")
+    tracking = _rev(repo, f"refs/remotes/{c['remote']}/{c['branch']}")
+    if read and tracking and read != tracking:
+        r = subprocess.run(["git", "-C", str(repo), "merge-base", "--is-ancestor", read, tracking])
+        return tracking if r.returncode == 0 else read
+    return read or tracking or git_head(repo)
+
+
+class ReadSnapshot:
+    def __init__(self, repo: Path, sha: str):
+        self.repo = repo
+        self.sha = sha
+        self.root = repo / ".git" / "df-snapshots"
+        self.path = self.root / sha
+        self.pin = None
+
+    def _materialize(self):
+        # I file sono hardlink a blobs.store/<blob>: i blob invariati tra due commit
+        # condividono l'inode e restano validi nella cache LIST_STORE
+        import shutil
+        store = self.root / "blobs.store"
+        store.mkdir(exist_ok=True)
+        tmp = self.root / f"{self.sha}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for fn, blob in list_blob_ids(self.repo, self.sha).items():
+            src = store / blob
+            if not src.exists():
+                part = store / f"{blob}.part"
+                part.write_bytes(git_cat_blob(self.repo, blob, text=False))
+                os.replace(part, src)
+            p = tmp / fn
+            p.parent.mkdir(parents=True, exist_ok=True)
+            os.link(src, p)
+        tmp.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, self.path)
+
+    def __enter__(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with RepoLock(self.repo, "df-snapshots.lock"):
+            if self.path.is_dir():
+                METRICS.inc("adsb_cache_hits_total", cache="snapshot")
+            else:
+                METRICS.inc("adsb_cache_misses_total", cache="snapshot")
+                self._materialize()
+            pins = self.root / f"{self.sha}.pins"
+            pins.mkdir(exist_ok=True)
+            self.pin = pins / f"{os.getpid()}-{os.urandom(16).hex()}"
+            self.pin.touch()
+        return self.path
+
+    def __exit__(self, *exc):
+        if self.pin is not None:
+            self.pin.unlink(missing_ok=True)
+            self.pin = None
+        gc_snapshots(self.repo)
+
+
+def gc_snapshots(repo: Path, keep: int = None):
+    keep = SNAPSHOT_KEEP if keep is None else keep
+    root = repo / ".git" / "df-snapshots"
+    if not root.is_dir():
+        return
+
+    with RepoLock(repo, "df-snapshots.lock"):
+        snaps = sorted((p for p in root.iterdir() if p.is_dir() and re.fullmatch(r"[0-9a-f]{40,64}", p.name)),
+                       key=lambda p: p.stat().st_mtime, reverse=True)
+        for snap in snaps[keep:]:
+            pins = root / f"{snap.name}.pins"
+            live = 0
+            for pin in (pins.iterdir() if pins.is_dir() else []):
+                if _pid_alive(int(pin.name.split("-", 1)[0])):
+                    live += 1
+                else:
+                    pin.unlink(missing_ok=True)
+            if not live:
+                import shutil
+                shutil.rmtree(snap, ignore_errors=True)
+                shutil.rmtree(pins, ignore_errors=True)
+
+        # Blob non più referenziati da nessuno snapshot
+        store = root / "blobs.store"
+        for blob in (store.iterdir() if store.is_dir() else []):
+            if blob.stat().st_nlink <= 1:
+                blob.unlink(missing_ok=True)
+
+
+# ---------------- WATCHER ----------------
+# Processi long-running: tiene caldo lo snapshot di lettura (e le sue liste in LIST_STORE)
+# quando i ref git cambiano fuori dal tool (fetch dei lettori, push/pull da altre macchine).
+# I CSV del checkout non si osservano: le letture usano solo lo snapshot dell'head remoto.
+WATCH_INTERVAL = float(os.getenv("ADSB_WATCH_INTERVAL", "2"))
+
+
+class _Inotify:
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self):
+        import ctypes, ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fallito")
+        self.wds = {}
+
+    def add(self, path: Path):
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd >= 0:
+            self.wds[wd] = path
+
+    def events(self, timeout: float):
+        import select, struct
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return
+        data = os.read(self.fd, 65536)
+        off = 0
+        while off + 16 <= len(data):
+            wd, _mask, _cookie, n = struct.unpack_from("iIII", data, off)
+            name = data[off + 16:off + 16 + n].rstrip(b"\0").decode(errors="replace")
+            off += 16 + n
+            if wd in self.wds:
+                yield self.wds[wd], name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class RepoWatcher:
+    def __init__(self, repo: Path, on_refs, interval: float = WATCH_INTERVAL):
+        import threading
+        self.repo = repo
+        self.on_refs = on_refs
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="repo-watcher", daemon=True)
+
+    def ref_dirs(self):
+        git = self.repo / ".git"
+        return [git, git / "refs" / "heads", git / "refs" / "remotes" / repo_conf(self.repo)["remote"],
+                git / READ_REFS.rstrip("/")]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _dispatch(self):
+        try:
+            self.on_refs()
+        except Exception as e:
+            warn(f"watch: aggiornamento ref fallito: {e}")
+
+    def run(self):
+        try:
+            ino = _Inotify()
+        except (OSError, AttributeError):
+            return self.run_polling()
+
+        ref_dirs = self.ref_dirs()
+        ref_dirs[-1].mkdir(parents=True, exist_ok=True)
+        for d in ref_dirs:
+            if d.is_dir():
+                ino.add(d)
+        try:
+            while not self._stop.is_set():
+                if any(d != ref_dirs[0] or name in ("HEAD", "packed-refs", "FETCH_HEAD")
+                       for d, name in ino.events(self.interval)):
+                    self._dispatch()
+        finally:
+            ino.close()
+
+    def _poll_state(self):
+        state = {}
+        git = self.repo / ".git"
+        c = repo_conf(self.repo)
+        paths = [git / "HEAD", git / "packed-refs", git / "refs" / "heads" / c["branch"],
+                 git / "refs" / "remotes" / c["remote"] / c["branch"], git / READ_REFS / c["branch"]]
+        for p in paths:
+            try:
+                st = p.stat()
+                state[p] = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except OSError:
+                state[p] = None
+        return state
+
+    def run_polling(self):
+        prev = self._poll_state()
+        while not self._stop.wait(self.interval):
+            cur = self._poll_state()
+            if cur != prev:
+                self._dispatch()
+            prev = cur
+
+
+class WarmRepo:
+    # Snapshot del commit remoto corrente, tenuto pinnato, con le liste già in LIST_STORE.
+    # acquire()/release() contano i lettori in corso: uno snapshot superato viene
+    # rilasciato solo quando l'ultimo lettore ha finito.
+    def __init__(self, repo: Path):
+        import threading
+        self.repo = repo
+        self.sha = None
+        self.path = None
+        self._snaps = {}
+        self._refs = {}
+        self._lock = threading.Lock()
+        self.watcher = RepoWatcher(repo, self.refresh_refs)
+
+    def start(self):
+        self.refresh_refs()
+        self.watcher.start()
+        return self
+
+    def stop(self):
+        self.watcher.stop()
+        with self._lock:
+            snaps, self._snaps = list(self._snaps.values()), {}
+        for snap in snaps:
+            snap.__exit__(None, None, None)
+
+    def refresh_refs(self):
+        sha = remote_head(self.repo)
+        if not sha or sha == self.sha:
+            return
+
+        snap = ReadSnapshot(self.repo, sha)
+        path = snap.__enter__()
+        before = LIST_STORE.misses
+        for _lk, _fn, p in iter_list_files(path):
+            LIST_STORE.get(p)
+
+        with self._lock:
+            if sha == self.sha:
+                retired = snap
+            else:
+                old = self.sha
+                self._snaps[sha] = snap
+                self.sha, self.path = sha, path
+                retired = self._snaps.pop(old, None) if old and not self._refs.get(old) else None
+        if retired is not None:
+            retired.__exit__(None, None, None)
+        info(f"watch: snapshot {sha[:10]} pronto ({LIST_STORE.misses - before} liste rilette)")
+
+    def current(self):
+        with self._lock:
+            return self.sha, self.path
+
+    def acquire(self):
+        with self._lock:
+            self._refs[self.sha] = self._refs.get(self.sha, 0) + 1
+            return self.sha, self.path
+
+    def release(self, sha: str):
+        with self._lock:
+            self._refs[sha] -= 1
+            retired = None
+            if not self._refs[sha]:
+                del self._refs[sha]
+                if sha != self.sha:
+                    retired = self._snaps.pop(sha, None)
+        if retired is not None:
+            retired.__exit__(None, None, None)
+
+
+def run_watch(repo: Path) -> int:
+    import time
+    warm = WarmRepo(repo).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        warm.stop()
+    return 0
+
+
+# ---------------- SNAPSHOT / DELTA ----------------
+def list_blob_ids(repo: Path, rev: str = "HEAD") -> dict:
+    r = subprocess.run(["git", "-C", str(repo), "ls-tree", "-r", rev, "--", *list_pathspecs(repo)],
+                       capture_output=True, text=True)
+    blobs = {}
+    for line in (r.stdout or "").splitlines():
+        meta, _, name = line.partition("\t")
+        parts = meta.split()
+        if len(parts) == 3 and parts[1] == "blob":
+            blobs[name] = parts[2]
+    return blobs
+
+
+def build_snapshot(repo: Path, have: dict, rev: str = "HEAD") -> dict:
+    # Snapshot compresso delle liste: invia solo i file il cui blob differisce da "have"
+    import base64, zlib
+    have = have or {}
+    blobs = list_blob_ids(repo, rev)
+    files = {}
+    for i, (fn, sha) in enumerate(blobs.items()):
+        progress("snapshot", i, len(blobs))
+        if have.get(fn) == sha:
+            continue
+        data = zlib.compress(git_cat_blob(repo, sha, text=False), 9)
+        files[fn] = base64.b64encode(data).decode("ascii")
+    return {
+        "head": git_head(repo) if rev == "HEAD" else rev,
+        "blobs": blobs,
+        "files": files,
+        "removed": [fn for fn in have if fn not in blobs],
+        "list_files": list_files(repo),
+    }
+
+
+def git_commit_exists(repo: Path, rev: str) -> bool:
+    if not rev:
+        return False
+    r = subprocess.run(["git", "-C", str(repo), "cat-file", "-e", f"{rev}^{{commit}}"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return r.returncode == 0
+
+
+def git_cat_blob(repo: Path, blob: str, text: bool = True):
+    r = subprocess.run(["git", "-C", str(repo), "cat-file", "blob", blob],
+                       capture_output=True, check=True)
+    return r.stdout.decode("utf-8", errors="replace") if text else r.stdout
+
+
+def row_key(row, key: int = 0) -> str:
+    return (row[key] or "").strip().upper() if len(row) > key else ""
+
+
+def row_hash(row) -> str:
+    import hashlib
+    return hashlib.sha1("\x1f".join(row).encode("utf-8")).hexdigest()
+
+
+def rows_by_hex(rows, key: int = 0) -> dict:
+    return {row_key(r, key): r for r in rows if r}
+
+
+def changes_since(repo: Path, since: str, head: str = None) -> dict:
+    # Delta a livello di riga tra il commit "since" e head, confrontando i blob git
+    head = head or git_head(repo)
+    reset = not git_commit_exists(repo, since)
+    old_blobs = {} if reset else list_blob_ids(repo, since)
+    new_blobs = list_blob_ids(repo, head)
+
+    lists = {}
+    names = sorted(set(old_blobs) | set(new_blobs))
+    for i, fn in enumerate(names):
+        progress("changes_since", i, len(names))
+        ob, nb = old_blobs.get(fn), new_blobs.get(fn)
+        if ob == nb:
+            continue
+        entry = {"list": list_key_for_file(fn, repo)}
+        lists[fn] = entry
+        if nb is None:
+            entry["deleted"] = True
+            continue
+
+        new_header, new_rows = parse_csv_text(git_cat_blob(repo, nb), fn)
+        old_header, old_rows = parse_csv_text(git_cat_blob(repo, ob), fn) if ob else (None, [])
+        if new_header != old_header:
+            entry["header"] = new_header
+
+        old_key = list_schema(old_header).key if old_header else 0
+        old_hashes = {hx: row_hash(r) for hx, r in rows_by_hex(old_rows, old_key).items()}
+        new_map = rows_by_hex(new_rows, list_schema(new_header).key)
+        added, changed = [], []
+        for hx, r in new_map.items():
+            h = old_hashes.get(hx)
+            if h is None:
+                added.append(r)
+            elif h != row_hash(r):
+                changed.append(r)
+        entry["added"] = added
+        entry["changed"] = changed
+        entry["removed"] = [hx for hx in old_hashes if hx not in new_map]
+
+    return {"since": since, "head": head, "reset": reset, "lists": lists, "list_files": list_files(repo)}
+
+
+def apply_changes(repo: Path, delta: dict):
+    # Applica l'output di changes_since a una copia locale delle liste (mirror)
+    for fn, entry in (delta.get("lists") or {}).items():
+        p = repo / fn
+        if entry.get("deleted"):
+            if p.is_file():
+                p.unlink()
+            continue
+
+        if p.is_file() and not delta.get("reset"):
+            header, rows = read_csv_file(p)
+        else:
+            header, rows = [], []
+            p.parent.mkdir(parents=True, exist_ok=True)
+        header = entry.get("header") or header
+
+        key_of = list_schema(header).key_of
+        m = {key_of(r): r for r in rows if r}
+        for hx in entry.get("removed", []):
+            m.pop(hx, None)
+        for r in entry.get("added", []) + entry.get("changed", []):
+            m[key_of(r)] = r
+
+        write_csv_file(p, header, sorted(m.values(), key=key_of))
+
+
+# ---------------- HISTORY ----------------
+# Indice per HEX delle versioni dei record, aggiornato percorrendo solo i commit nuovi
+# (un solo "git log --raw"). In .git/df-history/<HH>.jsonl (HH = prime due cifre
+# dell'HEX) una riga per versione: [hex, commit, time, subject, list, row_hash, record];
+# row_hash e record sono null quando la riga viene rimossa dalla lista.
+# state.json ricorda l'ultimo commit indicizzato.
+HISTORY_DIR = "df-history"
+NULL_BLOB = "0" * 40
+
+
+def _history_log(repo: Path, since: str, head: str):
+    # [(sha, time, subject, [(file, old_blob, new_blob)])] in ordine cronologico, first-parent
+    rng = [f"{since}..{head}"] if since else [head]
+    r = subprocess.run(["git", "-C", str(repo), "log", "--reverse", "--first-parent", "-m", "--raw",
+                        "--no-abbrev", "--no-renames", "--format=%x01%H%x00%ct%x00%s", *rng,
+                        "--", *list_pathspecs(repo)], capture_output=True, text=True, check=True)
+    commits = []
+    for line in r.stdout.splitlines():
+        if line.startswith("\x01"):
+            sha, ct, subj = line[1:].split("\x00", 2)
+            commits.append((sha, int(ct), subj, []))
+        elif line.startswith(":") and commits:
+            meta, _, fn = line.partition("\t")
+            parts = meta.split()
+            commits[-1][3].append((fn, parts[2], parts[3]))
+    return commits
+
+
+def prefetch_blobs(repo: Path, blobs):
+    # In un clone parziale (bootstrap blobless) i blob vecchi mancano: li si scarica con un
+    # solo fetch, come fa git internamente, invece di uno alla volta alla prima lettura
+    remote = repo_conf(repo)["remote"]
+    if _git_value(repo, "config", f"remote.{remote}.promisor") != "true":
+        return
+    blobs = sorted(set(blobs) - {NULL_BLOB})
+    if blobs:
+        subprocess.run(["git", "-C", str(repo), "-c", "fetch.negotiationAlgorithm=noop", "fetch", "-q", remote,
+                        "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none",
+                        "--stdin"], input="\n".join(blobs) + "\n", text=True, stdout=subprocess.DEVNULL)
+
+
+def _blob_scan(repo: Path, blob: str, fn: str):
+    # (ListScan, {hex: testo grezzo del record}) di un blob di lista; si confronta il
+    # testo e si decodificano solo le righe cambiate
+    if blob == NULL_BLOB:
+        return None, {}
+    scan = ListScan(git_cat_blob(repo, blob), fn)
+    return scan, {hx: (scan._record_text(i), i) for i, hx in enumerate(scan.keys) if hx}
+
+
+def update_history_index(repo: Path, head: str) -> str:
+    # Porta l'indice fino a head; ritorna l'ultimo commit indicizzato
+    d = repo / ".git" / HISTORY_DIR
+    d.mkdir(exist_ok=True)
+    with RepoLock(repo, "df-history.lock"):
+        try:
+            state = json.loads((d / "state.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        since = state.get("head", "")
+        if since == head:
+            return head
+
+        if since and subprocess.run(["git", "-C", str(repo), "merge-base", "--is-ancestor", since, head]).returncode != 0:
+            # Storia riscritta (force push): si ricostruisce da zero
+            since = ""
+        if not since:
+            for p in d.glob("*.jsonl"):
+                p.unlink()
+
+        log = _history_log(repo, since, head)
+        prefetch_blobs(repo, [b for *_, files in log for _fn, old, new in files for b in (old, new)])
+        last = {}
+        buckets = {}
+        for sha, ct, subj, files in log:
+            # Confronto per lista e non per file: una riga che passa da un file all'altro
+            # della stessa lista (es. divisione in shard) non è una nuova versione
+            per_list = {}
+            for fn, old, new in files:
+                lk = list_key_for_file(fn, repo)
+                if lk is None:
+                    continue
+                prev_blob, old_rows = last.get(fn, (None, None))
+                if prev_blob != old:
+                    old_rows = _blob_scan(repo, old, fn)[1]
+                scan, new_rows = _blob_scan(repo, new, fn)
+                last[fn] = (new, new_rows)
+
+                o, n = per_list.setdefault(lk, ({}, {}))
+                o.update(old_rows)
+                n.update((hx, (text, scan, i)) for hx, (text, i) in new_rows.items())
+
+            for lk, (o, n) in per_list.items():
+                for hx, (text, scan, i) in n.items():
+                    if o.get(hx, (None,))[0] != text:
+                        r = scan.row(i)
+                        rec = scan.schema.record(r)
+                        buckets.setdefault(hx[:2], []).append([hx, sha, ct, subj, lk, row_hash(r), rec])
+                for hx in o.keys() - n.keys():
+                    buckets.setdefault(hx[:2], []).append([hx, sha, ct, subj, lk, None, None])
+
+        for prefix, entries in buckets.items():
+            with open(d / f"{prefix}.jsonl", "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+
+        tmp = d / "state.json.tmp"
+        tmp.write_text(json.dumps({"head": head}), encoding="utf-8")
+        os.replace(tmp, d / "state.json")
+        return head
+
+
+def history_versions(repo: Path, hx: str) -> list:
+    versions, seen = [], set()
+    try:
+        f = open(repo / ".git" / HISTORY_DIR / f"{hx[:2]}.jsonl", encoding="utf-8")
+    except FileNotFoundError:
+        return versions
+    with f:
+        for line in f:
+            if not line.startswith(f'["{hx}"'):
+                continue
+            _hx, sha, ct, subj, lk, h, rec = json.loads(line)
+            # Un aggiornamento interrotto può aver lasciato righe doppie
+            if (sha, lk) in seen:
+                continue
+            seen.add((sha, lk))
+            versions.append({
+                "commit": sha, "time": ct, "subject": subj,
+                "list": "civ" if lk == "civcur" else lk, "file": list_files(repo).get(lk, lk),
+                "row_hash": h, "removed": h is None, "record": rec,
+            })
+    return versions
+
+
+def history_result(repo: Path, hx: str, rev: str) -> dict:
+    head = update_history_index(repo, rev)
+    return {"hex": hx, "head": head, "versions": history_versions(repo, hx)}
+
+
+def revert_args(repo: Path, args, rev: str):
+    # Trasforma una richiesta revert in publish (o delete) della versione scelta
+    hx = norm_hex(args.hex)
+    update_history_index(repo, rev)
+    commit = (getattr(args, "commit", "") or "").strip().lower()
+    if not commit:
+        raise SystemExit("ERROR: revert richiede \"commit\"")
+
+    found = [v for v in history_versions(repo, hx) if v["commit"].startswith(commit)]
+    if args.list:
+        found = [v for v in found if LIST_ALIASES.get(v["list"], v["list"]) == args.list]
+    if not found:
+        raise SystemExit(f"ERROR: nessuna versione di {hx} al commit {commit}")
+    if len(found) > 1:
+        raise SystemExit(f"ERROR: al commit {commit} {hx} cambia in più liste, specifica \"list\"")
+
+    v = found[0]
+    if v["removed"]:
+        args._action = "delete"
+        args.hex = hx
+        return
+
+    args._action = "publish"
+    args.list = LIST_ALIASES.get(v["list"], v["list"])
+    for k in ["reg", "operator", "atype", "icao_type", "cmpg", "tag1", "tag2", "tag3", "category", "link",
+              "img1", "img2", "img3", "img4"]:
+        setattr(args, k, v["record"].get(k, ""))
+    args.hex = hx
+
+
+# ---------------- MANUTENZIONE REPO ----------------
+# bootstrap clona (o riclona) il repo delle liste come clone parziale senza blob
+# (mode=blobless, default: storia completa, blob scaricati solo quando servono) o
+# superficiale (mode=shallow, ultimi "depth" commit) e pianifica "git maintenance".
+# maintain esegue subito la manutenzione (e riaccorcia la storia di un clone shallow).
+# Entrambe riportano tempo di fetch e dimensione di .git prima e dopo.
+MAINT_TASKS = ("commit-graph", "loose-objects", "incremental-repack", "pack-refs")
+
+
+def _git_value(repo: Path, *args) -> str:
+    r = subprocess.run(["git", "-C", str(repo), *args], capture_output=True, text=True)
+    return (r.stdout or "").strip() if r.returncode == 0 else ""
+
+
+def repo_stats(repo: Path, offline_ok: bool) -> dict:
+    import time
+    remote = repo_conf(repo)["remote"]
+    t0 = time.monotonic()
+    r = subprocess.run(["git", "-C", str(repo), "fetch", "-q", remote], stdout=subprocess.DEVNULL)
+    fetch_s = round(time.monotonic() - t0, 3)
+    if r.returncode != 0:
+        if not offline_ok:
+            raise SystemExit("git fetch fallito. Se vuoi continuare offline usa --offline-ok.")
+        warn("git fetch fallito (offline?), tempo di fetch non misurato.")
+        fetch_s = None
+
+    counts = dict(l.split(": ", 1) for l in _git_value(repo, "count-objects", "-v").splitlines() if ": " in l)
+    return {
+        "fetch_s": fetch_s,
+        "git_kb": sum(int(counts.get(k, 0)) for k in ("size", "size-pack", "size-garbage")),
+        "commits": int(_git_value(repo, "rev-list", "--count", "HEAD") or 0),
+        "shallow": _git_value(repo, "rev-parse", "--is-shallow-repository") == "true",
+        "partial": _git_value(repo, "config", f"remote.{remote}.promisor") == "true",
+    }
+
+
+def print_repo_stats(before, after: dict):
+    def fetch(st):
+        return "-" if not st or st["fetch_s"] is None else f"{st['fetch_s']:.3f} s"
+
+    def size(st):
+        return "-" if not st else f"{st['git_kb'] / 1024:.1f} MB"
+
+    kind = "shallow" if after["shallow"] else "blobless" if after["partial"] else "completo"
+    print(f"Fetch: {fetch(before)} -> {fetch(after)}")
+    print(f".git: {size(before)} -> {size(after)}")
+    print(f"Commit: {before['commits'] if before else '-'} -> {after['commits']} ({kind})")
+
+
+def schedule_maintenance(repo: Path):
+    # Strategia "incremental": prefetch e commit-graph ogni ora, loose-objects e
+    # incremental-repack ogni giorno (cron/systemd dell'utente, via git maintenance start)
+    subprocess.run(["git", "-C", str(repo), "config", "maintenance.strategy", "incremental"], check=True)
+    r = subprocess.run(["git", "-C", str(repo), "maintenance", "start"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if r.returncode != 0:
+        warn("git maintenance start non riuscito (cron/systemd non disponibili?): "
+             "esegui l'azione maintain periodicamente.")
+
+
+def bootstrap_repo(repo: Path, args) -> dict:
+    import shutil, time
+    mode = (args.mode or "blobless").strip().lower()
+    if mode not in ("blobless", "shallow"):
+        raise SystemExit(f"ERROR: mode sconosciuto: {mode} (blobless, shallow)")
+    depth = int(args.depth or 50)
+
+    c = repo_conf(repo)
+    before, lock, identity = None, None, {}
+    url = args.url
+    if (repo / ".git").exists():
+        if mode == "shallow" and (repo / ".git" / HISTORY_DIR / "state.json").exists():
+            # Un clone shallow non ha i commit a cui punta l'indice di history/revert
+            raise SystemExit("ERROR: mode shallow non ammesso: il repo ha un indice di history (usa blobless)")
+        before = repo_stats(repo, args.offline_ok)
+        url = url or _git_value(repo, "remote", "get-url", c["remote"])
+        identity = {k: _git_value(repo, "config", "--local", k) for k in ("user.name", "user.email")}
+        lock = RepoLock(repo)
+        if not lock.acquire(blocking=False):
+            raise SystemExit("ERROR: repo occupato (scrittura in corso), riprova più tardi")
+        qdir = repo / ".git" / "df-queue"
+        if qdir.is_dir() and any(qdir.glob("*.req")):
+            lock.release()
+            raise SystemExit("ERROR: repo occupato (richieste in coda in df-queue), riprova più tardi")
+    elif repo.exists() and any(repo.iterdir()):
+        raise SystemExit(f"ERROR: {repo} esiste e non è un repository git")
+    if not url:
+        raise SystemExit("ERROR: serve url (repo remoto da clonare)")
+    if "://" not in url and Path(url).expanduser().exists():
+        # Con un percorso locale git ignora --filter/--depth: serve un URL file://
+        url = Path(url).expanduser().resolve().as_uri()
+
+    # Clone accanto e scambio finale: il repo attuale resta valido se il clone fallisce
+    tmp = repo.with_name(f"{repo.name}.bootstrap-{os.getpid()}")
+    try:
+        cmd = ["git", "clone", "-q", "-b", c["branch"], "--origin", c["remote"]]
+        cmd += ["--filter=blob:none"] if mode == "blobless" else ["--depth", str(depth)]
+        t0 = time.monotonic()
+        r = subprocess.run(cmd + [url, str(tmp)])
+        if r.returncode != 0:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise SystemExit(f"ERROR: git clone fallito ({url})")
+        print(f"Clone {mode}: {time.monotonic() - t0:.2f} s")
+
+        if mode == "shallow":
+            subprocess.run(["git", "-C", str(tmp), "config", "adsb.depth", str(depth)], check=True)
+        for k, v in identity.items():
+            if v:
+                subprocess.run(["git", "-C", str(tmp), "config", k, v], check=True)
+
+        if before is not None:
+            if (repo / ".local-backup").is_dir():
+                shutil.move(str(repo / ".local-backup"), str(tmp / ".local-backup"))
+            # Stato del backend nel vecchio .git (journal, df-history, df-queue, lock, snapshot):
+            # si sposta nel nuovo, così retry idempotenti e history sopravvivono allo scambio
+            for p in (repo / ".git").glob("df-*"):
+                if p.name != "df-sort":
+                    shutil.move(str(p), str(tmp / ".git" / p.name))
+            old = repo.with_name(f"{repo.name}.old-{os.getpid()}")
+            os.replace(repo, old)
+            os.replace(tmp, repo)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            repo.parent.mkdir(parents=True, exist_ok=True)
+            if repo.exists():
+                repo.rmdir()
+            os.replace(tmp, repo)
+    finally:
+        if lock is not None:
+            lock.release()
+
+    ensure_git_safe_directory(repo)
+    schedule_maintenance(repo)
+    after = repo_stats(repo, args.offline_ok)
+    print_repo_stats(before, after)
+    res = {"mode": mode, "before": before, "after": after}
+    if mode == "shallow":
+        res["history_depth"] = depth  # history/revert vedono solo gli ultimi "depth" commit
+    return res
+
+
+def maintain_repo(repo: Path, args) -> dict:
+    if not (repo / ".git").exists():
+        raise SystemExit(f"{repo} non sembra un repository git (manca .git): usa l'azione bootstrap")
+    c = repo_conf(repo)
+    before = repo_stats(repo, args.offline_ok)
+    with RepoLock(repo):
+        depth = _git_value(repo, "config", "adsb.depth")
+        if depth and before["shallow"]:
+            # La storia di un clone shallow cresce a ogni fetch: la si riporta a "depth" commit
+            subprocess.run(["git", "-C", str(repo), "fetch", "-q", "--depth", depth, c["remote"], c["branch"]],
+                           stdout=subprocess.DEVNULL)
+            subprocess.run(["git", "-C", str(repo), "reflog", "expire", "--expire-unreachable=now", "--all"])
+            subprocess.run(["git", "-C", str(repo), "gc", "-q", "--prune=now"])
+        subprocess.run(["git", "-C", str(repo), "maintenance", "run", "--quiet"]
+                       + [f"--task={t}" for t in MAINT_TASKS], stdout=subprocess.DEVNULL)
+        subprocess.run(["git", "-C", str(repo), "prune", "--expire=2.weeks.ago"])
+    gc_snapshots(repo)
+    after = repo_stats(repo, args.offline_ok)
+    print_repo_stats(before, after)
+    return {"before": before, "after": after}
+
+
+ARG_DEFAULTS = {
+    "list": None, "hex": None,
+    "reg": "", "operator": "", "atype": "", "icao_type": "", "cmpg": "",
+    "tag1": "", "tag2": "", "tag3": "", "category": "", "link": "",
+    "img1": "", "img2": "", "img3": "", "img4": "",
+    "autofill": False, "json": False, "push": False,
+    "stdin_json": False, "offline_ok": False, "_action": "",
+    "framing": [], "encoding": "json", "watch": False,
+    "file": "", "mem_mb": None,
+    "url": "", "mode": "", "depth": 0,
+    "sort": "", "desc": False, "filter": "", "offset": 0, "limit": 0, "after": None,
+    "hex_from": "", "hex_to": "", "gaps": False,
+    "reference": "", "out": "", "fields": [],
+    "request_id": "", "repo": "",
+}
+
+
+def args_from_request(req: dict):
+    # Namespace equivalente a parse_args_cli() + richiesta JSON, senza argparse
+    args = types.SimpleNamespace(**ARG_DEFAULTS)
+    apply_request(args, req)
+    apply_list_aliases(args)
+    return args
 
 
 def apply_stdin_json(args):
     req = json.loads(sys.stdin.read() or "{}")
 
+    if (req.get("action") or "").strip().lower() == "ping":
+        print("OK")
+        raise SystemExit(0)
+
+    apply_request(args, req)
+
+
+def apply_request(args, req: dict):
     action = (req.get("action") or "").strip().lower()
     args._action = action
+    args.framing = req.get("framing") or []
+    args.encoding = req.get("encoding") or "json"
+    args.request_id = str(req.get("request_id") or "").strip()
+    args.repo = (req.get("repo") or args.repo or "").strip()
 
-    if action == "ping":
-        print("OK")
-        raise SystemExit(0)
+    if action == "snapshot":
+        args.have = req.get("have") or {}
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action == "changes_since":
+        args.since = (req.get("since") or "").strip()
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action in ("sync", "head"):
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action == "page":
+        args.list = req.get("list")
+        args.sort = (req.get("sort") or "").strip()
+        args.desc = bool(req.get("desc", False))
+        args.filter = (req.get("filter") or "").strip()
+        args.offset = int(req.get("offset") or 0)
+        args.limit = int(req.get("limit") or 0)
+        args.after = req.get("after") or None
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action == "range":
+        args.list = req.get("list")
+        args.hex_from = str(req.get("from") or "").strip()
+        args.hex_to = str(req.get("to") or "").strip()
+        args.gaps = bool(req.get("gaps", False))
+        args.limit = int(req.get("limit") or 0)
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action == "reconcile":
+        args.list = req.get("list")
+        if req.get("reference"):
+            args.reference = str(Path(req["reference"]).expanduser().resolve())
+        if req.get("out"):
+            args.out = str(Path(req["out"]).expanduser().resolve())
+        args.fields = [str(f).strip().lower() for f in req.get("fields") or []]
+        args.mem_mb = float(req["mem_mb"]) if req.get("mem_mb") else None
+        args.limit = int(req.get("limit") or 0)
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action in ("bootstrap", "maintain"):
+        args.url = (req.get("url") or "").strip()
+        args.mode = (req.get("mode") or "").strip()
+        args.depth = int(req.get("depth") or 0)
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
+
+    if action in ("import", "resort"):
+        args.list = req.get("list")
+        if req.get("file"):
+            args.file = str(Path(req["file"]).expanduser().resolve())
+        args.mem_mb = float(req["mem_mb"]) if req.get("mem_mb") else None
+        args.push = bool(req.get("push", True))
+        args.offline_ok = bool(req.get("offline_ok", False))
+        return
 
-    if action == "sync":
+    if action in ("history", "revert"):
+        args.hex = req.get("hex")
+        args.list = req.get("list")
+        args.commit = (req.get("commit") or "").strip()
+        args.push = bool(req.get("push", True))
         args.offline_ok = bool(req.get("offline_ok", False))
         return
 
@@ -477,9 +3151,10 @@ def apply_stdin_json(args):
 
 
 def parse_args_cli():
+    import argparse
     ap = argparse.ArgumentParser(description="Gestisce liste ADS-B in repo GitHub (publish/delete/sync)")
 
-    ap.add_argument("--list", choices=list(FILES.keys()))
+    ap.add_argument("--list", choices=sorted({lk for c in repo_registry().values() for lk in c["files"]}))
     ap.add_argument("--hex")
 
     ap.add_argument("--reg", default="")
@@ -507,81 +3182,182 @@ def parse_args_cli():
     ap.add_argument("--offline-ok", action="store_true",
                     help="Se GitHub non raggiungibile, continua comunque (NO sync).")
 
-    ap.set_defaults(_action="")
+    ap.add_argument("--repo", help="Repository di liste da ADSB_REPOS (default: ADSB_REPO_PATH)")
+
+    ap.add_argument("--watch", action="store_true",
+                    help="Resta in esecuzione e tiene aggiornati snapshot e cache quando liste o ref git cambiano.")
+
+    ap.set_defaults(**ARG_DEFAULTS)
 
     args = ap.parse_args()
     return ap, args
 
 
+# Percorso rapido per GUI e bot, che lanciano un processo per richiesta: con solo questi
+# flag argparse non viene nemmeno importato.
+FAST_FLAGS = {"--stdin-json": "stdin_json", "--offline-ok": "offline_ok", "--push": "push",
+              "--json": "json", "--autofill": "autofill"}
+
+
+class _JsonArgsError:
+    # Al posto del parser nel percorso rapido: stesso messaggio e rc 2 di ap.error()
+    @staticmethod
+    def error(msg: str):
+        sys.stderr.write(f"{Path(sys.argv[0]).name}: error: {msg}\n")
+        raise SystemExit(2)
+
+
+def fast_args(argv):
+    # Namespace per "--stdin-json [flag booleani]", None se serve argparse
+    if "--stdin-json" not in argv or not all(a in FAST_FLAGS for a in argv):
+        return None
+    args = types.SimpleNamespace(**ARG_DEFAULTS)
+    for a in argv:
+        setattr(args, FAST_FLAGS[a], True)
+    return args
+
+
 def main():
-    ap, args = parse_args_cli()
+    args = fast_args(sys.argv[1:])
+    if args is not None:
+        ap = _JsonArgsError
+    else:
+        ap, args = parse_args_cli()
 
     if args.stdin_json:
         apply_stdin_json(args)
+        if args.framing:
+            start_framing(args.framing, args.encoding)
 
     apply_list_aliases(args)
 
+    if args.watch:
+        return run_watch(repo_path(args.repo))
+
+    import time
+    t0, rc = time.monotonic(), 1
+    try:
+        rc = run_action(ap, args)
+        return rc
+    except SystemExit as e:
+        rc = _exit_code(e)[0]
+        raise
+    finally:
+        observe_request(request_action(args), rc, time.monotonic() - t0)
+        if METRICS_TEXTFILE:
+            write_metrics_textfile(Path(METRICS_TEXTFILE))
+
+
+def run_action(ap, args) -> int:
+    repo = repo_path(args.repo)
+
     if args._action == "sync":
-        repo_sync_hard(REPO, offline_ok=getattr(args, "offline_ok", False))
+        with RepoLock(repo):
+            repo_sync_hard(repo, offline_ok=getattr(args, "offline_ok", False))
         print("OK")
         return 0
 
+    if args._action == "bootstrap":
+        bootstrap_repo(repo, args)
+        return 0
+
+    if args._action == "maintain":
+        maintain_repo(repo, args)
+        return 0
+
+    if args._action == "head":
+        # Solo il commit remoto corrente: la GUI lo usa per validare la sua cache di "where"
+        emit_json({"head": fetch_for_read(repo, args.offline_ok)})
+        return 0
+
+    if args._action == "snapshot":
+        rev = fetch_for_read(repo, args.offline_ok)
+        emit_json(build_snapshot(repo, getattr(args, "have", {}), rev))
+        return 0
+
+    if args._action == "changes_since":
+        rev = fetch_for_read(repo, args.offline_ok)
+        emit_json(changes_since(repo, getattr(args, "since", ""), rev))
+        return 0
+
     if args._action == "where":
         if not args.hex:
             ap.error("the following arguments are required: --hex")
-        repo_sync_hard(REPO, offline_ok=args.offline_ok)
         hx = norm_hex(args.hex)
-        locs = find_hex_locations_with_records(hx)
-        print(json.dumps({"hex": hx, "locations": locs}, ensure_ascii=False))
+        rev = fetch_for_read(repo, args.offline_ok)
+        with ReadSnapshot(repo, rev) as snap:
+            emit_json(where_result(hx, snap, rev))
         return 0
 
     if args._action == "diff":
         if not args.hex or not args.list:
             ap.error("the following arguments are required: --list, --hex")
-        repo_sync_hard(REPO, offline_ok=args.offline_ok)
         hx = apply_args_normalizations(args)
-        dj = diff_against_target(args, hx)
-        print(json.dumps(dj, ensure_ascii=False))
+        rev = fetch_for_read(repo, args.offline_ok)
+        with ReadSnapshot(repo, rev) as snap:
+            emit_json(diff_result(args, hx, snap, rev))
         return 0
 
-    if args._action == "delete":
+    if args._action == "page":
+        if not args.list:
+            ap.error("the following arguments are required: --list")
+        rev = fetch_for_read(repo, args.offline_ok)
+        with ReadSnapshot(repo, rev) as snap:
+            emit_json(page_result(args, snap, rev))
+        return 0
+
+    if args._action == "range":
+        if not args.hex_from:
+            ap.error("the following arguments are required: from")
+        rev = fetch_for_read(repo, args.offline_ok)
+        with ReadSnapshot(repo, rev) as snap:
+            emit_json(range_result(args, snap, rev))
+        return 0
+
+    if args._action == "reconcile":
+        if not args.reference:
+            ap.error("the following arguments are required: reference")
+        rev = fetch_for_read(repo, args.offline_ok)
+        with ReadSnapshot(repo, rev) as snap:
+            emit_json(reconcile_result(args, repo, snap, rev))
+        return 0
+
+    if args._action == "history":
         if not args.hex:
             ap.error("the following arguments are required: --hex")
+        rev = fetch_for_read(repo, args.offline_ok)
+        emit_json(history_result(repo, norm_hex(args.hex), rev))
+        return 0
 
-        repo_sync_hard(REPO, offline_ok=args.offline_ok)
+    if args._action == "revert":
+        if not args.hex:
+            ap.error("the following arguments are required: --hex")
+        revert_args(repo, args, fetch_for_read(repo, args.offline_ok))
 
-        hx = norm_hex(args.hex)
-        changed_paths = delete_hex_everywhere(hx)
+    if args._action == "delete":
+        if not args.hex:
+            ap.error("the following arguments are required: --hex")
+        return schedule_write(repo, args_to_request(args), args.offline_ok)
 
-        if args.push and changed_paths:
-            args.list = "DELETE"
-            git_push(args, changed_paths, hx)
-        elif args.push and not changed_paths:
-            print("Nothing to commit")
+    if args._action == "import":
+        if not args.file:
+            ap.error("the following arguments are required: file")
+        return schedule_write(repo, args_to_request(args), args.offline_ok)
 
-        return 0
+    if args._action == "resort":
+        return schedule_write(repo, args_to_request(args), args.offline_ok)
 
     if not args.list or not args.hex:
         ap.error("the following arguments are required: --list, --hex")
 
-    repo_sync_hard(REPO, offline_ok=args.offline_ok)
-
-    hx = apply_args_normalizations(args)
-
-    # Autofill disabilitato per privacy (no paths locali)
-    if args.autofill:
-        warn("--autofill disabilitato in questa versione pulita")
-
     if args.json:
+        hx = apply_args_normalizations(args)
+        if args.autofill:
+            warn("--autofill disabilitato in questa versione pulita")
         print_json(args, hx)
         return 0
 
-    changed_paths = write_csv(args, hx)
-
-    if args.push:
-        git_push(args, changed_paths, hx)
-
-    return 0
+    return schedule_write(repo, args_to_request(args), args.offline_ok)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# Server JSON-RPC per client sullo stesso host (bot, feeder), alternativo a
+# "ssh ... df_list_edit.py --stdin-json". Una richiesta JSON per riga, stessi campi
+# di --stdin-json più un "id" opzionale; una risposta per riga:
+#   {"id": ..., "rc": 0, "result": {...}, "out": "...", "err": "..."}
+# Le richieste sulla stessa connessione possono essere inviate senza attendere la
+# risposta (pipelining): le letture girano in parallelo, le risposte escono appena pronte.
+# "id" serve solo ad abbinare le risposte; per le scritture "request_id" rende sicuro il
+# ritentativo (esito dal journal, vedi df_list_edit.journal_lookup).
+#   python df_list_server.py --unix /run/adsb-lists.sock
+#   python df_list_server.py --tcp 127.0.0.1:8765
+# Con --metrics 127.0.0.1:9108 espone le metriche Prometheus su http://127.0.0.1:9108/metrics.
+# Serve anche i repository di ADSB_REPOS ("repo" nella richiesta): ognuno ha il suo snapshot
+# caldo, la sua finestra di fetch e la sua coda di scrittura.
+import argparse, asyncio, json, os, signal, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import df_list_edit as backend
+
+READ_WORKERS = int(os.getenv("ADSB_SERVER_READ_WORKERS", "8"))
+WRITE_WORKERS = int(os.getenv("ADSB_SERVER_WRITE_WORKERS", "4"))
+
+READ_ACTIONS = ("ping", "head", "where", "diff", "page", "range", "reconcile", "snapshot", "changes_since", "history", "autofill")
+
+
+class RequestError(Exception):
+    def __init__(self, rc: int, msg: str):
+        super().__init__(msg)
+        self.rc = rc
+
+
+def _required(args, *names):
+    missing = [n for n in names if not getattr(args, n)]
+    if missing:
+        raise RequestError(2, "the following arguments are required: " + ", ".join("--" + n for n in missing))
+
+
+class RepoState:
+    # Stato di un repository servito: snapshot caldo e freschezza del fetch
+    def __init__(self, repo):
+        self.repo = repo
+        self.warm = backend.WarmRepo(repo)
+        self._fetch_lock = threading.Lock()
+        self._fetched = None
+
+    def fresh_rev(self, offline_ok: bool):
+        # Un solo fetch per finestra ADSB_FETCH_TTL, condiviso dalle richieste concorrenti
+        with self._fetch_lock:
+            if self._fetched is None or time.monotonic() - self._fetched >= backend.FETCH_TTL:
+                backend.fetch_for_read(self.repo, offline_ok)
+                self._fetched = time.monotonic()
+                self.warm.refresh_refs()
+
+
+class ListServer:
+    def __init__(self, repos: dict):
+        self.repos = {name: RepoState(path) for name, path in repos.items()}
+        self.reads = ThreadPoolExecutor(READ_WORKERS, thread_name_prefix="read")
+        self.writes = ThreadPoolExecutor(WRITE_WORKERS, thread_name_prefix="write")
+        self.conns = set()
+
+    def start(self):
+        for st in self.repos.values():
+            st.warm.start()
+
+    def stop(self):
+        self.reads.shutdown()
+        self.writes.shutdown()
+        for st in self.repos.values():
+            st.warm.stop()
+
+    def state(self, args) -> RepoState:
+        st = self.repos.get(args.repo or "default")
+        if st is None:
+            raise RequestError(2, f"repo sconosciuto: {args.repo} (noti: {', '.join(self.repos)})")
+        return st
+
+    def handle_read(self, args):
+        action = args._action
+        if action == "ping":
+            return "OK"
+
+        if args.json:
+            _required(args, "list", "hex")
+            hx = backend.apply_args_normalizations(args)
+            if args.autofill:
+                backend.warn("--autofill disabilitato in questa versione pulita")
+            return backend.record_json(args, hx)
+
+        st = self.state(args)
+        st.fresh_rev(args.offline_ok)
+        if action == "head":
+            return {"head": st.warm.current()[0]}
+        sha, path = st.warm.acquire()
+        try:
+            if action == "where":
+                _required(args, "hex")
+                return backend.where_result(backend.norm_hex(args.hex), path, sha)
+            if action == "diff":
+                _required(args, "list", "hex")
+                hx = backend.apply_args_normalizations(args)
+                return backend.diff_result(args, hx, path, sha)
+            if action == "page":
+                _required(args, "list")
+                return backend.page_result(args, path, sha)
+            if action == "range":
+                if not args.hex_from:
+                    raise RequestError(2, "the following arguments are required: from")
+                return backend.range_result(args, path, sha)
+            if action == "reconcile":
+                _required(args, "reference")
+                return backend.reconcile_result(args, st.repo, path, sha)
+            if action == "history":
+                _required(args, "hex")
+                return backend.history_result(st.repo, backend.norm_hex(args.hex), sha)
+            if action == "snapshot":
+                return backend.build_snapshot(st.repo, getattr(args, "have", {}), sha)
+            return backend.changes_since(st.repo, getattr(args, "since", ""), sha)
+        finally:
+            st.warm.release(sha)
+
+    def handle_write(self, args) -> dict:
+        st = self.state(args)
+        if args._action == "sync":
+            with backend.RepoLock(st.repo):
+                backend.repo_sync_hard(st.repo, offline_ok=args.offline_ok)
+            return {"rc": 0, "out": "OK\n", "err": ""}
+
+        if args._action == "bootstrap":
+            raise RequestError(2, "bootstrap riclona il repo: ferma il server ed eseguilo da CLI")
+
+        if args._action == "maintain":
+            import io
+            out = io.StringIO()
+            with backend.capture_output(out, None):
+                backend.maintain_repo(st.repo, args)
+            return {"rc": 0, "out": out.getvalue(), "err": ""}
+
+        if args._action == "revert":
+            _required(args, "hex")
+            st.fresh_rev(args.offline_ok)
+            backend.revert_args(st.repo, args, st.warm.current()[0])
+
+        if args._action == "delete":
+            _required(args, "hex")
+        elif args._action == "import":
+            _required(args, "file")
+        elif args._action != "resort":
+            _required(args, "list", "hex")
+        return backend.submit_write(st.repo, backend.args_to_request(args), args.offline_ok)
+
+    def run(self, req: dict) -> dict:
+        resp = {"id": req.get("id"), "rc": 0, "result": None, "out": "", "err": ""}
+        action = (req.get("action") or "").strip().lower() or "publish"
+        t0 = time.monotonic()
+
+        def call():
+            nonlocal action
+            args = backend.args_from_request(req)
+            action = backend.request_action(args)
+            if args._action in READ_ACTIONS or args.json:
+                resp["result"] = self.handle_read(args)
+            else:
+                res = self.handle_write(args)
+                resp.update(rc=res["rc"], out=res["out"], err=res["err"])
+
+        try:
+            _, warns = backend.capture_warnings(call)
+            if warns:
+                resp["err"] = "\n".join(warns) + "\n" + resp["err"]
+        except RequestError as e:
+            resp.update(rc=e.rc, err=f"ERROR: {e}\n")
+        except SystemExit as e:
+            rc, msg = backend._exit_code(e)
+            resp.update(rc=rc or 1, err=msg)
+        except Exception as e:
+            resp.update(rc=1, err=f"ERROR: {e}\n")
+        backend.observe_request(action, resp["rc"], time.monotonic() - t0)
+        return resp
+
+    async def dispatch(self, line: bytes, writer, wlock):
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("serve un oggetto JSON")
+        except ValueError as e:
+            resp = {"id": None, "rc": 2, "result": None, "out": "", "err": f"ERROR: JSON non valido: {e}\n"}
+        else:
+            action = (req.get("action") or "").strip().lower()
+            pool = self.reads if action in READ_ACTIONS else self.writes
+            resp = await asyncio.get_running_loop().run_in_executor(pool, self.run, req)
+
+        data = (json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8")
+        async with wlock:
+            writer.write(data)
+            await writer.drain()
+
+    async def handle_conn(self, reader, writer):
+        wlock = asyncio.Lock()
+        tasks = set()
+        me = asyncio.current_task()
+        self.conns.add(me)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                t = asyncio.create_task(self.dispatch(line, writer, wlock))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            pass  # arresto del server: smette di leggere, le richieste già ricevute si completano
+        finally:
+            # Una scrittura avviata va finita comunque (gira in un thread): si aspetta e si risponde
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.conns.discard(me)
+            writer.close()
+
+
+    async def handle_metrics(self, reader, writer):
+        # HTTP minimo per lo scrape di Prometheus: solo GET /metrics
+        try:
+            line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+            if len(line) >= 2 and line[0] == "GET" and line[1].partition("?")[0] == "/metrics":
+                status, body = "200 OK", backend.metrics_text().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(srv: ListServer, unix: str = None, host: str = "127.0.0.1", port: int = 8765, metrics: str = None):
+    limit = 64 * 1024 * 1024
+    if unix:
+        if os.path.exists(unix):
+            os.unlink(unix)
+        server = await asyncio.start_unix_server(srv.handle_conn, path=unix, limit=limit)
+        where = unix
+    else:
+        server = await asyncio.start_server(srv.handle_conn, host=host, port=port, limit=limit)
+        where = f"{host}:{port}"
+    repos = ", ".join(f"{name}={st.repo}" for name, st in srv.repos.items())
+    backend.info(f"df_list_server in ascolto su {where} (repo {repos})")
+    mserver = None
+    if metrics:
+        mhost, _, mport = metrics.rpartition(":")
+        mserver = await asyncio.start_server(srv.handle_metrics, host=mhost or "127.0.0.1", port=int(mport))
+        backend.info(f"metriche su http://{mhost or '127.0.0.1'}:{mport}/metrics")
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+            # Niente nuove connessioni; quelle aperte finiscono le richieste in corso e chiudono
+            server.close()
+            conns = list(srv.conns)
+            for t in conns:
+                t.cancel()
+            await asyncio.gather(*conns, return_exceptions=True)
+        backend.info("df_list_server fermato")
+    finally:
+        if mserver is not None:
+            mserver.close()
+        if unix and os.path.exists(unix):
+            os.unlink(unix)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Server JSON-RPC per le liste ADS-B (alternativa a SSH --stdin-json)")
+    ap.add_argument("--unix", help="Percorso del socket Unix")
+    ap.add_argument("--tcp", default="127.0.0.1:8765", help="host:porta TCP (default 127.0.0.1:8765)")
+    ap.add_argument("--metrics", help="host:porta dell'endpoint HTTP /metrics (Prometheus), es. 127.0.0.1:9108")
+    a = ap.parse_args()
+
+    host, _, port = a.tcp.rpartition(":")
+    srv = ListServer({name: c["path"] for name, c in backend.repo_registry().items()})
+    srv.start()
+    try:
+        asyncio.run(serve(srv, unix=a.unix, host=host or "127.0.0.1", port=int(port), metrics=a.metrics))
+    finally:
+        srv.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Divisione delle liste grandi per prefisso HEX e ricostruzione del CSV canonico.
+#   python df_list_shards.py split civcur --shards 16 --push
+#   python df_list_shards.py assemble civcur -o plane-alert-civ-curated-images.csv
+#   python df_list_shards.py assemble civcur --rev origin/main -o -
+# split sostituisce "<nome>.csv" con "<nome>.d/<prefisso>.csv" (commit nel repo);
+# assemble ricompone un solo CSV ordinato per HEX, uguale a quello non diviso.
+import argparse, io, sys
+from pathlib import Path
+
+import df_list_edit as backend
+
+
+def _list_key(repo, name: str) -> str:
+    lk = backend.LIST_ALIASES.get(name, name)
+    if lk not in backend.list_files(repo):
+        raise SystemExit(f"ERROR: lista sconosciuta: {name}")
+    return lk
+
+
+def split_list(repo, lk: str, shards: int):
+    fn = backend.list_files(repo)[lk]
+    src = repo / fn
+    d = repo / backend.shard_dir_name(fn)
+    if d.is_dir():
+        raise SystemExit(f"ERROR: {fn} è già divisa in {d.name}/")
+    if not src.is_file():
+        raise SystemExit(f"ERROR: file non trovato: {fn}")
+
+    width = {16: 1, 256: 2}[shards]
+    header, rows = backend.read_csv_file(src)
+    key_of = backend.list_schema(header).key_of
+    parts = {f"{i:0{width}X}": [] for i in range(shards)}
+    bad = []
+    for r in rows:
+        hx = key_of(r)
+        if hx[:width] in parts:
+            parts[hx[:width]].append(r)
+        else:
+            bad.append(hx or "<vuoto>")
+    if bad:
+        raise SystemExit(f"ERROR: HEX non validi in {fn}: {', '.join(bad[:10])}")
+
+    d.mkdir()
+    for prefix, part in parts.items():
+        backend.write_csv_file(d / f"{prefix}.csv", header, sorted(part, key=key_of))
+    src.unlink()
+    return [src] + [d / f"{prefix}.csv" for prefix in parts]
+
+
+def assemble_list(repo, lk: str, rev: str = None):
+    # (header, righe ordinate) della lista, dal working tree o da un commit
+    header, rows = None, []
+    if rev:
+        blobs = backend.list_blob_ids(repo, rev)
+        sources = [(fn, backend.git_cat_blob(repo, blob)) for fn, blob in sorted(blobs.items())
+                   if backend.list_key_for_file(fn, repo) == lk]
+        parsed = [backend.parse_csv_text(text, fn) for fn, text in sources]
+    else:
+        parsed = [backend.read_csv_file(p) for _fn, p in backend.list_shards(repo, lk) if p.is_file()]
+    if not parsed:
+        raise SystemExit(f"ERROR: nessun file per la lista {lk}")
+
+    for h, part in parsed:
+        if header is None:
+            header = h
+        elif h != header:
+            raise SystemExit(f"ERROR: intestazioni diverse tra gli shard di {lk}")
+        rows.extend(part)
+    return header, sorted(rows, key=backend.list_schema(header).key_of)
+
+
+def cmd_split(a):
+    repo = backend.repo_path(a.repo)
+    lk = _list_key(repo, a.list)
+    fn = backend.list_files(repo)[lk]
+    with backend.RepoLock(repo):
+        backend.repo_sync_hard(repo, offline_ok=a.offline_ok)
+        paths = split_list(repo, lk, a.shards)
+        if backend.git_commit(repo, paths, f"Shard {fn} in {a.shards} parti"):
+            if a.push:
+                backend.git_push(repo)
+    print(f"OK: {fn} -> {backend.shard_dir_name(fn)}/ ({a.shards} shard)")
+    return 0
+
+
+def cmd_assemble(a):
+    repo = backend.repo_path(a.repo)
+    header, rows = assemble_list(repo, _list_key(repo, a.list), a.rev)
+    if a.output == "-":
+        buf = io.StringIO()
+        buf.write(backend.to_line(header))
+        for r in rows:
+            buf.write(backend.to_line(r))
+        sys.stdout.write(buf.getvalue())
+    else:
+        backend.write_csv_file(Path(a.output).resolve(), header, rows)
+        backend.info(f"{len(rows)} righe -> {a.output}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Divide le liste per prefisso HEX e ricompone il CSV canonico")
+    ap.add_argument("--repo", default="", help="Repository di liste da ADSB_REPOS (default: ADSB_REPO_PATH)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("split", help="Divide una lista del repo in shard per prefisso HEX (commit)")
+    p.add_argument("list")
+    p.add_argument("--shards", type=int, choices=[16, 256], default=16)
+    p.add_argument("--push", action="store_true", help="Push dopo il commit")
+    p.add_argument("--offline-ok", action="store_true", help="Se GitHub non raggiungibile, continua comunque (NO sync).")
+    p.set_defaults(fn=cmd_split)
+
+    p = sub.add_parser("assemble", help="Ricompone il CSV canonico unico di una lista")
+    p.add_argument("list")
+    p.add_argument("-o", "--output", required=True, help="File di destinazione, '-' per stdout")
+    p.add_argument("--rev", help="Legge da un commit invece che dal working tree (es. origin/main)")
+    p.set_defaults(fn=cmd_assemble)
+
+    a = ap.parse_args()
+    return a.fn(a)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
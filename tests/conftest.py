@@ -0,0 +1,105 @@
+# Fixture comuni: remote bare locale + clone con le liste di FILES, backend lanciato
+# come processo separato (come fa la GUI via SSH) con --stdin-json.
+import csv, json, os, subprocess, sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import df_list_edit as backend  # noqa: E402
+
+HEADER = ["$ICAO", "$Registration", "$Operator", "$Type", "$ICAO Type", "#CMPG", "$Tag 1", "$#Tag 2",
+          "$#Tag 3", "Category", "$#Link", "#ImageLink", "#ImageLink2", "#ImageLink3", "#ImageLink4"]
+
+SEED = {
+    "mil": [["3C0001", "54+01", "Luftwaffe", "Airbus A400", "A400", "Mil", "", "", "", "Mil", "", "", "", "", ""],
+            ["33FF01", "MM62175", "Aeronautica Militare", "C-130J", "C30J", "Mil", "", "", "", "Mil", "", "", "", "", ""],
+            ["AE0001", "10-0001", "US Air Force", "C-130J", "C30J", "Mil", "", "", "", "Mil", "", "", "", "", ""]],
+    "gov": [["400001", "G-GOVT", "UK Government", "AW139", "A139", "Gov", "", "", "", "Gov", "", "", "", "", ""]],
+    "pol": [["300001", "I-POLI", "Polizia di Stato", "AW139", "A139", "Pol", "", "", "", "Police", "", "", "", "", ""]],
+    "flyingdocs": [["4B0001", "HB-ZRA", "Rega", "H145", "EC45", "Civ", "", "", "", "Flying Doctors", ""]],
+    "civcur": [["A00001", "N1", "Private", "H145", "EC45", "Civ", "", "", "", "Civ", "", "", "", "", ""]],
+}
+
+
+def git(*args, cwd=None) -> str:
+    r = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return r.stdout.strip()
+
+
+def write_list(path: Path, header, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def read_list(text: str) -> dict:
+    rows = list(csv.reader(text.splitlines()))
+    return {r[0]: r for r in rows[1:] if r}
+
+
+class Lists(SimpleNamespace):
+    def env(self, **extra) -> dict:
+        return {**os.environ, "ADSB_REPO_PATH": str(self.repo), "ADSB_FETCH_TTL": "0",
+                "ADSB_PUSH_BACKOFF": "0", **extra}
+
+    def popen(self, req: dict, **env):
+        p = subprocess.Popen([sys.executable, str(ROOT / "df_list_edit.py"), "--stdin-json"],
+                             cwd=ROOT, env=self.env(**env), stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        p.stdin.write(json.dumps(req))
+        p.stdin.close()
+        return p
+
+    def run(self, req: dict, **env) -> SimpleNamespace:
+        p = self.popen(req, **env)
+        out, err = p.stdout.read(), p.stderr.read()
+        return SimpleNamespace(rc=p.wait(), out=out, err=err)
+
+    def remote_log(self) -> list:
+        return git("--git-dir", str(self.remote), "log", "--format=%s", backend.BRANCH).splitlines()
+
+    def remote_files(self, rev: str = None) -> list:
+        rev = rev or backend.BRANCH
+        return git("--git-dir", str(self.remote), "diff-tree", "--no-commit-id", "--name-only", "-r", rev).splitlines()
+
+    def remote_list(self, fn: str) -> dict:
+        return read_list(git("--git-dir", str(self.remote), "show", f"{backend.BRANCH}:{fn}"))
+
+    def push_from_elsewhere(self, fn: str, row):
+        # Un altro editor pubblica direttamente sul remoto
+        other = self.remote.with_name("other")
+        if not other.exists():
+            git("clone", "-q", "-b", backend.BRANCH, str(self.remote), str(other))
+        git("pull", "-q", cwd=other)
+        p = other / fn
+        with p.open("a", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerow(row)
+        git("-c", "user.name=other", "-c", "user.email=other@localhost", "commit", "-qam", f"Other {row[0]}", cwd=other)
+        git("push", "-q", cwd=other)
+
+
+def make_lists(tmp_path: Path) -> Lists:
+    remote, seed, repo = tmp_path / "remote.git", tmp_path / "seed", tmp_path / "repo"
+    git("init", "-q", "--bare", "-b", backend.BRANCH, str(remote))
+    git("init", "-q", "-b", backend.BRANCH, str(seed))
+    for lk, fn in backend.FILES.items():
+        rows = SEED[lk]
+        write_list(seed / fn, HEADER[:len(rows[0])], rows)
+    git("add", "-A", cwd=seed)
+    git("-c", "user.name=seed", "-c", "user.email=seed@localhost", "commit", "-qm", "init", cwd=seed)
+    git("push", "-q", str(remote), backend.BRANCH, cwd=seed)
+    git("clone", "-q", "-b", backend.BRANCH, str(remote), str(repo))
+    git("config", "user.name", "test", cwd=repo)
+    git("config", "user.email", "test@localhost", cwd=repo)
+    return Lists(remote=remote, repo=repo, tmp=tmp_path)
+
+
+@pytest.fixture
+def lists(tmp_path) -> Lists:
+    return make_lists(tmp_path)
@@ -0,0 +1,30 @@
+import fcntl, time
+
+from conftest import backend
+
+
+def test_queued_writers_share_one_commit(lists):
+    hexes = ["3C0A01", "3C0A02", "3C0A03"]
+    qdir = lists.repo / ".git" / "df-queue"
+
+    # Con il lock in mano i writer restano in coda: chi lo ottiene per primo li esegue tutti
+    with open(lists.repo / ".git" / "df-list-edit.lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        procs = [lists.popen({"action": "publish", "list": "mil", "hex": hx, "reg": f"REG{i}", "push": True})
+                 for i, hx in enumerate(hexes)]
+        deadline = time.monotonic() + 30
+        while len(list(qdir.glob("*.req"))) < len(hexes):
+            assert time.monotonic() < deadline, "writer non accodati"
+            time.sleep(0.05)
+        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    results = [(p.wait(), p.stdout.read(), p.stderr.read()) for p in procs]
+    assert [rc for rc, _, _ in results] == [0, 0, 0], results
+    assert all("Pushed" in out for _, out, _ in results)
+
+    log = lists.remote_log()
+    assert len(log) == 2
+    assert log[0] == "Batch: 3 modifiche"
+    rows = lists.remote_list(backend.FILES["mil"])
+    assert {hx: rows[hx][1] for hx in hexes} == {"3C0A01": "REG0", "3C0A02": "REG1", "3C0A03": "REG2"}
+    assert not list(qdir.glob("*.req"))
@@ -0,0 +1,61 @@
+import subprocess
+
+from conftest import backend, git, write_list
+from test_shards import split
+
+
+def test_import_merges_columns_and_moves_rows(lists):
+    src = lists.tmp / "in.csv"
+    # Colonne in un altro ordine e solo alcune; righe non ordinate, un HEX ripetuto
+    write_list(src, ["$Operator", "$ICAO", "$#Link"], [
+        ["Aeronautica Militare", "3c0555", ""],
+        ["Bundeswehr", "3C0001", "www.example.org/3c0001"],
+        ["UK Mil", "400001", ""],
+        ["AMI", "3C0555", ""],
+    ])
+
+    r = lists.run({"action": "import", "list": "mil", "file": str(src), "push": True})
+    assert r.rc == 0, r.err
+    assert "2 aggiunti, 1 aggiornati, 0 invariati, 1 spostati da altre liste" in r.out
+    assert len(lists.remote_log()) == 2
+
+    mil = lists.remote_list(backend.FILES["mil"])
+    assert list(mil) == ["33FF01", "3C0001", "3C0555", "400001", "AE0001"]
+    # Le colonne assenti dal CSV restano quelle attuali
+    assert mil["3C0001"][:4] == ["3C0001", "54+01", "Bundeswehr", "Airbus A400"]
+    assert mil["3C0001"][10] == "https://www.example.org/3c0001"
+    # HEX ripetuto: vale l'ultima riga
+    assert mil["3C0555"][2] == "AMI"
+    assert mil["400001"][2] == "UK Mil"
+    assert "400001" not in lists.remote_list(backend.FILES["gov"])
+    assert mil["33FF01"] == ["33FF01", "MM62175", "Aeronautica Militare", "C-130J", "C30J", "Mil",
+                             "", "", "", "Mil", "", "", "", "", ""]
+
+
+def test_import_without_changes_is_refused(lists):
+    src = lists.tmp / "in.csv"
+    write_list(src, ["$ICAO", "$Registration"], [["3C0001", "54+01"]])
+    r = lists.run({"action": "import", "list": "mil", "file": str(src), "push": True})
+    assert r.rc == 2
+    assert "0 aggiunti, 0 aggiornati, 1 invariati" in r.out
+    assert "nessuna modifica" in r.out
+    assert lists.remote_log() == ["init"]
+
+
+def test_import_into_shards_skips_missing_empty_shards(lists):
+    split(lists, "mil")
+    d = backend.shard_dir_name(backend.FILES["mil"])
+    git("rm", "-q", f"{d}/5.csv", f"{d}/F.csv", cwd=lists.repo)
+    git("commit", "-qm", "Rimuovi shard vuoti", cwd=lists.repo)
+    git("push", "-q", cwd=lists.repo)
+
+    src = lists.tmp / "in.csv"
+    write_list(src, ["$ICAO", "$Registration"], [["F00001", "NEW1"], ["3C0001", "54+XX"]])
+    r = lists.run({"action": "import", "list": "mil", "file": str(src), "push": True})
+    assert r.rc == 0, r.err
+
+    assert sorted(lists.remote_files()) == [f"{d}/3.csv", f"{d}/F.csv"]
+    assert lists.remote_list(f"{d}/F.csv")["F00001"][1] == "NEW1"
+    assert not (lists.repo / d / "5.csv").exists()
+    status = subprocess.run(["git", "status", "--porcelain"], cwd=lists.repo, capture_output=True, text=True).stdout
+    assert status == ""
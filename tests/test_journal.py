@@ -0,0 +1,62 @@
+import json
+
+from conftest import backend
+
+
+def test_retry_with_same_request_id_returns_recorded_result(lists):
+    req = {"action": "publish", "list": "pol", "hex": "300002", "reg": "I-POLB", "push": True, "request_id": "gui-1"}
+    first = lists.run(req)
+    assert first.rc == 0, first.err
+    assert "Pushed" in first.out
+    log = lists.remote_log()
+
+    # Ritentativo (es. dopo un timeout SSH): stesso esito, nessun nuovo sync/commit/push
+    again = lists.run(req)
+    assert again.rc == 0
+    # Il journal ha l'output del backend (quello di git va direttamente sul terminale)
+    assert again.out == "Added 300002 in plane-alert-pol-images.csv\nPushed\n"
+    assert first.out.endswith(again.out)
+    assert "gui-1 già eseguita" in again.err
+    assert lists.remote_log() == log
+
+    # L'id identifica la richiesta: anche con dati diversi vale l'esito registrato
+    retry = lists.run({**req, "reg": "I-ALTRO"})
+    assert retry.out == again.out
+    assert lists.remote_list(backend.FILES["pol"])["300002"][1] == "I-POLB"
+
+    entries = [json.loads(line) for line in (lists.repo / ".git" / "df-journal.jsonl").read_text().splitlines()]
+    assert [(e["request_id"], e["rc"]) for e in entries] == [("gui-1", 0)]
+
+
+def test_failed_request_is_not_recorded(lists):
+    # Push fallito (non un rifiuto per remoto avanzato): errore transitorio, il ritentativo rifà la scrittura
+    hook = lists.repo / ".git" / "hooks" / "pre-push"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    hook.chmod(0o755)
+    req = {"action": "publish", "list": "pol", "hex": "300003", "reg": "I-POLC", "push": True, "request_id": "gui-2"}
+    first = lists.run(req)
+    assert first.rc == 1
+    assert "push fallito" in first.err
+    assert not (lists.repo / ".git" / "df-journal.jsonl").exists()
+
+    hook.unlink()
+    again = lists.run(req)
+    assert again.rc == 0, again.err
+    assert "già eseguita" not in again.err
+    assert again.out.endswith("Pushed\n")
+    assert lists.remote_list(backend.FILES["pol"])["300003"][1] == "I-POLC"
+
+
+def test_refused_request_is_recorded(lists):
+    # rc 2 (già presente e identico) è un esito definitivo: il ritentativo lo riceve dal journal
+    req = {"action": "publish", "list": "pol", "hex": "300004", "reg": "I-POLD", "push": True}
+    assert lists.run(req).rc == 0
+    log = lists.remote_log()
+    req["request_id"] = "gui-3"
+    first = lists.run(req)
+    assert first.rc == 2, (first.out, first.err)
+    again = lists.run(req)
+    assert "gui-3 già eseguita" in again.err
+    assert again.rc == 2
+    assert first.out.endswith(again.out)
+    assert lists.remote_log() == log
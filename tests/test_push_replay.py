@@ -0,0 +1,37 @@
+import os, sys
+
+from conftest import backend
+
+# pre-push: al primo push un altro editor pubblica sul remoto, quindi il push in corso
+# viene rifiutato (il ramo remoto non è più quello atteso)
+HOOK = """#!{python}
+import os, sys
+sys.path.insert(0, {tests!r})
+from pathlib import Path
+import conftest
+mark = Path({mark!r})
+if not mark.exists():
+    mark.touch()
+    lists = conftest.Lists(remote=Path({remote!r}))
+    lists.push_from_elsewhere({fn!r}, {row!r})
+"""
+
+
+def test_rejected_push_is_replayed_on_new_head(lists):
+    fn = backend.FILES["gov"]
+    other = ["400099", "G-OTHR", "Other Editor", "AW139", "A139", "Gov", "", "", "", "Gov", "", "", "", "", ""]
+    hook = lists.repo / ".git" / "hooks" / "pre-push"
+    hook.write_text(HOOK.format(python=sys.executable, tests=os.path.dirname(__file__), mark=str(lists.tmp / "pushed-once"),
+                                remote=str(lists.remote), fn=fn, row=other))
+    hook.chmod(0o755)
+
+    r = lists.run({"action": "publish", "list": "gov", "hex": "400002", "reg": "G-MINE", "push": True})
+
+    assert r.rc == 0, r.err
+    assert "Pushed (tentativo 2)" in r.out
+    # La modifica è stata riapplicata sopra quella dell'altro editor, senza perderla
+    assert lists.remote_log()[:2] == ["Upsert 400002 -> gov", "Other 400099"]
+    rows = lists.remote_list(fn)
+    assert rows["400002"][1] == "G-MINE"
+    assert rows["400099"][1] == "G-OTHR"
+    assert rows["400001"][1] == "G-GOVT"
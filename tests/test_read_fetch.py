@@ -0,0 +1,55 @@
+import threading
+
+from conftest import backend, git
+
+
+def test_readers_do_not_break_concurrent_writes(lists):
+    stop = threading.Event()
+    failures = []
+
+    def reader():
+        while not stop.is_set():
+            r = lists.run({"action": "where", "hex": "3C0001"})
+            if r.rc != 0:
+                failures.append(r.err)
+
+    readers = [threading.Thread(target=reader) for _ in range(8)]
+    for t in readers:
+        t.start()
+    results = []
+
+    def writer(i):
+        # Scritture una dopo l'altra: molti cicli sync/commit/push mentre i lettori fanno fetch
+        for j in range(3):
+            r = lists.run({"action": "publish", "list": "mil", "hex": f"3C0B{i:X}{j:X}", "push": True})
+            results.append((r.rc, r.err))
+
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    try:
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+
+    assert [rc for rc, _ in results] == [0] * 12, results
+    assert not failures, failures
+    mil = lists.remote_list(backend.FILES["mil"])
+    assert {f"3C0B{i:X}{j:X}" for i in range(4) for j in range(3)} <= set(mil)
+
+
+def test_read_fetch_leaves_writer_refs_alone(lists):
+    lists.push_from_elsewhere(backend.FILES["gov"], ["400077", "G-NEWR"])
+    tracking = git("rev-parse", "origin/main", cwd=lists.repo)
+
+    r = lists.run({"action": "head"})
+    assert r.rc == 0, r.err
+    head = git("--git-dir", str(lists.remote), "rev-parse", backend.BRANCH)
+    assert head in r.out
+    # Il fetch dei lettori va in refs/df-read/: ref e indice del checkout dei writer restano com'erano
+    assert git("rev-parse", "origin/main", cwd=lists.repo) == tracking
+    assert git("rev-parse", "refs/df-read/main", cwd=lists.repo) == head
+    assert not (lists.repo / ".git" / "index.lock").exists()
@@ -0,0 +1,43 @@
+import json
+
+from conftest import backend, write_list
+
+
+def reconcile(lists, **req) -> dict:
+    r = lists.run({"action": "reconcile", **req})
+    assert r.rc == 0, r.err
+    return json.loads(r.out.strip().splitlines()[-1])
+
+
+def test_reconcile_batch_round_trip(lists):
+    ref = lists.tmp / "aircraftDatabase.csv"
+    write_list(ref, ["icao24", "registration", "manufacturername", "typecode", "operator"], [
+        ["3c0001", "54+02", "Airbus", "A400", "Luftwaffe"],     # reg cambiata
+        ["400001", "G-GOVT", "Leonardo", "A139", "Home Office"],  # operatore cambiato
+        ["4b0001", "HB-ZRA", "Airbus", "EC45", ""],             # operatore vuoto a monte: invariato
+        ["ae0001", "10-0001", "Lockheed", "C130", "US Air Force"],  # tipo cambiato
+        ["abcdef", "N999", "Cessna", "C172", "Private"],        # non nelle liste
+    ])
+
+    res = reconcile(lists, reference=str(ref))
+    assert res["reference_rows"] == 5
+    assert res["total"] == 3
+    assert res["lists"]["mil"] == {"checked": 3, "matched": 2, "missing": 1,
+                                   "changed": {"reg": 1, "operator": 0, "icao_type": 1}}
+    assert res["lists"]["flyingdocs"]["changed"] == {"reg": 0, "operator": 0, "icao_type": 0}
+    assert {(c["list"], c["hex"]) for c in res["changes"]} == {("mil", "3C0001"), ("mil", "AE0001"), ("gov", "400001")}
+
+    # Il batch si importa senza "list": ogni HEX aggiornato sul posto nella sua lista, un solo commit
+    r = lists.run({"action": "import", "file": res["batch"], "push": True})
+    assert r.rc == 0, r.err
+    assert lists.remote_log()[1:] == ["init"]
+    assert sorted(lists.remote_files()) == sorted([backend.FILES["mil"], backend.FILES["gov"]])
+
+    mil = lists.remote_list(backend.FILES["mil"])
+    assert mil["3C0001"][:5] == ["3C0001", "54+02", "Luftwaffe", "Airbus A400", "A400"]
+    assert mil["AE0001"][4] == "C130"
+    gov = lists.remote_list(backend.FILES["gov"])
+    assert gov["400001"][:3] == ["400001", "G-GOVT", "Home Office"]
+    assert "ABCDEF" not in mil
+
+    assert reconcile(lists, reference=str(ref))["total"] == 0
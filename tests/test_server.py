@@ -0,0 +1,83 @@
+import json, signal, socket, subprocess, sys, time
+
+import pytest
+
+from conftest import ROOT, backend
+
+
+@pytest.fixture
+def server(lists):
+    sock = lists.tmp / "lists.sock"
+    p = subprocess.Popen([sys.executable, str(ROOT / "df_list_server.py"), "--unix", str(sock)], cwd=ROOT,
+                         env=lists.env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + 10
+    while not sock.exists():
+        assert p.poll() is None and time.monotonic() < deadline, p.stderr.read()
+        time.sleep(0.02)
+    s = socket.socket(socket.AF_UNIX)
+    s.connect(str(sock))
+    yield p, s
+    s.close()
+    if p.poll() is None:
+        p.kill()
+        p.wait()
+
+
+def send(s, *reqs):
+    s.sendall(b"".join(json.dumps(r).encode() + b"\n" for r in reqs))
+
+
+def replies(f, n: int) -> dict:
+    out = {}
+    for _ in range(n):
+        r = json.loads(f.readline())
+        out[r["id"]] = r
+    return out
+
+
+def stopped(p):
+    # Arresto pulito: rc 0, niente traceback di CancelledError
+    _, err = p.communicate(timeout=30)
+    assert p.returncode == 0, err
+    assert "Traceback" not in err and "CancelledError" not in err, err
+
+
+def test_pipelined_reads_and_write(lists, server):
+    p, s = server
+    f = s.makefile("rb")
+    # Tutte le richieste inviate senza aspettare le risposte
+    send(s, {"id": 1, "action": "where", "hex": "3C0001"},
+         {"id": 2, "action": "page", "list": "mil", "limit": 2},
+         {"id": 3, "action": "publish", "list": "pol", "hex": "300009", "reg": "I-POLZ", "push": True},
+         {"id": 4, "action": "range", "list": "mil", "from": "33FF", "to": "3CFF"},
+         {"id": 5, "action": "ping"})
+    res = replies(f, 5)
+    assert {i: r["rc"] for i, r in res.items()} == {i: 0 for i in range(1, 6)}, res
+    assert [x["list"] for x in res[1]["result"]["locations"]] == ["mil"]
+    assert len(res[2]["result"]["rows"]) == 2
+    assert "Pushed" in res[3]["out"]
+    assert res[5]["result"] == "OK"
+    assert lists.remote_list(backend.FILES["pol"])["300009"][1] == "I-POLZ"
+
+    # Lettura dopo la scrittura: il server vede il nuovo head
+    send(s, {"id": 6, "action": "where", "hex": "300009"})
+    assert [x["list"] for x in replies(f, 1)[6]["result"]["locations"]] == ["pol"]
+    p.send_signal(signal.SIGTERM)
+    stopped(p)
+
+
+def test_sigterm_finishes_inflight_write(lists, server):
+    p, s = server
+    f = s.makefile("rb")
+    send(s, {"id": 1, "action": "publish", "list": "pol", "hex": "30000A", "reg": "I-POLY", "push": True})
+    # SIGTERM appena la scrittura è in coda (o già pubblicata)
+    qdir = lists.repo / ".git" / "df-queue"
+    deadline = time.monotonic() + 10
+    while not any(qdir.glob("*.req")) and lists.remote_log() == ["init"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    p.send_signal(signal.SIGTERM)
+    r = replies(f, 1)[1]
+    assert r["rc"] == 0, r
+    assert "Pushed" in r["out"]
+    stopped(p)
+    assert lists.remote_list(backend.FILES["pol"])["30000A"][1] == "I-POLY"
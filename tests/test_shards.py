@@ -0,0 +1,60 @@
+import json, subprocess, sys
+
+from conftest import ROOT, backend, git
+
+
+def split(lists, lk: str, shards: int = 16):
+    r = subprocess.run([sys.executable, str(ROOT / "df_list_shards.py"), "split", lk, "--shards", str(shards), "--push"],
+                       cwd=ROOT, env=lists.env(), capture_output=True, text=True)
+    assert r.returncode == 0, r.stderr
+
+
+def test_publish_touches_only_its_shard(lists):
+    split(lists, "mil")
+    d = backend.shard_dir_name(backend.FILES["mil"])
+
+    r = lists.run({"action": "publish", "list": "mil", "hex": "3C0099", "reg": "54+99", "push": True})
+    assert r.rc == 0, r.err
+    assert lists.remote_files() == [f"{d}/3.csv"]
+    assert lists.remote_list(f"{d}/3.csv")["3C0099"][1] == "54+99"
+    assert set(lists.remote_list(f"{d}/3.csv")) == {"3C0001", "33FF01", "3C0099"}
+
+    # Spostamento da una lista non divisa: cambia solo lo shard di destinazione e la lista di origine
+    r = lists.run({"action": "publish", "list": "mil", "hex": "400001", "reg": "G-GOVT", "push": True})
+    assert r.rc == 0, r.err
+    assert sorted(lists.remote_files()) == sorted([f"{d}/4.csv", backend.FILES["gov"]])
+    assert "400001" not in lists.remote_list(backend.FILES["gov"])
+
+    r = lists.run({"action": "delete", "hex": "AE0001", "push": True})
+    assert r.rc == 0, r.err
+    assert lists.remote_files() == [f"{d}/A.csv"]
+    assert lists.remote_list(f"{d}/A.csv") == {}
+
+
+def test_where_reads_sharded_list(lists):
+    split(lists, "mil")
+    r = lists.run({"action": "where", "hex": "33ff01"})
+    assert r.rc == 0, r.err
+    locs = json.loads(r.out.strip().splitlines()[-1])["locations"]
+    assert [(x["list"], x["file"]) for x in locs] == [("mil", f"{backend.shard_dir_name(backend.FILES['mil'])}/3.csv")]
+
+
+def test_publish_into_absent_shard(lists):
+    split(lists, "mil")
+    d = backend.shard_dir_name(backend.FILES["mil"])
+    git("rm", "-q", f"{d}/5.csv", cwd=lists.repo)
+    git("commit", "-qm", "Rimuovi shard vuoto", cwd=lists.repo)
+    git("push", "-q", cwd=lists.repo)
+
+    r = lists.run({"action": "diff", "list": "mil", "hex": "501234", "reg": "OK-ABC"})
+    assert r.rc == 0, r.err
+    dj = json.loads(r.out.strip().splitlines()[-1])
+    assert (dj["target_file"], dj["exists_in_target"]) == (f"{d}/5.csv", False)
+    assert {"field": "$Registration", "old": "", "new": "OK-ABC"} in dj["changes"]
+
+    r = lists.run({"action": "publish", "list": "mil", "hex": "501234", "reg": "OK-ABC", "push": True})
+    assert r.rc == 0, r.err
+    assert lists.remote_files() == [f"{d}/5.csv"]
+    rows = lists.remote_list(f"{d}/5.csv")
+    assert list(rows) == ["501234"]
+    assert len(rows["501234"]) == 15  # header preso da uno shard vicino
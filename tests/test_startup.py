@@ -0,0 +1,67 @@
+# Budget di avvio del percorso rapido (--stdin-json), come "bench_backend.py startup":
+# ADSB_STARTUP_BUDGET_MS (default 50) oltre a "python -c pass" per ping/json,
+# ADSB_IMPORT_BUDGET_MS (default 30) di import per azione.
+import json, os, py_compile, statistics, subprocess, sys, time
+
+import pytest
+
+from conftest import ROOT, make_lists
+from bench_backend import STARTUP_REQUESTS, _import_ms
+
+STARTUP_BUDGET_MS = float(os.getenv("ADSB_STARTUP_BUDGET_MS", "50"))
+IMPORT_BUDGET_MS = float(os.getenv("ADSB_IMPORT_BUDGET_MS", "30"))
+# Moduli che solo alcune azioni (o la CLI completa) usano: ping e json non li caricano
+ACTION_MODULES = {"argparse", "tempfile", "shutil", "hashlib", "gzip", "heapq", "bisect", "random",
+                  "base64", "contextvars", "zstandard", "msgpack"}
+CMD = [sys.executable, "-m", "df_list_edit", "--stdin-json"]
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    py_compile.compile(str(ROOT / "df_list_edit.py"), doraise=True)  # con -m si riusa __pycache__
+    repo = make_lists(tmp_path_factory.mktemp("startup")).repo
+    e = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    e.update(ADSB_REPO_PATH=str(repo), ADSB_FETCH_TTL="3600")
+    subprocess.run(CMD, cwd=ROOT, env=e, input=b'{"action":"where","hex":"3C0001"}', capture_output=True, check=True)
+    return e
+
+
+def _imported(env, req) -> set:
+    r = subprocess.run([sys.executable, "-X", "importtime", *CMD[1:]], cwd=ROOT, env=env,
+                       input=json.dumps(req).encode(), capture_output=True)
+    return {line.split("|")[-1].strip() for line in r.stderr.decode().splitlines() if line.startswith("import time:")}
+
+
+def _wall_ms(env, cmd, stdin=b"", runs=7) -> float:
+    ts = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, input=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        ts.append(time.perf_counter() - t0)
+    return statistics.median(ts) * 1000
+
+
+@pytest.mark.parametrize("action", sorted(STARTUP_REQUESTS))
+def test_fast_path_skips_argparse(env, action):
+    assert "argparse" not in _imported(env, STARTUP_REQUESTS[action])
+
+
+@pytest.mark.parametrize("action", ["ping", "json"])
+def test_fast_path_skips_action_modules(env, action):
+    assert not _imported(env, STARTUP_REQUESTS[action]) & ACTION_MODULES
+
+
+@pytest.mark.parametrize("action", sorted(STARTUP_REQUESTS))
+def test_import_budget(env, action):
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], env=env, capture_output=True)
+    skip = {line.split("|")[-1].strip() for line in r.stderr.decode().splitlines() if "|" in line} | {"runpy"}
+    stdin = json.dumps(STARTUP_REQUESTS[action]).encode()
+    ms = min(_import_ms(CMD, env, stdin, skip)[0] for _ in range(3))
+    assert ms <= IMPORT_BUDGET_MS, f"{action}: import {ms:.1f} ms > {IMPORT_BUDGET_MS} ms"
+
+
+@pytest.mark.parametrize("action", ["ping", "json"])
+def test_startup_budget(env, action):
+    bare = _wall_ms(env, [sys.executable, "-c", "pass"])
+    ms = _wall_ms(env, CMD, json.dumps(STARTUP_REQUESTS[action]).encode()) - bare
+    assert ms <= STARTUP_BUDGET_MS, f"{action}: avvio +{ms:.1f} ms > {STARTUP_BUDGET_MS} ms"
@@ -0,0 +1,102 @@
+import io, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import adsb_thumbs
+from adsb_thumbs import ThumbCache
+
+
+class RawThumbs(ThumbCache):
+    # Senza Pillow: la "miniatura" è l'immagine scaricata, per provare download, cache e LRU
+    def make_thumb(self, data: bytes) -> bytes:
+        return data
+
+
+@pytest.fixture
+def images():
+    # Server HTTP su localhost: path -> byte, con il conteggio delle richieste
+    files, hits = {}, []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            data = files.get(self.path)
+            self.send_response(200 if data is not None else 404)
+            self.send_header("Content-Length", str(len(data or b"")))
+            self.end_headers()
+            self.wfile.write(data or b"")
+
+        def log_message(self, *a):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    yield base, files, hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_then_cache_hit(tmp_path, images):
+    base, files, hits = images
+    files["/a.jpg"] = b"a" * 1000
+    cache = RawThumbs(tmp_path)
+    assert cache.fetch(base + "/a.jpg") == files["/a.jpg"]
+    assert cache.path(base + "/a.jpg").read_bytes() == files["/a.jpg"]
+
+    # Seconda volta dalla cache su disco, anche per un'altra istanza: nessuna richiesta
+    assert RawThumbs(tmp_path).fetch(base + "/a.jpg") == files["/a.jpg"]
+    assert cache.fetch(base + "/a.jpg") == files["/a.jpg"]
+    assert (cache.misses, cache.hits, hits) == (1, 1, ["/a.jpg"])
+
+
+def test_failed_url_backs_off(tmp_path, images, monkeypatch):
+    base, files, hits = images
+    cache = RawThumbs(tmp_path)
+    with pytest.raises(Exception, match="404"):
+        cache.fetch(base + "/late.jpg")
+    files["/late.jpg"] = b"x" * 100
+
+    # Entro THUMB_RETRY_S lo stesso errore senza rete
+    with pytest.raises(RuntimeError, match="404"):
+        cache.fetch(base + "/late.jpg")
+    assert hits == ["/late.jpg"]
+    assert base + "/late.jpg" in cache._failed
+
+    monkeypatch.setattr(adsb_thumbs, "THUMB_RETRY_S", 0)
+    assert cache.fetch(base + "/late.jpg") == files["/late.jpg"]
+    assert hits == ["/late.jpg", "/late.jpg"]
+    assert not cache._failed
+
+
+def test_lru_eviction_under_max_mb(tmp_path, images):
+    base, files, hits = images
+    for name in "abc":
+        files[f"/{name}.jpg"] = name.encode() * 1000
+    cache = RawThumbs(tmp_path, max_mb=2500 / (1024 * 1024))
+    cache.fetch(base + "/a.jpg")
+    cache.fetch(base + "/b.jpg")
+    old = time.time() - 60
+    os.utime(cache.path(base + "/a.jpg"), (old, old))
+    os.utime(cache.path(base + "/b.jpg"), (old + 1, old + 1))
+
+    # a riusata più di recente di b: superato il tetto, esce b
+    assert cache.get(base + "/a.jpg") is not None
+    cache.fetch(base + "/c.jpg")
+    assert not cache.path(base + "/b.jpg").exists()
+    assert cache.path(base + "/a.jpg").exists() and cache.path(base + "/c.jpg").exists()
+    assert cache._bytes == 2000 <= cache.max_bytes
+
+
+def test_thumbnail_is_small_png(tmp_path, images):
+    Image = pytest.importorskip("PIL.Image")
+    base, files, _hits = images
+    buf = io.BytesIO()
+    Image.new("RGB", (1600, 1200), "red").save(buf, "JPEG")
+    files["/big.jpg"] = buf.getvalue()
+
+    data = ThumbCache(tmp_path).fetch(base + "/big.jpg")
+    with Image.open(io.BytesIO(data)) as im:
+        assert im.format == "PNG"
+        assert im.size == adsb_thumbs.THUMB_SIZE
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from conftest import backend, git, read_list
+
+
+@pytest.mark.parametrize("inotify", [True, False], ids=["inotify", "polling"])
+def test_watcher_warms_snapshot_when_ref_moves(lists, monkeypatch, inotify):
+    if not inotify:
+        def no_inotify():
+            raise OSError("inotify non disponibile")
+        monkeypatch.setattr(backend, "_Inotify", no_inotify)  # run() ripiega sul polling
+    warm = backend.WarmRepo(lists.repo)
+    warm.watcher.interval = 0.1
+    warm.start()
+    try:
+        assert warm.current()[0] == git("rev-parse", "origin/main", cwd=lists.repo)
+
+        # Un altro editor pubblica; il fetch di un lettore (altro processo) sposta refs/df-read/
+        lists.push_from_elsewhere(backend.FILES["gov"], ["400077", "G-NEWR"])
+        assert lists.run({"action": "head"}).rc == 0
+        head = git("--git-dir", str(lists.remote), "rev-parse", backend.BRANCH)
+
+        deadline = time.monotonic() + 10
+        while warm.current()[0] != head and time.monotonic() < deadline:
+            time.sleep(0.05)
+        sha, path = warm.current()
+        assert sha == head
+        assert "400077" in read_list((path / backend.FILES["gov"]).read_text())
+    finally:
+        warm.stop()